@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
 from datetime import datetime
+import ast
+import json
 import os
 
 # Créer le dossier database s'il n'existe pas
@@ -10,8 +12,144 @@ os.makedirs(DATABASE_DIR, exist_ok=True)
 
 DATABASE_URL = f"sqlite:///{os.path.join(DATABASE_DIR, 'seniorvoice.db')}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Profil SQLite : "production" (WAL, synchronous=NORMAL, mmap, busy timeout) ou "default"
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production").lower()
+
+SQLITE_PRAGMAS = {
+    "production": {
+        # WAL : les lectures du tableau de bord ne sont plus bloquées par les commits
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024))),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "cache_size": -16000,  # 16 Mo
+        "temp_store": "MEMORY",
+    },
+    "default": {},
+}
+
+
+def _configure_sqlite(engine, pragmas: dict) -> None:
+    """
+    Pragmas du profil à chaque connexion, et transactions pilotées par SQLAlchemy :
+    le pilote sqlite3 n'émet pas BEGIN avant un SAVEPOINT, dont le RELEASE validait
+    alors tout seul (begin_nested() des traitements par lot)
+    """
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = SQLITE_PROFILE):
+    """Créer le moteur SQLAlchemy avec le pool de connexions et les pragmas du profil"""
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_pre_ping=True,
+    )
+    _configure_sqlite(engine, SQLITE_PRAGMAS.get(profile, {}))
+    return engine
+
+
+engine = create_db_engine()
+
+
+class AppSession(Session):
+    """Sessions de l'application (sync et async) — cible des écouteurs d'événements (agenda)"""
+
+
+def track_savepoints(session_class, info_key) -> None:
+    """
+    Liste de changements en attente du commit (session.info[info_key]) : le retour à un
+    SAVEPOINT (commande en échec d'un lot) n'annule que ceux collectés depuis le SAVEPOINT,
+    l'annulation de la transaction les annule tous
+    """
+    marks_key = ("savepoint_marks", info_key)
+
+    @event.listens_for(session_class, "after_transaction_create")
+    def _mark(session, transaction):
+        if transaction.nested:
+            session.info.setdefault(marks_key, {})[transaction] = len(session.info.get(info_key, ()))
+
+    @event.listens_for(session_class, "after_rollback")
+    def _discard(session):
+        if not session.in_nested_transaction():
+            session.info.pop(info_key, None)
+            return
+        mark = session.info.get(marks_key, {}).get(session.get_nested_transaction())
+        pending = session.info.get(info_key)
+        if pending is not None and mark is not None:
+            del pending[mark:]
+
+    @event.listens_for(session_class, "after_transaction_end")
+    def _unmark(session, transaction):
+        if transaction.nested:
+            session.info.get(marks_key, {}).pop(transaction, None)
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AppSession)
+
+# ============ Couche asynchrone (optionnelle) ============
+# DB_ASYNC=true : les endpoints utilisent une AsyncSession (aiosqlite) et n'occupent
+# plus la boucle d'événements pendant les requêtes SQL.
+# Setup : pip install aiosqlite
+
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL, profile: str = SQLITE_PROFILE):
+    """Moteur asynchrone (aiosqlite) avec le même pool et les mêmes pragmas"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_engine = create_async_engine(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_pre_ping=True,
+    )
+    _configure_sqlite(async_engine.sync_engine, SQLITE_PRAGMAS.get(profile, {}))
+    return async_engine
+
+
+def get_async_sessionmaker():
+    """Fabrique de sessions asynchrones, créée au premier besoin"""
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_engine = create_async_db_engine()
+        # expire_on_commit=False : pas de rechargement implicite (impossible hors greenlet)
+        _async_sessionmaker = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False, sync_session_class=AppSession
+        )
+    return _async_sessionmaker
+
+
+async def dispose_async_engine():
+    """Fermer les connexions du moteur asynchrone (lifespan)"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+
+
 Base = declarative_base()
 
 
@@ -24,7 +162,7 @@ class Contact(Base):
     name = Column(String, nullable=False)
     phone = Column(String, nullable=False)
     relation = Column(String, default="")  # famille, ami, médecin, etc.
-    is_emergency = Column(Boolean, default=False)
+    is_emergency = Column(Boolean, default=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     messages = relationship("Message", back_populates="contact")
@@ -35,9 +173,10 @@ class Reminder(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    reminder_time = Column(String, nullable=False)  # ex: "08:00", "14:30"
+    reminder_time = Column(String, nullable=False, index=True)  # ex: "08:00", "14:30"
     reminder_type = Column(String, default="general")  # medical, general
-    is_done = Column(Boolean, default=False)
+    is_done = Column(Boolean, default=False, index=True)
+    fired_at = Column(DateTime, nullable=True)  # déclenché par le planificateur
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -56,10 +195,10 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    contact_id = Column(Integer, ForeignKey("contacts.id"), nullable=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id"), nullable=True, index=True)
     content = Column(Text, nullable=False)
     direction = Column(String, default="received")  # sent / received
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     contact = relationship("Contact", back_populates="messages")
 
@@ -71,16 +210,107 @@ class ActionHistory(Base):
     audio_filename = Column(String, default="")
     transcription = Column(Text, default="")
     detected_intent = Column(String, default="")
-    entities_json = Column(Text, default="{}")
+    entities_json = Column(Text, default="{}")  # JSON (json_extract possible)
     action_result = Column(Text, default="")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Colonnes d'analyse : contact concerné, action réussie (None = historique antérieur)
+    contact = Column(String(collation="NOCASE"), nullable=True)
+    success = Column(Boolean, nullable=True)
+
+    __table_args__ = (
+        # Pagination de /api/history filtrée par intention ou par contact (curseur = id)
+        Index("ix_action_history_intent_id", "detected_intent", "id"),
+        Index("ix_action_history_contact_id", "contact", "id"),
+        # Statistiques sur une période : lues dans l'index seul, sans parcourir la table
+        Index("ix_action_history_created_intent", "created_at", "detected_intent", "success"),
+    )
+
+
+# ============ Migrations ============
+# Chaque migration est appliquée une seule fois, dans l'ordre (PRAGMA user_version).
+# Une étape est une instruction SQL ou une fonction (connexion) ; toutes doivent pouvoir
+# s'exécuter sur une base créée par create_all (qui contient déjà le schéma à jour).
+# Ne jamais modifier une migration déjà publiée : en ajouter une nouvelle.
+
+def _add_column(table: str, column: str, ddl: str):
+    def migrate(conn):
+        columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return migrate
+
+
+def _history_entities_to_json(conn):
+    """Historique antérieur : repr Python → JSON, contact extrait des entités"""
+    rows = conn.execute(text(
+        "SELECT id, entities_json FROM action_history WHERE entities_json NOT LIKE '{\"%' AND entities_json != '{}'"
+    )).all()
+    for row_id, raw in rows:
+        try:
+            entities = ast.literal_eval(raw or "{}")
+        except (ValueError, SyntaxError):
+            continue
+        if not isinstance(entities, dict):
+            continue
+        entities = {k: v for k, v in entities.items() if not str(k).startswith("_")}
+        conn.execute(
+            text("UPDATE action_history SET entities_json = :entities, contact = :contact WHERE id = :id"),
+            {
+                "entities": json.dumps(entities, ensure_ascii=False, default=str),
+                "contact": entities.get("contact") or None,
+                "id": row_id,
+            },
+        )
+
+
+MIGRATIONS = [
+    # 1 — index sur les colonnes filtrées / triées par les endpoints de liste
+    [
+        "CREATE INDEX IF NOT EXISTS ix_messages_created_at ON messages (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_contact_id ON messages (contact_id)",
+        "CREATE INDEX IF NOT EXISTS ix_reminders_is_done ON reminders (is_done)",
+        "CREATE INDEX IF NOT EXISTS ix_reminders_reminder_time ON reminders (reminder_time)",
+        "CREATE INDEX IF NOT EXISTS ix_contacts_is_emergency ON contacts (is_emergency)",
+        "CREATE INDEX IF NOT EXISTS ix_action_history_created_at ON action_history (created_at)",
+    ],
+    # 2 — horodatage du déclenchement des rappels (planificateur)
+    [
+        _add_column("reminders", "fired_at", "DATETIME"),
+    ],
+    # 3 — historique interrogeable : entités en JSON, contact et succès indexés
+    [
+        _add_column("action_history", "contact", "VARCHAR COLLATE NOCASE"),
+        _add_column("action_history", "success", "BOOLEAN"),
+        _history_entities_to_json,
+        "CREATE INDEX IF NOT EXISTS ix_action_history_intent_id ON action_history (detected_intent, id)",
+        "CREATE INDEX IF NOT EXISTS ix_action_history_contact_id ON action_history (contact, id)",
+        "CREATE INDEX IF NOT EXISTS ix_action_history_created_intent "
+        "ON action_history (created_at, detected_intent, success)",
+    ],
+]
+
+
+def run_migrations(bind=None):
+    """Appliquer les migrations manquantes sur une base existante"""
+    bind = bind or engine
+    with bind.begin() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar() or 0
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+            print(f"✅ Migration {number} appliquée")
 
 
 # ============ Fonctions utilitaires ============
 
 def init_db():
-    """Créer toutes les tables"""
+    """Créer toutes les tables puis appliquer les migrations"""
     Base.metadata.create_all(bind=engine)
+    run_migrations()
 
 
 def get_db():
@@ -92,6 +322,16 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Obtenir une session asynchrone (DB_ASYNC=true)"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+# Dépendance utilisée par les endpoints, choisie par configuration
+get_session = get_async_db if DB_ASYNC else get_db
+
+
 def seed_db():
     """Pré-remplir la base avec des données d'exemple pour la démo"""
     db = SessionLocal()
@@ -15,6 +15,15 @@ class VoiceProcessingResponse(BaseModel):
     action_result: str = ""
     action_data: Dict[str, Any] = {}
     tts_text: str = ""
+    tts_audio_url: str = ""  # WAV synthétisé côté serveur (vide : lecture par le navigateur)
+    tts_stream_url: str = ""  # même audio, phrase par phrase (réponses de plusieurs phrases)
+
+
+class VoiceBatchResponse(BaseModel):
+    """Réponse du pipeline texte par lot"""
+    success: bool
+    count: int = 0
+    results: List[VoiceProcessingResponse] = []
 
 
 # ============ Contacts ============
@@ -47,6 +56,7 @@ class ReminderBase(BaseModel):
 class ReminderResponse(ReminderBase):
     id: int
     is_done: bool = False
+    fired_at: Optional[datetime] = None
     created_at: Optional[datetime] = None
 
     class Config:
@@ -110,13 +120,29 @@ class AgendaResponse(BaseModel):
     items: List[AgendaItem]
 
 
+# ============ Changes (tableau de bord) ============
+
+class ChangesResponse(BaseModel):
+    success: bool
+    cursor: int
+    reset: bool = False  # journal dépassé : recharger les listes complètes
+    contacts: List[ContactResponse] = []
+    reminders: List[ReminderResponse] = []
+    medications: List[MedicationResponse] = []
+    messages: List[MessageResponse] = []
+    deleted: Dict[str, List[int]] = {}
+
+
 # ============ Action History ============
 
 class ActionHistoryItem(BaseModel):
     id: int
     transcription: str
     detected_intent: str
+    entities: Dict[str, Any] = {}
     action_result: str
+    contact: Optional[str] = None
+    success: Optional[bool] = None  # None : historique antérieur à la colonne
     created_at: Optional[datetime] = None
 
     class Config:
@@ -124,4 +150,30 @@ class ActionHistoryItem(BaseModel):
 
 class ActionHistoryResponse(BaseModel):
     success: bool
-    history: List[ActionHistoryItem]
\ No newline at end of file
+    history: List[ActionHistoryItem]
+    next_cursor: Optional[int] = None  # ?before=<next_cursor> pour la page suivante
+
+
+class IntentHourCount(BaseModel):
+    hour: str  # "2026-10-17T08:00" (UTC)
+    intent: str
+    count: int
+
+class IntentsPerHourResponse(BaseModel):
+    success: bool
+    since: datetime
+    until: Optional[datetime] = None
+    buckets: List[IntentHourCount]
+
+
+class IntentFailureRate(BaseModel):
+    intent: str
+    total: int
+    failures: int
+    failure_rate: float  # échecs / actions dont le résultat est connu
+
+class IntentFailureRateResponse(BaseModel):
+    success: bool
+    since: datetime
+    until: Optional[datetime] = None
+    intents: List[IntentFailureRate]
\ No newline at end of file
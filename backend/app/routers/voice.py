@@ -1,52 +1,327 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+import asyncio
+import json
 import os
+import re
 import shutil
-from datetime import datetime
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Set, Union
 
 
 class TextCommandRequest(BaseModel):
     text: str
 
-from ..database import get_db, Contact, Reminder, Medication, Message, ActionHistory
+
+class TextBatchRequest(BaseModel):
+    texts: List[str]
+
+from ..database import AppSession, SessionLocal, get_session, Contact, Reminder, Medication, Message, ActionHistory
 from ..models.schemas import (
-    VoiceProcessingResponse,
+    VoiceProcessingResponse, VoiceBatchResponse,
     ContactListResponse, ContactResponse, ContactBase,
     ReminderListResponse, ReminderResponse,
     MedicationListResponse, MedicationResponse,
     MessageListResponse, MessageResponse,
     AgendaResponse, AgendaItem,
+    ChangesResponse,
     ActionHistoryResponse, ActionHistoryItem,
+    IntentHourCount, IntentsPerHourResponse, IntentFailureRate, IntentFailureRateResponse,
 )
 from ..services.audio_analyzer import VoiceAnalyzer
 from ..services.nlp_processor import NLPProcessor
 from ..services.action_engine import ActionEngine
-from ..services.tts_service import TTSService
+from ..services.agenda_index import AgendaEntry, AgendaIndex
+from ..services.change_feed import ChangeFeed
+from ..services.contact_index import ContactIndex
+from ..services.history_sink import HistorySink
+from ..services.tts_service import TTSService, split_sentences
+from ..services.pipeline_executor import PipelineExecutor
+from ..services.audio_archive import AudioArchive
+from ..services.metrics import metrics
+from ..services.notifications import NotificationHub
+from ..services.scheduler import ReminderScheduler
+from ..services.silence_trimmer import SilentAudioError
+from ..services.speech_stream import SpeechSegmenter, StreamingSession
+from ..services.wav_utils import wav_header
 
 router = APIRouter(prefix="/api", tags=["seniorvoice"])
 
 # Initialiser les services
 analyzer = VoiceAnalyzer()
-nlp = NLPProcessor()
-action_engine = ActionEngine()
-tts = TTSService()
-
-# Dossier pour les fichiers uploadés
+# Contacts indexés en mémoire, partagés par le NLP et le moteur d'actions
+contact_index = ContactIndex()
+nlp = NLPProcessor(contact_index=contact_index)
+# Agenda du jour matérialisé, tenu à jour à chaque commit des sessions de l'application
+agenda = AgendaIndex()
+agenda.watch(AppSession)
+# Notifications poussées aux clients connectés (GET /api/events, /api/ws)
+hub = NotificationHub()
+# Journal des écritures (contacts, rappels, médicaments, messages) : événement "change" + GET /api/changes
+change_feed = ChangeFeed(hub)
+change_feed.watch(AppSession)
+tts = TTSService(contact_index=contact_index)
+# Pool borné pour les étapes bloquantes (Groq, NLP, SQLAlchemy)
+executor = PipelineExecutor()
+# Historique des actions inséré par lots hors des requêtes (démarré par le lifespan)
+history_sink = HistorySink(SessionLocal, runner=executor.run)
+history_sink.watch(AppSession)
+action_engine = ActionEngine(contact_index=contact_index, agenda=agenda, history=history_sink)
+
+# Taille maximale d'un lot pour /api/process-text-batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_TEXT_BATCH_SIZE", "1000"))
+
+# Mode d'upload : "memory" = les octets vont directement à Groq (formats natifs),
+# "disk" = passage par un fichier temporaire (supprimé après transcription)
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "memory").lower()
+
+# Dossier d'archive des enregistrements (optionnel, plafonné)
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+archive = AudioArchive(UPLOAD_DIR)
+
+
+# Session synchrone (pool du pipeline) ou asynchrone (DB_ASYNC=true, aiosqlite)
+DbSession = Union[Session, AsyncSession]
+
+
+async def _run_db(db: DbSession, fn: Callable, *args) -> Any:
+    """Exécuter fn(session, *args) sans bloquer la boucle d'événements"""
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await executor.run(fn, db, *args)
+
+
+async def _execute_action(intent: str, entities: dict, db: DbSession) -> dict:
+    if isinstance(db, AsyncSession):
+        return await action_engine.execute_async(intent, entities, db)
+    return await executor.run(action_engine.execute, intent, entities, db)
+
+
+async def _commit(db: DbSession) -> None:
+    if isinstance(db, AsyncSession):
+        await db.commit()
+    else:
+        await executor.run(db.commit)
+
+
+async def _rollback(db: DbSession) -> None:
+    if isinstance(db, AsyncSession):
+        await db.rollback()
+    else:
+        await executor.run(db.rollback)
+
+
+def load_indexes() -> None:
+    """Charger les index en mémoire depuis la base (lifespan) : contacts, agenda du jour"""
+    db = SessionLocal()
+    try:
+        contact_index.load(db.query(Contact).all())
+        agenda.load(db.query(Reminder).filter(Reminder.is_done == False).all(), db.query(Medication).all())
+    finally:
+        db.close()
+    print(f"✅ Index chargés — {len(contact_index)} contacts, {len(agenda)} créneaux d'agenda")
+
+
+def _mark_reminders_fired(db: Session, reminder_ids: List[int]) -> None:
+    """Rappels / alarmes déclenchés : faits, horodatés (ils sortent de l'agenda au commit)"""
+    fired_at = datetime.utcnow()
+    for reminder in db.query(Reminder).filter(Reminder.id.in_(reminder_ids)):
+        reminder.is_done = True
+        reminder.fired_at = fired_at
+    db.commit()
+
+
+async def _mark_fired(reminder_ids: List[int]) -> None:
+    db = SessionLocal()
+    try:
+        await executor.run(_mark_reminders_fired, db, reminder_ids)
+    finally:
+        db.close()
+
+
+# Planificateur des rappels, alarmes et médicaments (démarré par le lifespan)
+scheduler = ReminderScheduler(agenda, hub, mark_fired=_mark_fired)
+
+
+def _save_upload(source, suffix: str) -> str:
+    """Copier l'upload dans un fichier temporaire (bloquant) et retourner son chemin"""
+    with tempfile.NamedTemporaryFile(prefix="senior_", suffix=suffix, delete=False) as buffer:
+        shutil.copyfileobj(source, buffer)
+    return buffer.name
+
+
+# ==================== Synthèse vocale ====================
+
+TTS_KEY = re.compile(r"[0-9a-f]{64}")
+
+# Synthèses lancées pendant l'envoi de la réponse JSON (références gardées jusqu'à la fin)
+_tts_prefetch: Set[asyncio.Task] = set()
+
+
+def _speak(text: str, segments: Optional[list] = None, prefetch: bool = True) -> dict:
+    """Réponse TTS ; la synthèse démarre aussitôt pour que l'audio soit prêt quand le client le demande"""
+    tts_response = tts.generate_response(text, segments)
+    # Réponse segmentée : assemblée à la demande à partir des clips en mémoire.
+    # Réponse lue en flux : seule la première phrase est préparée (cache de phrases).
+    if prefetch and tts_response["audio_url"] and not tts_response["segmented"]:
+        if tts_response["stream_url"]:
+            text = split_sentences(text)[0]
+        task = asyncio.create_task(executor.run(tts.synthesize, text, tts_response["language"]))
+        _tts_prefetch.add(task)
+        task.add_done_callback(_prefetch_done)
+    return tts_response
+
+
+def _prefetch_done(task: asyncio.Task) -> None:
+    _tts_prefetch.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️  Synthèse vocale échouée : {task.exception()}")
+
+
+@router.get("/tts/{key}.wav")
+async def get_tts_audio(key: str, request: Request):
+    """Audio WAV d'une réponse (tts_audio_url) ; contenu immuable, adressé par son empreinte"""
+    if not TTS_KEY.fullmatch(key):
+        raise HTTPException(status_code=404, detail="Audio introuvable")
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    try:
+        with metrics.timer("tts_audio"):
+            wav = await executor.run(tts.audio, key)
+    except Exception as e:
+        print(f"❌ Erreur synthèse vocale: {e}")
+        raise HTTPException(status_code=503, detail="Synthèse vocale indisponible")
+    if wav is None:
+        raise HTTPException(status_code=404, detail="Audio introuvable")
+    return Response(content=wav, media_type="audio/wav", headers=headers)
+
+
+@router.get("/tts/{key}/stream")
+async def stream_tts_audio(key: str):
+    """
+    Audio WAV d'une réponse longue (tts_stream_url), phrase par phrase en transfert chunked :
+    la phrase suivante est synthétisée pendant l'envoi de la précédente.
+    """
+    pending = tts.pending(key) if TTS_KEY.fullmatch(key) else None
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Audio introuvable")
+    text, language = pending
+    sentences = split_sentences(text)
+
+    def synthesize(index: int) -> asyncio.Future:
+        return asyncio.ensure_future(executor.run(tts.sentence_pcm, sentences[index], language))
+
+    async def stream():
+        upcoming = synthesize(0)
+        sample_rate = None
+        try:
+            for index in range(len(sentences)):
+                try:
+                    pcm, rate = await upcoming
+                except Exception as e:
+                    print(f"❌ Erreur synthèse vocale (flux): {e}")
+                    break
+                if index + 1 < len(sentences):
+                    upcoming = synthesize(index + 1)
+                if sample_rate is None:
+                    sample_rate = rate
+                    yield wav_header(sample_rate)
+                if rate == sample_rate:
+                    yield pcm
+        finally:
+            upcoming.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ==================== Urgence (chemin rapide) ====================
+
+async def _emergency_fast_path(text: str) -> Optional[VoiceProcessingResponse]:
+    """
+    « au secours », « نجدة » : alerte déclenchée avant le scoring NLP, contacts d'urgence
+    lus en mémoire, historique différé (history_sink). None = pipeline normal.
+    """
+    if not nlp.spot_emergency(text):
+        return None
+    entities = {"_raw_text": text}
+    with metrics.timer("emergency"):
+        action_result = action_engine.execute_emergency(entities)
+    if action_result is None:
+        return None
+    print(f"🚨 Urgence détectée (chemin rapide): {text[:80]}")
+    tts_response = _speak(action_result["response_text"])
+    return VoiceProcessingResponse(
+        success=action_result["success"],
+        transcription=text,
+        intent="emergency_alert",
+        confidence=1.0,
+        entities={},
+        action_result=action_result["response_text"],
+        action_data=action_result.get("data", {}),
+        tts_text=tts_response["text"],
+        tts_audio_url=tts_response["audio_url"],
+        tts_stream_url=tts_response["stream_url"],
+    )
 
 
 # ==================== Pipeline Vocal Principal ====================
 
+NO_SPEECH_TEXT = "Je n'ai rien entendu. Pouvez-vous répéter ?"
+
+
+def _no_speech_response() -> VoiceProcessingResponse:
+    """Enregistrement sans parole : rejeté avant la transcription"""
+    return VoiceProcessingResponse(
+        success=False, intent="no_speech", action_result=NO_SPEECH_TEXT, tts_text=NO_SPEECH_TEXT,
+        tts_audio_url=_speak(NO_SPEECH_TEXT)["audio_url"],
+    )
+
+
+async def _respond(transcription: str, nlp_result: dict, db: DbSession) -> VoiceProcessingResponse:
+    """Fin commune des pipelines : Action → TTS → réponse"""
+    entities = nlp_result["entities"]
+    entities["_raw_text"] = transcription
+    with metrics.timer("action"):
+        action_result = await _execute_action(nlp_result["intent"], entities, db)
+
+    with metrics.timer("tts"):
+        tts_response = _speak(action_result["response_text"], action_result.get("speech"))
+
+    return VoiceProcessingResponse(
+        success=action_result["success"],
+        transcription=transcription,
+        intent=nlp_result["intent"],
+        confidence=nlp_result["confidence"],
+        entities=nlp_result["entities"],
+        action_result=action_result["response_text"],
+        action_data=action_result.get("data", {}),
+        tts_text=tts_response["text"],
+        tts_audio_url=tts_response["audio_url"],
+        tts_stream_url=tts_response["stream_url"],
+    )
+
+
 @router.post("/process-voice", response_model=VoiceProcessingResponse)
 async def process_voice(
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_session)
 ):
     """
     Pipeline complet : Audio → Whisper → NLP → Action → TTS
     """
+    file_path = None
     try:
         # Vérifier le format
         allowed_extensions = [".wav", ".mp3", ".m4a", ".ogg", ".webm", ".mp4"]
@@ -60,60 +335,130 @@ async def process_voice(
                 detail=f"Format non supporté. Utilisez: {', '.join(allowed_extensions)}"
             )
 
-        # Sauvegarder le fichier
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"senior_{timestamp}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(audio_file.file, buffer)
-
-        print(f"📤 Audio reçu: {filename} ({os.path.getsize(file_path)} bytes)")
-
-        # 1. Transcription Whisper
-        print("🎤 Étape 1: Transcription...")
-        transcription = analyzer.transcribe(file_path)
+        filename = archive.new_filename(file_ext)
+
+        if UPLOAD_MODE == "memory" and analyzer.can_transcribe_bytes(audio_file.size or 0, file_ext):
+            # Les octets vont directement de l'upload au transcripteur, sans écriture disque
+            with metrics.timer("upload"):
+                audio_bytes = await audio_file.read()
+            print(f"📤 Audio reçu: {filename} ({len(audio_bytes)} bytes, en mémoire)")
+
+            # 1. Transcription Whisper (nombre d'appels simultanés limité)
+            print("🎤 Étape 1: Transcription...")
+            with metrics.timer("transcription"):
+                transcription = await executor.transcribe(analyzer.transcribe_bytes, audio_bytes, filename)
+
+            if archive.enabled:
+                background_tasks.add_task(archive.save, audio_bytes, filename)
+        else:
+            # Format à convertir ou fichier trop gros : passage par un fichier temporaire
+            with metrics.timer("upload"):
+                file_path = await executor.run(_save_upload, audio_file.file, file_ext)
+            print(f"📤 Audio reçu: {filename} ({os.path.getsize(file_path)} bytes, sur disque)")
+            # Fichier temporaire archivé ou supprimé après la réponse
+            background_tasks.add_task(archive.save_file, file_path, filename)
+
+            # 1. Transcription Whisper (nombre d'appels simultanés limité)
+            print("🎤 Étape 1: Transcription...")
+            with metrics.timer("transcription"):
+                transcription = await executor.transcribe(analyzer.transcribe, file_path)
+
+        # Urgence : réponse immédiate, sans NLP complet ni écriture en base
+        fast = await _emergency_fast_path(transcription)
+        if fast is not None:
+            return fast
 
         # 2. Détection d'intention + entités (NLP)
         print("🧠 Étape 2: Analyse NLP...")
-        nlp_result = nlp.process(transcription)
+        with metrics.timer("nlp"):
+            nlp_result = await executor.run(nlp.process, transcription)
 
-        # 3. Exécution de l'action
+        # 3. Exécution de l'action + 4. Réponse TTS (texte)
         print(f"⚡ Étape 3: Action '{nlp_result['intent']}'...")
-        entities = nlp_result["entities"]
-        entities["_raw_text"] = transcription
-        action_result = action_engine.execute(nlp_result["intent"], entities, db)
-
-        # 4. Réponse TTS (texte)
-        print("🔊 Étape 4: Préparer la réponse...")
-        tts_response = tts.generate_response(action_result["response_text"])
-
-        print(f"✅ Pipeline terminé: intent={nlp_result['intent']}, success={action_result['success']}")
-
-        return VoiceProcessingResponse(
-            success=action_result["success"],
-            transcription=transcription,
-            intent=nlp_result["intent"],
-            confidence=nlp_result["confidence"],
-            entities=nlp_result["entities"],
-            action_result=action_result["response_text"],
-            action_data=action_result.get("data", {}),
-            tts_text=tts_response["text"]
-        )
+        response = await _respond(transcription, nlp_result, db)
+        print(f"✅ Pipeline terminé: intent={response.intent}, success={response.success}")
+        return response
 
+    except SilentAudioError as e:
+        print(f"🔇 {e}")
+        return _no_speech_response()
     except Exception as e:
         print(f"❌ Erreur pipeline: {str(e)}")
         import traceback
         traceback.print_exc()
+        if file_path is not None:
+            # Réponse d'erreur : les tâches de fond ne sont pas exécutées
+            await executor.run(archive.save_file, file_path, filename)
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 
+# ==================== Pipeline Vocal en continu ====================
+
+@router.websocket("/voice-stream")
+async def voice_stream(
+    websocket: WebSocket,
+    sample_rate: int = Query(16000, ge=8000, le=48000),
+    db: DbSession = Depends(get_session),
+):
+    """
+    Micro en continu : trames binaires PCM 16 bits mono (little-endian) à `sample_rate` Hz,
+    {"type": "end"} quand le senior relâche le micro.
+    Réponses : {"type": "vad"}, {"type": "partial"} (texte + intention), {"type": "final"}
+    (même contenu que /process-voice), {"type": "no_speech"}, {"type": "error"}
+    """
+    await websocket.accept()
+
+    async def transcribe(wav: bytes) -> str:
+        with metrics.timer("transcription"):
+            try:
+                return await executor.transcribe(analyzer.transcribe_bytes, wav, archive.new_filename(".wav"))
+            except SilentAudioError:
+                return ""  # → {"type": "no_speech"}
+
+    async def analyze(text: str) -> dict:
+        with metrics.timer("nlp"):
+            return await executor.run(nlp.process, text)
+
+    async def complete(text: str, nlp_result: dict) -> dict:
+        print(f"⚡ Énoncé terminé, action '{nlp_result['intent']}'...")
+        return (await _respond(text, nlp_result, db)).model_dump(mode="json")
+
+    async def emergency(text: str) -> Optional[dict]:
+        fast = await _emergency_fast_path(text)
+        return fast.model_dump(mode="json") if fast is not None else None
+
+    session = StreamingSession(
+        SpeechSegmenter(sample_rate), transcribe, analyze, complete, websocket.send_json, emergency=emergency,
+    )
+    await websocket.send_json({"type": "ready", "sample_rate": sample_rate})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                if message.get("bytes"):
+                    await session.feed(message["bytes"])
+                elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                    await session.end()
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(f"❌ Erreur voice-stream: {e}")
+                await _rollback(db)
+                await websocket.send_json({"type": "error", "detail": f"Erreur: {str(e)}"})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await session.close()
+
+
 # ==================== Pipeline Texte (Actions Rapides) ====================
 
 @router.post("/process-text", response_model=VoiceProcessingResponse)
 async def process_text(
     request: TextCommandRequest,
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_session)
 ):
     """
     Pipeline NLP+Action sans audio (pour les boutons d'actions rapides)
@@ -126,18 +471,41 @@ async def process_text(
 
         print(f"📝 Commande texte: {text}")
 
+        fast = await _emergency_fast_path(text)
+        if fast is not None:
+            return fast
+
         # 1. NLP
-        nlp_result = nlp.process(text)
+        with metrics.timer("nlp"):
+            nlp_result = await executor.run(nlp.process, text)
+
+        # 2. Action + 3. TTS text
+        return await _respond(text, nlp_result, db)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Erreur process-text: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+
+def _apply_text_batch(db: Session, texts: List[str], nlp_results: List[dict]) -> List[VoiceProcessingResponse]:
+    """Actions de /process-text-batch, sans commit intermédiaire (bloquant)"""
+    results = []
+    for text, nlp_result in zip(texts, nlp_results):
+        text = text.strip()
+        if not text:
+            results.append(VoiceProcessingResponse(success=False, action_result="Texte vide"))
+            continue
 
-        # 2. Action
         entities = nlp_result["entities"]
         entities["_raw_text"] = text
-        action_result = action_engine.execute(nlp_result["intent"], entities, db)
+        action_result = action_engine.execute(nlp_result["intent"], entities, db, commit=False)
 
         # 3. TTS text
-        tts_response = tts.generate_response(action_result["response_text"])
+        tts_response = _speak(action_result["response_text"], action_result.get("speech"), prefetch=False)
 
-        return VoiceProcessingResponse(
+        results.append(VoiceProcessingResponse(
             success=action_result["success"],
             transcription=text,
             intent=nlp_result["intent"],
@@ -145,55 +513,103 @@ async def process_text(
             entities=nlp_result["entities"],
             action_result=action_result["response_text"],
             action_data=action_result.get("data", {}),
-            tts_text=tts_response["text"]
+            tts_text=tts_response["text"],
+            tts_audio_url=tts_response["audio_url"],
+            tts_stream_url=tts_response["stream_url"],
+        ))
+    return results
+
+
+@router.post("/process-text-batch", response_model=VoiceBatchResponse)
+async def process_text_batch(
+    request: TextBatchRequest,
+    db: DbSession = Depends(get_session)
+):
+    """
+    Pipeline NLP+Action pour N commandes texte (re-scoring, console aidant)
+    Une seule requête HTTP, une seule session et un seul commit pour tout le lot
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="Lot vide")
+    if len(request.texts) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lot trop grand ({len(request.texts)}). Maximum: {MAX_BATCH_SIZE}"
         )
 
+    try:
+        print(f"📝 Lot de {len(request.texts)} commandes texte")
+        # 1. NLP — normalisation et analyse partagées sur tout le lot
+        with metrics.timer("nlp_batch"):
+            nlp_results = await executor.run(nlp.process_many, request.texts)
+
+        # 2. Actions puis un seul commit
+        results = await _run_db(db, _apply_text_batch, request.texts, nlp_results)
+        with metrics.timer("db_commit"):
+            await _commit(db)
+
+        return VoiceBatchResponse(success=True, count=len(results), results=results)
+
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur process-text: {e}")
+        await _rollback(db)
+        print(f"❌ Erreur process-text-batch: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 
 # ==================== Contacts ====================
 
 @router.get("/contacts", response_model=ContactListResponse)
-async def get_contacts(db: Session = Depends(get_db)):
+async def get_contacts(db: DbSession = Depends(get_session)):
     """Récupérer tous les contacts"""
-    contacts = db.query(Contact).all()
+    contacts = await _run_db(db, lambda s: s.query(Contact).all())
     return ContactListResponse(
         success=True,
         contacts=[ContactResponse.model_validate(c) for c in contacts]
     )
 
 @router.post("/contacts", response_model=ContactResponse)
-async def create_contact(contact: ContactBase, db: Session = Depends(get_db)):
+async def create_contact(contact: ContactBase, db: DbSession = Depends(get_session)):
     """Ajouter un nouveau contact"""
     db_contact = Contact(**contact.model_dump())
     db.add(db_contact)
-    db.commit()
-    db.refresh(db_contact)
+    await _commit(db)
+    await _run_db(db, lambda s: s.refresh(db_contact))
+    contact_index.add(db_contact)
     return ContactResponse.model_validate(db_contact)
 
 
 # ==================== Rappels ====================
 
 @router.get("/reminders", response_model=ReminderListResponse)
-async def get_reminders(db: Session = Depends(get_db)):
+async def get_reminders(db: DbSession = Depends(get_session)):
     """Récupérer tous les rappels"""
-    reminders = db.query(Reminder).order_by(Reminder.reminder_time).all()
+    reminders = await _run_db(db, lambda s: s.query(Reminder).order_by(Reminder.reminder_time).all())
     return ReminderListResponse(
         success=True,
         reminders=[ReminderResponse.model_validate(r) for r in reminders]
     )
 
 
+@router.post("/reminders/{reminder_id}/done", response_model=ReminderResponse)
+async def mark_reminder_done(reminder_id: int, db: DbSession = Depends(get_session)):
+    """Marquer un rappel comme fait (il sort de l'agenda)"""
+    reminder = await _run_db(db, lambda s: s.get(Reminder, reminder_id))
+    if reminder is None:
+        raise HTTPException(status_code=404, detail="Rappel introuvable")
+    reminder.is_done = True
+    await _commit(db)
+    await _run_db(db, lambda s: s.refresh(reminder))
+    return ReminderResponse.model_validate(reminder)
+
+
 # ==================== Médicaments ====================
 
 @router.get("/medications", response_model=MedicationListResponse)
-async def get_medications(db: Session = Depends(get_db)):
+async def get_medications(db: DbSession = Depends(get_session)):
     """Récupérer tous les médicaments"""
-    medications = db.query(Medication).all()
+    medications = await _run_db(db, lambda s: s.query(Medication).all())
     return MedicationListResponse(
         success=True,
         medications=[MedicationResponse.model_validate(m) for m in medications]
@@ -203,63 +619,221 @@ async def get_medications(db: Session = Depends(get_db)):
 # ==================== Messages ====================
 
 @router.get("/messages", response_model=MessageListResponse)
-async def get_messages(db: Session = Depends(get_db)):
+async def get_messages(db: DbSession = Depends(get_session)):
     """Récupérer les messages"""
-    messages = db.query(Message).order_by(Message.created_at.desc()).limit(20).all()
-    result = []
-    for msg in messages:
-        contact = db.query(Contact).filter(Contact.id == msg.contact_id).first() if msg.contact_id else None
-        result.append(MessageResponse(
-            id=msg.id,
-            content=msg.content,
-            contact_id=msg.contact_id,
-            direction=msg.direction,
-            contact_name=contact.name if contact else None,
-            created_at=msg.created_at
-        ))
-    return MessageListResponse(success=True, messages=result)
+    # Expéditeurs chargés dans la même requête (pas de requête par message)
+    messages = await _run_db(db, lambda s: (
+        s.query(Message)
+        .options(joinedload(Message.contact))
+        .order_by(Message.created_at.desc())
+        .limit(20)
+        .all()
+    ))
+    return MessageListResponse(success=True, messages=[_message_response(msg) for msg in messages])
+
+
+def _message_response(msg: Message) -> MessageResponse:
+    return MessageResponse(
+        id=msg.id,
+        content=msg.content,
+        contact_id=msg.contact_id,
+        direction=msg.direction,
+        contact_name=msg.contact.name if msg.contact else None,
+        created_at=msg.created_at
+    )
+
+
+# ==================== Modifications (tableau de bord) ====================
+
+def _load_changes(db: Session, cursor: int, tables: dict) -> ChangesResponse:
+    def rows(model, table, *options):
+        ids = tables.get(table, {}).get("upserted")
+        if not ids:
+            return []
+        return db.query(model).options(*options).filter(model.id.in_(ids)).all()
+
+    return ChangesResponse(
+        success=True,
+        cursor=cursor,
+        contacts=[ContactResponse.model_validate(c) for c in rows(Contact, "contacts")],
+        reminders=[ReminderResponse.model_validate(r) for r in rows(Reminder, "reminders")],
+        medications=[MedicationResponse.model_validate(m) for m in rows(Medication, "medications")],
+        messages=[_message_response(m) for m in rows(Message, "messages", joinedload(Message.contact))],
+        deleted={table: sorted(changed["deleted"]) for table, changed in tables.items() if changed["deleted"]},
+    )
+
+
+@router.get("/changes", response_model=ChangesResponse)
+async def get_changes(since: Optional[int] = Query(None, ge=0), db: DbSession = Depends(get_session)):
+    """Lignes créées, modifiées ou supprimées depuis le curseur `since` (sans `since` : curseur courant)"""
+    # Curseur lu avant les lignes : une écriture concurrente sera renvoyée au prochain appel
+    cursor = change_feed.cursor
+    if since is None:
+        return ChangesResponse(success=True, cursor=cursor)
+    tables = change_feed.since(since)
+    if tables is None:
+        return ChangesResponse(success=True, cursor=cursor, reset=True)
+    if not tables:
+        return ChangesResponse(success=True, cursor=cursor)
+    return await _run_db(db, _load_changes, cursor, tables)
 
 
 # ==================== Agenda ====================
 
+def _agenda_item(entry: AgendaEntry) -> AgendaItem:
+    return AgendaItem(type=entry.type, title=entry.title, time=entry.time, is_done=False)
+
+
+async def _agenda_for(db: DbSession) -> AgendaIndex:
+    """Agenda matérialisé, ou reconstruit depuis la base s'il n'est pas chargé"""
+    if agenda.loaded:
+        return agenda
+
+    def load(s: Session):
+        built = AgendaIndex()
+        built.load(s.query(Reminder).filter(Reminder.is_done == False).all(), s.query(Medication).all())
+        return built
+
+    return await _run_db(db, load)
+
+
 @router.get("/agenda", response_model=AgendaResponse)
-async def get_agenda(db: Session = Depends(get_db)):
-    """Récupérer l'agenda complet (rappels + médicaments)"""
-    items = []
-
-    reminders = db.query(Reminder).filter(Reminder.is_done == False).all()
-    for r in reminders:
-        items.append(AgendaItem(
-            type=r.reminder_type or "reminder",
-            title=r.title,
-            time=r.reminder_time,
-            is_done=r.is_done
-        ))
+async def get_agenda(db: DbSession = Depends(get_session)):
+    """Récupérer l'agenda du jour (rappels + prises de médicaments), trié par heure"""
+    entries = (await _agenda_for(db)).today()
+    return AgendaResponse(success=True, items=[_agenda_item(e) for e in entries])
 
-    medications = db.query(Medication).all()
-    for m in medications:
-        items.append(AgendaItem(
-            type="medication",
-            title=f"{m.name} ({m.dosage})" if m.dosage else m.name,
-            time=m.schedule_time,
-            is_done=False
-        ))
 
-    return AgendaResponse(success=True, items=items)
+@router.get("/agenda/next", response_model=AgendaResponse)
+async def get_agenda_next(limit: int = Query(5, ge=1, le=100), db: DbSession = Depends(get_session)):
+    """Les prochains éléments de l'agenda à partir de maintenant"""
+    entries = (await _agenda_for(db)).upcoming(limit)
+    return AgendaResponse(success=True, items=[_agenda_item(e) for e in entries])
 
 
 # ==================== Historique ====================
 
+def _history_item(h: ActionHistory) -> ActionHistoryItem:
+    try:
+        entities = json.loads(h.entities_json or "{}")
+    except ValueError:
+        entities = {}
+    return ActionHistoryItem(
+        id=h.id,
+        transcription=h.transcription or "",
+        detected_intent=h.detected_intent or "",
+        entities=entities if isinstance(entities, dict) else {},
+        action_result=h.action_result or "",
+        contact=h.contact,
+        success=h.success,
+        created_at=h.created_at,
+    )
+
+
+def _history_range(query, since: Optional[datetime], until: Optional[datetime]):
+    if since is not None:
+        query = query.filter(ActionHistory.created_at >= since)
+    if until is not None:
+        query = query.filter(ActionHistory.created_at < until)
+    return query
+
+
 @router.get("/history", response_model=ActionHistoryResponse)
-async def get_history(db: Session = Depends(get_db)):
-    """Récupérer l'historique des actions"""
-    history = db.query(ActionHistory).order_by(ActionHistory.created_at.desc()).limit(20).all()
+async def get_history(
+    limit: int = Query(20, ge=1, le=200),
+    before: Optional[int] = Query(None, ge=1, description="Curseur : next_cursor de la page précédente"),
+    intent: Optional[str] = None,
+    contact: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: DbSession = Depends(get_session),
+):
+    """
+    Historique des actions, du plus récent au plus ancien, par pages (curseur = id).
+    Filtres : intention, contact (sans casse), période [since, until) en UTC.
+    """
+    def load(s: Session):
+        query = _history_range(s.query(ActionHistory), since, until)
+        if intent:
+            query = query.filter(ActionHistory.detected_intent == intent)
+        if contact:
+            query = query.filter(ActionHistory.contact == contact)
+        if before is not None:
+            query = query.filter(ActionHistory.id < before)
+        return query.order_by(ActionHistory.id.desc()).limit(limit + 1).all()
+
+    rows = await _run_db(db, load)
+    page = rows[:limit]
     return ActionHistoryResponse(
         success=True,
-        history=[ActionHistoryItem.model_validate(h) for h in history]
+        history=[_history_item(h) for h in page],
+        next_cursor=page[-1].id if len(rows) > limit else None,
+    )
+
+
+def _stats_window(since: Optional[datetime]) -> datetime:
+    return since if since is not None else datetime.utcnow() - timedelta(hours=24)
+
+
+# Regroupement sur une expression : sans statistiques (ANALYZE), un GROUP BY sur la colonne
+# ferait choisir à SQLite l'index d'intention puis relire la table ; ici la période est lue
+# dans l'index couvrant (created_at, detected_intent, success)
+_stats_intent = func.coalesce(ActionHistory.detected_intent, "")
+
+
+@router.get("/history/stats/intents-per-hour", response_model=IntentsPerHourResponse)
+async def get_intents_per_hour(
+    since: Optional[datetime] = Query(None, description="UTC, par défaut : il y a 24 h"),
+    until: Optional[datetime] = None,
+    intent: Optional[str] = None,
+    db: DbSession = Depends(get_session),
+):
+    """Nombre de commandes par heure et par intention (index created_at, detected_intent)"""
+    since = _stats_window(since)
+    hour = func.strftime("%Y-%m-%dT%H:00", ActionHistory.created_at)
+
+    def load(s: Session):
+        query = _history_range(s.query(hour, _stats_intent, func.count()), since, until)
+        if intent:
+            query = query.filter(ActionHistory.detected_intent == intent)
+        return query.group_by(hour, _stats_intent).order_by(hour, _stats_intent).all()
+
+    rows = await _run_db(db, load)
+    return IntentsPerHourResponse(
+        success=True,
+        since=since,
+        until=until,
+        buckets=[IntentHourCount(hour=h, intent=i, count=n) for h, i, n in rows],
     )
 
 
+@router.get("/history/stats/failure-rate", response_model=IntentFailureRateResponse)
+async def get_failure_rate(
+    since: Optional[datetime] = Query(None, description="UTC, par défaut : il y a 24 h"),
+    until: Optional[datetime] = None,
+    db: DbSession = Depends(get_session),
+):
+    """Taux d'échec par intention sur la période (index created_at, detected_intent, success)"""
+    since = _stats_window(since)
+    failures = func.sum(case((ActionHistory.success == False, 1), else_=0))
+    known = func.count(ActionHistory.success)
+
+    def load(s: Session):
+        query = s.query(_stats_intent, func.count(), failures, known)
+        return _history_range(query, since, until).group_by(_stats_intent).all()
+
+    rows = await _run_db(db, load)
+    intents = [
+        IntentFailureRate(
+            intent=i, total=total, failures=failed or 0,
+            failure_rate=round((failed or 0) / evaluated, 4) if evaluated else 0.0,
+        )
+        for i, total, failed, evaluated in rows
+    ]
+    intents.sort(key=lambda r: (-r.failure_rate, -r.total))
+    return IntentFailureRateResponse(success=True, since=since, until=until, intents=intents)
+
+
 # ==================== Santé ====================
 
 @router.get("/health")
@@ -271,9 +845,94 @@ async def health_check():
         "version": "1.0.0",
         "timestamp": datetime.now().isoformat(),
         "services": {
-            "whisper": "loaded",
+            "whisper": analyzer.backend.describe(),
             "nlp": "ready",
             "action_engine": "ready",
-            "tts": "ready"
-        }
-    }
\ No newline at end of file
+            "tts": tts.backend.describe(),
+        },
+        "nlp_cache": nlp.cache_stats(),
+        "contact_index": contact_index.stats(),
+        "agenda": agenda.stats(),
+        "scheduler": scheduler.stats(),
+        "notifications": hub.stats(),
+        "history_sink": history_sink.stats(),
+        "change_feed": change_feed.stats(),
+        "pipeline": executor.stats(),
+        "transcription_cache": analyzer.cache.stats() if analyzer.cache else None,
+        "audio_normalizer": analyzer.normalizer.stats(),
+        "silence_trimmer": analyzer.trimmer.stats(),
+        "tts": tts.stats(),
+    }
+
+
+# ==================== Notifications ====================
+
+# Commentaire envoyé sur un flux inactif (proxies, détection de déconnexion)
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """Flux Server-Sent Events : rappels, alarmes, prises de médicaments dus et modifications"""
+    queue = hub.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield _format_sse(event)
+        finally:
+            hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket):
+    """Mêmes événements que /api/events, en JSON sur une WebSocket"""
+    await websocket.accept()
+    queue = hub.subscribe()
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "ping", "time": datetime.now().timestamp()})
+                continue
+            await websocket.send_json(event)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        hub.unsubscribe(queue)
+
+
+# ==================== Métriques ====================
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latences par étape du pipeline + audio coupé par la VAD (format texte Prometheus)"""
+    trimmer = analyzer.trimmer.stats()
+    trimmed = "\n".join([
+        "# HELP seniorvoice_audio_trimmed_seconds_total Secondes de silence coupées avant transcription.",
+        "# TYPE seniorvoice_audio_trimmed_seconds_total counter",
+        f"seniorvoice_audio_trimmed_seconds_total {trimmer['seconds_saved']}",
+    ])
+    return PlainTextResponse(
+        content=metrics.render_prometheus() + trimmed + "\n",
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
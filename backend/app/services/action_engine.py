@@ -3,17 +3,60 @@ Moteur d'actions SeniorVoice
 Exécute les 10 commandes vocales et retourne des réponses textuelles
 """
 
-from typing import Dict, Optional
+import json
+from typing import Dict, List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from ..database import Contact, Reminder, Medication, Message, ActionHistory
+from .agenda_index import AgendaIndex
+from .contact_index import ContactIndex
+from .history_sink import HistorySink
+from .metrics import metrics
+from .speech_templates import SpeechResponse, SpeechTemplate, vocabulary
+
+# Réponses à emplacements : texte identique, segments pour la synthèse segmentée (TTS_MODE=segments)
+PERIODS = ("Bon matin !", "Bon après-midi !", "Bonne soirée !")
+vocabulary("period", PERIODS)
+
+TIME_NOW = SpeechTemplate("Il est actuellement {hour:hour} heures et {minute:minute} minutes. {period:period}")
+TIME_NOW_EXACT = SpeechTemplate("Il est actuellement {hour:hour} heures pile. {period:period}")
+REMINDER_CREATED = SpeechTemplate("D'accord ! J'ai créé un rappel : {title}. Je vous préviendrai au moment voulu.")
+REMINDER_CREATED_AT = SpeechTemplate(
+    "D'accord ! J'ai créé un rappel : {title} à {time:time}. Je vous préviendrai au moment voulu."
+)
+CALLING = SpeechTemplate("J'appelle {name:contact} au {phone}. L'appel est en cours.")
+CONTACT_NOT_FOUND = SpeechTemplate("Je n'ai pas trouvé de contact nommé {name}. Voulez-vous essayer un autre nom ?")
+MEDICATION_ADDED = SpeechTemplate("J'ai ajouté le médicament {name} à votre liste. N'oubliez pas de le prendre !")
+MEDICATION_ADDED_AT = SpeechTemplate(
+    "J'ai ajouté le médicament {name} à prendre à {time:time} à votre liste. N'oubliez pas de le prendre !"
+)
+MESSAGE_CONTENT_NEEDED = SpeechTemplate("Que souhaitez-vous dire à {name:contact} ?")
+MESSAGE_SENT = SpeechTemplate("Message envoyé à {name:contact} : \"{content}\"")
+NO_MESSAGES_FROM = SpeechTemplate("Aucun message de {name:contact} pour le moment.")
+ALARM_SET = SpeechTemplate("L'alarme est réglée pour {time:time}. Je vous réveillerai à l'heure.")
+
+
+def _spoken(response: SpeechResponse, **result) -> Dict:
+    """Résultat d'action à partir d'un gabarit rendu (texte + segments)"""
+    return {"response_text": response.text, "speech": response.segments, **result}
 
 
 class ActionEngine:
     """Moteur d'exécution des commandes vocales"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        contact_index: Optional[ContactIndex] = None,
+        agenda: Optional[AgendaIndex] = None,
+        history: Optional[HistorySink] = None,
+    ):
+        # Index des contacts et agenda du jour en mémoire (sinon requêtes SQL)
+        self.contact_index = contact_index
+        self.agenda = agenda
+        # Historique écrit par lots en tâche de fond (sinon dans la transaction de la requête)
+        self.history = history
         self.action_handlers = {
             "create_reminder": self._handle_create_reminder,
             "call_contact": self._handle_call_contact,
@@ -28,7 +71,7 @@ class ActionEngine:
             "unknown": self._handle_unknown,
         }
 
-    def execute(self, intent: str, entities: Dict, db: Session) -> Dict:
+    def execute(self, intent: str, entities: Dict, db: Session, commit: bool = True) -> Dict:
         """
         Exécuter l'action correspondant à l'intention détectée
 
@@ -36,35 +79,117 @@ class ActionEngine:
             intent: Intention détectée par le NLP
             entities: Entités extraites
             db: Session de base de données
+            commit: False pour laisser l'appelant valider (traitement par lot, un seul commit)
 
         Returns:
             {"success": bool, "response_text": str, "action": str, "data": dict}
+            + "speech" (segments) pour les réponses issues d'un gabarit
         """
-        handler = self.action_handlers.get(intent, self._handle_unknown)
-
         try:
-            result = handler(entities, db)
+            if commit:
+                result = self._apply(db, intent, entities)
+                with metrics.timer("db_commit"):
+                    db.commit()
+            else:
+                # Lot : SAVEPOINT par commande, une action en échec n'est pas validée avec les autres
+                with db.begin_nested():
+                    result = self._apply(db, intent, entities)
 
-            # Sauvegarder dans l'historique
-            history = ActionHistory(
-                transcription=entities.get("_raw_text", ""),
-                detected_intent=intent,
-                entities_json=str(entities),
-                action_result=result.get("response_text", "")
-            )
-            db.add(history)
-            db.commit()
+            self._log_history(intent, entities, result, None if commit else db)
+            return result
 
+        except Exception as e:
+            print(f"❌ Erreur action '{intent}': {e}")
+            if commit:
+                db.rollback()
+            return self._error_result(intent)
+
+    async def execute_async(self, intent: str, entities: Dict, db: AsyncSession, commit: bool = True) -> Dict:
+        """
+        Version asynchrone de execute() pour une AsyncSession (DB_ASYNC=true)
+        Les handlers s'exécutent via run_sync : chaque requête SQL rend la main
+        à la boucle d'événements au lieu de la bloquer.
+        """
+        try:
+            if commit:
+                result = await db.run_sync(self._apply, intent, entities)
+                with metrics.timer("db_commit"):
+                    await db.commit()
+            else:
+                async with db.begin_nested():
+                    result = await db.run_sync(self._apply, intent, entities)
+
+            self._log_history(intent, entities, result, None if commit else db.sync_session)
             return result
 
         except Exception as e:
             print(f"❌ Erreur action '{intent}': {e}")
-            return {
-                "success": False,
-                "response_text": "Désolé, une erreur s'est produite. Veuillez réessayer.",
-                "action": intent,
-                "data": {}
-            }
+            if commit:
+                await db.rollback()
+            return self._error_result(intent)
+
+    def _apply(self, db: Session, intent: str, entities: Dict) -> Dict:
+        """Exécuter le handler (sans commit) ; historique dans la transaction s'il n'est pas différé"""
+        handler = self.action_handlers.get(intent, self._handle_unknown)
+        result = handler(entities, db)
+
+        if self.history is None:
+            # Sauvegarder dans l'historique
+            db.add(ActionHistory(**self.history_row(intent, entities, result)))
+        return result
+
+    @staticmethod
+    def history_row(intent: str, entities: Dict, result: Dict) -> Dict:
+        """Ligne d'historique : entités en JSON (sans les clés internes), contact résolu si connu"""
+        data = result.get("data") or {}
+        public = {k: v for k, v in entities.items() if not k.startswith("_")}
+        contact = data.get("contact_name") or data.get("contact") or public.get("contact")
+        return {
+            "transcription": entities.get("_raw_text", ""),
+            "detected_intent": intent,
+            "entities_json": json.dumps(public, ensure_ascii=False, default=str),
+            "action_result": result.get("response_text", ""),
+            "contact": contact if isinstance(contact, str) and contact else None,
+            "success": bool(result.get("success")),
+            "created_at": datetime.utcnow(),
+        }
+
+    def _log_history(self, intent: str, entities: Dict, result: Dict, db: Optional[Session] = None) -> None:
+        """Historique différé : en file une fois l'action validée (au commit de `db` pour un lot)"""
+        if self.history is None:
+            return
+        row = self.history_row(intent, entities, result)
+        if db is None:
+            self.history.add(row)
+        else:
+            self.history.defer(db, row)
+
+    def execute_emergency(self, entities: Dict) -> Optional[Dict]:
+        """
+        Chemin rapide de l'alerte d'urgence : contacts d'urgence en mémoire, aucune
+        requête ni commit, historique différé.
+        None si l'index des contacts n'est pas chargé ou l'historique pas différé (passer par execute()).
+        """
+        if self.contact_index is None or not self.contact_index.loaded or self.history is None:
+            return None
+        result = self._handle_emergency_alert(entities, None)
+        self._log_history("emergency_alert", entities, result)
+        return result
+
+    @staticmethod
+    def _error_result(intent: str) -> Dict:
+        return {
+            "success": False,
+            "response_text": "Désolé, une erreur s'est produite. Veuillez réessayer.",
+            "action": intent,
+            "data": {}
+        }
+
+    def _find_contact(self, name: str, db: Session):
+        """Contact désigné par son nom — index en mémoire si chargé, sinon requête SQL"""
+        if self.contact_index is not None and self.contact_index.loaded:
+            return self.contact_index.resolve(name)
+        return db.query(Contact).filter(Contact.name.ilike(f"%{name}%")).first()
 
     # ==================== Handlers ====================
 
@@ -87,15 +212,15 @@ class ActionEngine:
             reminder_type="general"
         )
         db.add(reminder)
-        db.commit()
-
-        time_text = f" à {time}" if time else ""
-        return {
-            "success": True,
-            "response_text": f"D'accord ! J'ai créé un rappel : {title}{time_text}. Je vous préviendrai au moment voulu.",
-            "action": "create_reminder",
-            "data": {"reminder_id": reminder.id, "title": title, "time": time}
-        }
+        db.flush()
+
+        response = REMINDER_CREATED_AT.render(title=title, time=time) if time else REMINDER_CREATED.render(title=title)
+        return _spoken(
+            response,
+            success=True,
+            action="create_reminder",
+            data={"reminder_id": reminder.id, "title": title, "time": time},
+        )
 
     def _handle_call_contact(self, entities: Dict, db: Session) -> Dict:
         """Appeler un contact"""
@@ -113,24 +238,22 @@ class ActionEngine:
             }
 
         # Chercher le contact
-        contact = db.query(Contact).filter(
-            Contact.name.ilike(f"%{contact_name}%")
-        ).first()
+        contact = self._find_contact(contact_name, db)
 
         if contact:
-            return {
-                "success": True,
-                "response_text": f"J'appelle {contact.name} au {contact.phone}. L'appel est en cours.",
-                "action": "call_contact",
-                "data": {"contact_name": contact.name, "phone": contact.phone}
-            }
+            return _spoken(
+                CALLING.render(name=contact.name, phone=contact.phone),
+                success=True,
+                action="call_contact",
+                data={"contact_name": contact.name, "phone": contact.phone},
+            )
         else:
-            return {
-                "success": False,
-                "response_text": f"Je n'ai pas trouvé de contact nommé {contact_name}. Voulez-vous essayer un autre nom ?",
-                "action": "call_contact",
-                "data": {"searched": contact_name}
-            }
+            return _spoken(
+                CONTACT_NOT_FOUND.render(name=contact_name),
+                success=False,
+                action="call_contact",
+                data={"searched": contact_name},
+            )
 
     def _handle_get_weather(self, entities: Dict, db: Session) -> Dict:
         """Donner la météo (simulée pour la démo)"""
@@ -158,27 +281,27 @@ class ActionEngine:
         hour = now.strftime("%H")
         minute = now.strftime("%M")
 
-        # Format naturel
-        if int(minute) == 0:
-            time_text = f"{hour} heures pile"
-        else:
-            time_text = f"{hour} heures et {minute} minutes"
-
         # Ajouter contexte de la journée
         h = int(hour)
         if h < 12:
-            period = "Bon matin !"
+            period = PERIODS[0]
         elif h < 18:
-            period = "Bon après-midi !"
+            period = PERIODS[1]
         else:
-            period = "Bonne soirée !"
+            period = PERIODS[2]
 
-        return {
-            "success": True,
-            "response_text": f"Il est actuellement {time_text}. {period}",
-            "action": "get_time",
-            "data": {"time": now.strftime("%H:%M"), "period": period}
-        }
+        # Format naturel
+        if int(minute) == 0:
+            response = TIME_NOW_EXACT.render(hour=hour, period=period)
+        else:
+            response = TIME_NOW.render(hour=hour, minute=minute, period=period)
+
+        return _spoken(
+            response,
+            success=True,
+            action="get_time",
+            data={"time": now.strftime("%H:%M"), "period": period},
+        )
 
     def _handle_add_medication(self, entities: Dict, db: Session) -> Dict:
         """Ajouter un médicament"""
@@ -200,29 +323,30 @@ class ActionEngine:
             notes=""
         )
         db.add(medication)
-        db.commit()
+        db.flush()
 
-        time_text = f" à prendre à {time}" if time else ""
-        return {
-            "success": True,
-            "response_text": f"J'ai ajouté le médicament {med_name}{time_text} à votre liste. N'oubliez pas de le prendre !",
-            "action": "add_medication",
-            "data": {"medication_id": medication.id, "name": med_name}
-        }
+        if time:
+            response = MEDICATION_ADDED_AT.render(name=med_name, time=time)
+        else:
+            response = MEDICATION_ADDED.render(name=med_name)
+        return _spoken(
+            response,
+            success=True,
+            action="add_medication",
+            data={"medication_id": medication.id, "name": med_name},
+        )
 
     def _handle_read_messages(self, entities: Dict, db: Session) -> Dict:
         """Lire les messages — supporte le filtrage par nom de contact"""
         contact_filter = entities.get("contact", "").strip()
 
-        # Construire la requête de base
-        query = db.query(Message).order_by(Message.created_at.desc())
+        # Construire la requête de base — expéditeurs chargés dans la même requête
+        query = db.query(Message).options(joinedload(Message.contact)).order_by(Message.created_at.desc())
 
         # Si un nom de contact est mentionné, filtrer par ce contact
         filtered_contact = None
         if contact_filter:
-            filtered_contact = db.query(Contact).filter(
-                Contact.name.ilike(f"%{contact_filter}%")
-            ).first()
+            filtered_contact = self._find_contact(contact_filter, db)
             if filtered_contact:
                 query = query.filter(Message.contact_id == filtered_contact.id)
             # Si le contact n'existe pas, on montre tous les messages quand même
@@ -239,12 +363,15 @@ class ActionEngine:
 
         if not messages:
             if contact_filter and filtered_contact:
-                response_text = f"Aucun message de {filtered_contact.name} pour le moment."
-            else:
-                response_text = "Vous n'avez aucun message pour le moment."
+                return _spoken(
+                    NO_MESSAGES_FROM.render(name=filtered_contact.name),
+                    success=True,
+                    action="read_messages",
+                    data={"messages": []},
+                )
             return {
                 "success": True,
-                "response_text": response_text,
+                "response_text": "Vous n'avez aucun message pour le moment.",
                 "action": "read_messages",
                 "data": {"messages": []}
             }
@@ -252,8 +379,7 @@ class ActionEngine:
         msg_texts = []
         msg_data = []
         for msg in messages:
-            contact = db.query(Contact).filter(Contact.id == msg.contact_id).first() if msg.contact_id else None
-            sender = contact.name if contact else "Inconnu"
+            sender = msg.contact.name if msg.contact else "Inconnu"
             direction = "de" if msg.direction == "received" else "envoyé à"
             msg_texts.append(f"Message {direction} {sender} : {msg.content}")
             msg_data.append({
@@ -290,17 +416,15 @@ class ActionEngine:
             }
 
         if not content:
-            return {
-                "success": False,
-                "response_text": f"Que souhaitez-vous dire à {contact_name} ?",
-                "action": "send_message",
-                "data": {"needs": "message_content", "contact": contact_name}
-            }
+            return _spoken(
+                MESSAGE_CONTENT_NEEDED.render(name=contact_name),
+                success=False,
+                action="send_message",
+                data={"needs": "message_content", "contact": contact_name},
+            )
 
         # Trouver le contact
-        contact = db.query(Contact).filter(
-            Contact.name.ilike(f"%{contact_name}%")
-        ).first()
+        contact = self._find_contact(contact_name, db)
 
         contact_id = contact.id if contact else None
         display_name = contact.name if contact else contact_name
@@ -311,14 +435,14 @@ class ActionEngine:
             direction="sent"
         )
         db.add(message)
-        db.commit()
+        db.flush()
 
-        return {
-            "success": True,
-            "response_text": f"Message envoyé à {display_name} : \"{content}\"",
-            "action": "send_message",
-            "data": {"contact": display_name, "content": content}
-        }
+        return _spoken(
+            MESSAGE_SENT.render(name=display_name, content=content),
+            success=True,
+            action="send_message",
+            data={"contact": display_name, "content": content},
+        )
 
     def _handle_set_alarm(self, entities: Dict, db: Session) -> Dict:
         """Mettre une alarme"""
@@ -339,29 +463,28 @@ class ActionEngine:
             reminder_type="alarm"
         )
         db.add(reminder)
-        db.commit()
+        db.flush()
 
-        return {
-            "success": True,
-            "response_text": f"L'alarme est réglée pour {time}. Je vous réveillerai à l'heure.",
-            "action": "set_alarm",
-            "data": {"time": time, "reminder_id": reminder.id}
-        }
+        return _spoken(
+            ALARM_SET.render(time=time),
+            success=True,
+            action="set_alarm",
+            data={"time": time, "reminder_id": reminder.id},
+        )
 
     def _handle_check_agenda(self, entities: Dict, db: Session) -> Dict:
-        """Consulter l'agenda"""
-        # Rappels non faits
-        reminders = db.query(Reminder).filter(Reminder.is_done == False).all()
-        # Médicaments
-        medications = db.query(Medication).all()
+        """Consulter l'agenda — créneaux du jour triés par heure"""
+        if self.agenda is not None and self.agenda.loaded:
+            agenda = self.agenda
+        else:
+            # Pas d'agenda matérialisé : le construire depuis la base (rappels non faits + médicaments)
+            agenda = AgendaIndex()
+            agenda.load(db.query(Reminder).filter(Reminder.is_done == False).all(), db.query(Medication).all())
 
         items = []
-        if reminders:
-            for r in reminders:
-                items.append(f"Rappel : {r.title} à {r.reminder_time}")
-        if medications:
-            for m in medications:
-                items.append(f"Médicament : {m.name} ({m.schedule_time})")
+        for entry in agenda.today():
+            label = "Médicament" if entry.kind == "medication" else "Rappel"
+            items.append(f"{label} : {entry.title} à {entry.time}")
 
         if not items:
             return {
@@ -372,18 +495,25 @@ class ActionEngine:
             }
 
         response_text = f"Voici votre programme : {'. '.join(items)}."
+        counts = agenda.counts()
 
         return {
             "success": True,
             "response_text": response_text,
             "action": "check_agenda",
-            "data": {"reminders": len(reminders), "medications": len(medications), "items": items}
+            "data": {"reminders": counts["reminders"], "medications": counts["medications"], "items": items}
         }
 
-    def _handle_emergency_alert(self, entities: Dict, db: Session) -> Dict:
+    def _emergency_contacts(self, db: Optional[Session]) -> List:
+        """Contacts d'urgence — index en mémoire si chargé, sinon requête SQL"""
+        if self.contact_index is not None and self.contact_index.loaded:
+            return self.contact_index.emergency_contacts()
+        return db.query(Contact).filter(Contact.is_emergency == True).all()
+
+    def _handle_emergency_alert(self, entities: Dict, db: Optional[Session]) -> Dict:
         """Alerte d'urgence"""
         # Récupérer les contacts d'urgence
-        emergency_contacts = db.query(Contact).filter(Contact.is_emergency == True).all()
+        emergency_contacts = self._emergency_contacts(db)
 
         contacts_info = []
         for c in emergency_contacts:
@@ -0,0 +1,177 @@
+"""
+Agenda du jour SeniorVoice, matérialisé en mémoire
+Les rappels non faits et les prises de médicaments (« 08:00, 13:00, 20:00 » → trois
+créneaux) sont gardés triés par heure : /api/agenda et « mon programme » ne relisent
+plus les tables, et « les N prochains » se résout par dichotomie.
+
+Mise à jour incrémentale à chaque commit qui crée, modifie ou supprime un rappel ou un
+médicament (événements de session SQLAlchemy, voir watch()).
+"""
+
+import bisect
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+
+from ..database import Medication, Reminder, track_savepoints
+
+# Modifications transmises aux abonnés : (kind, source_id, nouveaux créneaux) ; None = rechargement complet
+AgendaChanges = Optional[List[Tuple[str, int, List["AgendaEntry"]]]]
+
+# 8h, 8h30, 08:00, 20 h 15
+_TIME_RE = re.compile(r"(\d{1,2})\s*[hH:]\s*(\d{2})?")
+
+
+class AgendaEntry(NamedTuple):
+    minutes: int        # minutes depuis minuit (-1 = heure non définie)
+    kind: str           # "reminder" | "medication"
+    source_id: int
+    type: str           # reminder_type, ou "medication"
+    title: str
+    time: str           # "08:00", ou le texte d'origine si l'heure n'est pas lisible
+
+
+def parse_times(value: Optional[str]) -> List[int]:
+    """« 08:00, 13:00, 20:00 » → [480, 780, 1200] (minutes depuis minuit, triées)"""
+    slots = set()
+    for match in _TIME_RE.finditer(value or ""):
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        if 0 <= hour <= 23 and 0 <= minute <= 59:
+            slots.add(hour * 60 + minute)
+    return sorted(slots)
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def reminder_entries(reminder) -> List[AgendaEntry]:
+    if reminder.is_done:
+        return []
+    slots = parse_times(reminder.reminder_time)
+    kind_type = reminder.reminder_type or "reminder"
+    if not slots:
+        return [AgendaEntry(-1, "reminder", reminder.id, kind_type, reminder.title, reminder.reminder_time or "")]
+    return [AgendaEntry(m, "reminder", reminder.id, kind_type, reminder.title, format_minutes(m)) for m in slots]
+
+
+def medication_entries(medication) -> List[AgendaEntry]:
+    title = f"{medication.name} ({medication.dosage})" if medication.dosage else medication.name
+    slots = parse_times(medication.schedule_time)
+    if not slots:
+        return [AgendaEntry(-1, "medication", medication.id, "medication", title, medication.schedule_time or "")]
+    return [AgendaEntry(m, "medication", medication.id, "medication", title, format_minutes(m)) for m in slots]
+
+
+class AgendaIndex:
+    """Créneaux du jour triés par heure, mis à jour à chaque commit"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: List[AgendaEntry] = []  # triés (minutes, kind, source_id)
+        self._by_source: Dict[Tuple[str, int], List[AgendaEntry]] = {}
+        self._listeners: List[Callable[[AgendaChanges], None]] = []
+        self.loaded = False
+
+    # ------------------------------------------------------------------
+    #  MISE À JOUR
+    # ------------------------------------------------------------------
+    def subscribe(self, callback: Callable[[AgendaChanges], None]) -> None:
+        """Être prévenu de chaque modification appliquée (planificateur)"""
+        self._listeners.append(callback)
+
+    def _notify(self, changes: AgendaChanges) -> None:
+        for callback in self._listeners:
+            callback(changes)
+
+    def load(self, reminders: Iterable, medications: Iterable) -> None:
+        """(Re)construire l'agenda depuis les tables reminders et medications"""
+        entries = []
+        by_source: Dict[Tuple[str, int], List[AgendaEntry]] = {}
+        for kind, rows, builder in (("reminder", reminders, reminder_entries),
+                                    ("medication", medications, medication_entries)):
+            for row in rows:
+                source_entries = builder(row)
+                if source_entries:
+                    by_source[(kind, row.id)] = source_entries
+                    entries.extend(source_entries)
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._by_source = by_source
+            self.loaded = True
+        self._notify(None)
+
+    def apply(self, changes: Iterable[Tuple[str, int, List[AgendaEntry]]]) -> None:
+        """Remplacer les créneaux de chaque source modifiée (liste vide = supprimée / faite)"""
+        changes = list(changes)
+        with self._lock:
+            for kind, source_id, entries in changes:
+                for old in self._by_source.pop((kind, source_id), []):
+                    index = bisect.bisect_left(self._entries, old)
+                    if index < len(self._entries) and self._entries[index] == old:
+                        del self._entries[index]
+                if entries:
+                    self._by_source[(kind, source_id)] = entries
+                    for entry in entries:
+                        bisect.insort(self._entries, entry)
+        self._notify(changes)
+
+    def watch(self, session_class) -> None:
+        """Suivre les commits d'une classe de session (rappels / médicaments créés, faits, supprimés)"""
+        builders = {Reminder: ("reminder", reminder_entries), Medication: ("medication", medication_entries)}
+        info_key = ("agenda_changes", id(self))  # un agenda par clé : plusieurs agendas peuvent suivre la même session
+
+        @event.listens_for(session_class, "after_flush")
+        def _collect(session, flush_context):
+            # Instantané pendant le flush : après le commit les attributs sont expirés
+            pending = session.info.setdefault(info_key, [])
+            for obj in list(session.new) + list(session.dirty):
+                builder = builders.get(type(obj))
+                if builder:
+                    pending.append((builder[0], obj.id, builder[1](obj)))
+            for obj in session.deleted:
+                builder = builders.get(type(obj))
+                if builder:
+                    pending.append((builder[0], obj.id, []))
+
+        @event.listens_for(session_class, "after_commit")
+        def _apply(session):
+            if session.in_nested_transaction():
+                return  # RELEASE SAVEPOINT d'un lot : attendre le vrai commit
+            changes = session.info.pop(info_key, None)
+            if changes and self.loaded:
+                self.apply(changes)
+
+        track_savepoints(session_class, info_key)
+
+    # ------------------------------------------------------------------
+    #  REQUÊTES
+    # ------------------------------------------------------------------
+    def today(self) -> List[AgendaEntry]:
+        """Tout l'agenda du jour, par heure (heures non définies à la fin)"""
+        with self._lock:
+            first_timed = bisect.bisect_left(self._entries, (0,))
+            return self._entries[first_timed:] + self._entries[:first_timed]
+
+    def upcoming(self, limit: int = 5, now: Optional[datetime] = None) -> List[AgendaEntry]:
+        """Les `limit` prochains créneaux à partir de maintenant"""
+        now = now or datetime.now()
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (now.hour * 60 + now.minute,))
+            return self._entries[start:start + limit]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            reminders = sum(1 for kind, _source_id in self._by_source if kind == "reminder")
+            return {"reminders": reminders, "medications": len(self._by_source) - reminders}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"loaded": self.loaded, "slots": len(self._entries), "sources": len(self._by_source)}
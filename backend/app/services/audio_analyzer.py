@@ -1,47 +1,82 @@
 """
-Service de transcription audio avec GROQ (Whisper Large v3)
-Remplace le Whisper local (base) par l'API Groq — gratuit, plus rapide, plus précis.
+Service de transcription audio SeniorVoice
+Moteur configurable : API Groq (Whisper Large v3) ou Whisper local hors ligne (CPU)
+— voir transcription_backends.py
 
-Setup:
+Setup Groq:
     pip install groq
     Créer un compte sur https://console.groq.com → API Keys → créer une clé
     Ajouter dans .env :  GROQ_API_KEY=gsk_xxxxxxxxxxxxxxxx
+
+Setup local (hors ligne):
+    pip install faster-whisper
+    Ajouter dans .env :  TRANSCRIPTION_BACKEND=local
+
+Les formats non natifs et les gros uploads passent par la normalisation FFmpeg
+(mono 16 kHz, Opus/FLAC) — voir audio_normalizer.py. Les silences sont coupés avant
+l'envoi, et un enregistrement sans parole est rejeté (SilentAudioError) sans appel
+au moteur — voir silence_trimmer.py.
 """
 
+import functools
+import io
 import os
-import subprocess
-from groq import Groq
+import wave
+from typing import Callable, Optional, Tuple, Union
+
+from .audio_normalizer import SAMPLE_RATE, SEEKABLE_ONLY, AudioNormalizationError, AudioNormalizer
+from .silence_trimmer import SilenceTrimmer, TrimResult
+from .wav_utils import pcm_to_wav
+from .transcription_backends import TranscriptionBackend, create_backend
+from .transcription_cache import TranscriptionCache
+from .metrics import metrics
+
+TRANSCRIPTION_PROMPT = (
+    "Transcription spécialisée pour seniors tunisiens (Hackathon SeniorVoice). "
+    "Le locuteur peut avoir une voix tremblante ou faible, bafouiller, hésiter (euh, bah, ben, mmm), "
+    "ou faire des pauses. Il mélange souvent le français et l'arabe dialectal tunisien (darija). "
+    "Mots courants : rappel, médicament, Doliprane, météo, agenda, urgence, "
+    "نحب نعيط، ذكرني، شنوة الطقس، قداش الساعة، عاوني، نجدة. "
+    "Transcrivez exactement ce qui est dit en tolérant les hésitations."
+)
+
+# En dessous, l'audio d'origine part tel quel (le réencodage coûterait plus qu'il ne rapporte)
+MIN_TRIM_SAVED_SECONDS = 0.5
+
 
 class VoiceAnalyzer:
-    """Service de transcription audio via Groq API (Whisper Large v3)"""
-
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "❌ GROQ_API_KEY manquant !\n"
-                "1. Inscrivez-vous gratuitement sur https://console.groq.com\n"
-                "2. Allez dans API Keys → créez une clé\n"
-                "3. Ajoutez dans votre .env :  GROQ_API_KEY=gsk_xxxxxxxx"
-            )
-        self.client = Groq(api_key=api_key)
-
-        # Modèle recommandé — whisper-large-v3 = meilleure précision (FR + AR)
-        # Alternative plus rapide : whisper-large-v3-turbo
-        self.model = os.getenv("GROQ_WHISPER_MODEL", "whisper-large-v3")
-
-        self.ffmpeg_path = self._find_ffmpeg()
-
-        print(f"✅ Groq Whisper initialisé — modèle: {self.model}")
-        if self.ffmpeg_path:
-            print(f"✅ FFmpeg trouvé: {self.ffmpeg_path}")
+    """Service de transcription audio (moteur Groq ou local selon la configuration)"""
+
+    def __init__(
+        self,
+        backend: Optional[TranscriptionBackend] = None,
+        cache: Optional[TranscriptionCache] = None,
+        normalizer: Optional[AudioNormalizer] = None,
+        trimmer: Optional[SilenceTrimmer] = None,
+    ):
+        self.backend = backend or create_backend()
+        self.model = self.backend.model
+
+        # Cache par empreinte audio (TRANSCRIPTION_CACHE_ENABLED=false pour désactiver)
+        if cache is None and os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"):
+            cache = TranscriptionCache()
+        self.cache = cache
+
+        self.normalizer = normalizer or AudioNormalizer()
+        self.ffmpeg_path = self.normalizer.ffmpeg_path
+        self.trimmer = trimmer or SilenceTrimmer()
+
+        print(f"✅ Transcription initialisée — moteur: {self.backend.describe()}")
+        if self.normalizer.available:
+            print(f"✅ FFmpeg trouvé: {self.ffmpeg_path} — normalisation {self.normalizer.describe()}")
         else:
-            print("⚠️  FFmpeg non trouvé — conversion audio limitée")
+            print("⚠️  FFmpeg non trouvé ou désactivé — formats natifs uniquement, sans normalisation")
+        print(f"✅ Découpage des silences : {self.trimmer.describe()}")
 
     # ------------------------------------------------------------------
     def transcribe(self, audio_path: str) -> str:
         """
-        Transcrire un fichier audio via l'API Groq.
+        Transcrire un fichier audio.
         Supporte WAV, MP3, WebM, OGG, M4A, FLAC, MP4.
         """
         if not os.path.exists(audio_path):
@@ -54,77 +89,144 @@ class VoiceAnalyzer:
         if file_size < 100:
             raise ValueError("Fichier audio trop petit ou vide")
 
-        # Groq accepte nativement : flac, mp3, mp4, mpeg, mpga, m4a, ogg, wav, webm
-        # Pour les autres formats, convertir en wav
-        wav_path = None
-        try:
-            needs_conversion = ext not in {".flac", ".mp3", ".mp4", ".m4a", ".ogg", ".wav", ".webm", ".mpeg", ".mpga"}
-            if needs_conversion:
-                wav_path = self._convert_to_wav(audio_path)
-                transcribe_path = wav_path
-            else:
-                transcribe_path = audio_path
-
-            # Groq limite les fichiers à 25 Mo (free) — vérifier
-            if os.path.getsize(transcribe_path) > 25 * 1024 * 1024:
-                print("⚠️  Fichier > 25 Mo, conversion en wav 16kHz pour réduire la taille...")
-                wav_path = self._convert_to_wav(transcribe_path)
-                transcribe_path = wav_path
-
-            with open(transcribe_path, "rb") as audio_file:
-                response = self.client.audio.transcriptions.create(
-                    file=(os.path.basename(transcribe_path), audio_file),
-                    model=self.model,
-                    # Ne PAS forcer la langue — Groq détecte automatiquement FR et AR
-                    # Si vous voulez forcer : language="fr" ou language="ar"
-                    prompt=(
-                        "Transcription spécialisée pour seniors tunisiens (Hackathon SeniorVoice). "
-                        "Le locuteur peut avoir une voix tremblante ou faible, bafouiller, hésiter (euh, bah, ben, mmm), "
-                        "ou faire des pauses. Il mélange souvent le français et l'arabe dialectal tunisien (darija). "
-                        "Mots courants : rappel, médicament, Doliprane, météo, agenda, urgence, "
-                        "نحب نعيط، ذكرني، شنوة الطقس، قداش الساعة، عاوني، نجدة. "
-                        "Transcrivez exactement ce qui est dit en tolérant les hésitations."
-                    ),
-                    response_format="text",
-                    temperature=0.0,  # 0 = plus déterministe, meilleur pour commandes vocales
-                )
-
-            # response est une str quand response_format="text"
-            transcription = str(response).strip()
-            print(f"✅ Transcription : {transcription[:120]}...")
-            return transcription
+        if self.cache is not None:
+            with open(audio_path, "rb") as f:
+                key = self._cache_key(f)
+            return self.cache.get_or_transcribe(key, lambda: self._transcribe_path(audio_path, ext))
+        return self._transcribe_path(audio_path, ext)
 
+    def _transcribe_path(self, audio_path: str, ext: str) -> str:
+        try:
+            return self._transcribe_audio(audio_path, ext, os.path.basename(audio_path))
         except Exception as e:
-            print(f"❌ Erreur Groq : {e}")
+            print(f"❌ Erreur transcription ({self.backend.name}) : {e}")
             raise
-        finally:
-            if wav_path and os.path.exists(wav_path) and wav_path != audio_path:
-                try:
-                    os.remove(wav_path)
-                except OSError:
-                    pass
 
-    # ------------------------------------------------------------------
-    def _find_ffmpeg(self) -> str:
-        """Trouver FFmpeg (système ou imageio-ffmpeg)"""
-        # Système
+    def _transcribe_audio(self, source: Union[bytes, str], ext: str, filename: str) -> str:
+        """
+        Découpage des silences, normalisation éventuelle, puis appel au moteur.
+        source : buffer en mémoire ou chemin (FFmpeg lit alors le fichier, résultat en mémoire).
+        """
+        in_memory = isinstance(source, (bytes, bytearray))
+        size = len(source) if in_memory else os.path.getsize(source)
+
+        trimmed = self._trim(source, ext)
+        if trimmed is not None and trimmed.saved_seconds >= MIN_TRIM_SAVED_SECONDS:
+            wav = pcm_to_wav(trimmed.pcm, trimmed.sample_rate)
+            if self.normalizer.available and self.backend.remote:
+                audio = self._normalize(lambda: self.normalizer.normalize(wav), len(wav), ".wav")
+                if audio is not None:
+                    return self._request_transcription(self._normalized_name(filename), audio)
+            return self._request_transcription(os.path.splitext(filename)[0] + ".wav", wav)
+
+        if self._should_normalize(size, ext) and not (in_memory and ext in SEEKABLE_ONLY):
+            convert = self.normalizer.normalize if in_memory else self.normalizer.normalize_file
+            audio = self._normalize(functools.partial(convert, source), size, ext)
+            if audio is not None:
+                return self._request_transcription(self._normalized_name(filename), audio)
+        elif not self.backend.accepts(size, ext):
+            raise ValueError(f"Format ou taille non supporté sans FFmpeg : {ext}, {size} bytes")
+
+        if in_memory:
+            return self._request_transcription(filename, source)
+        with open(source, "rb") as audio_file:
+            return self._request_transcription(filename, audio_file)
+
+    def _trim(self, source: Union[bytes, str], ext: str) -> Optional[TrimResult]:
+        """Silences coupés (SilentAudioError sans parole) ; None si l'audio ne peut pas être décodé"""
+        if not self.trimmer.enabled:
+            return None
+        decoded = self._decode_pcm(source, ext)
+        if decoded is None:
+            return None
+        with metrics.timer("vad"):
+            result = self.trimmer.trim(*decoded)
+        print(f"✂️  Silences coupés : {result.original_seconds:.1f} s → {result.kept_seconds:.1f} s "
+              f"({result.saved_seconds:.1f} s économisées)")
+        return result
+
+    def _decode_pcm(self, source: Union[bytes, str], ext: str) -> Optional[Tuple[bytes, int]]:
+        """PCM 16 bits mono : WAV lu directement, autres formats décodés par FFmpeg"""
+        if ext == ".wav":
+            try:
+                with wave.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as wav:
+                    if wav.getsampwidth() == 2 and wav.getcomptype() == "NONE":
+                        frames = wav.readframes(wav.getnframes())
+                        return self.trimmer.downmix(frames, wav.getnchannels()), wav.getframerate()
+            except (wave.Error, EOFError):
+                pass
+        if not self.normalizer.available:
+            return None
+        try:
+            return self.normalizer.decode(source), SAMPLE_RATE
+        except AudioNormalizationError as e:
+            print(f"⚠️  Décodage impossible, silences conservés : {e}")
+            return None
+
+    def _should_normalize(self, size: int, ext: str) -> bool:
+        """Conversion obligatoire (format ou taille refusés) ou utile (gros upload vers un moteur distant)"""
+        if not self.normalizer.available:
+            return False
+        if not self.backend.accepts(size, ext):
+            return True
+        return self.backend.remote and size >= self.normalizer.min_bytes
+
+    def _normalize(self, convert: Callable[[], bytes], size: int, ext: str) -> Optional[bytes]:
+        """Audio normalisé ; None si la conversion échoue mais que l'original est accepté tel quel"""
         try:
-            result = subprocess.run(["ffmpeg", "-version"], capture_output=True, timeout=5)
-            if result.returncode == 0:
-                return "ffmpeg"
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            pass
+            with metrics.timer("conversion"):
+                audio = convert()
+        except AudioNormalizationError as e:
+            if self.backend.accepts(size, ext):
+                print(f"⚠️  Normalisation ignorée, audio envoyé tel quel : {e}")
+                return None
+            raise
+        print(f"🗜️  Audio normalisé : {size} → {len(audio)} bytes ({size / max(len(audio), 1):.1f}x)")
+        return audio
+
+    def _normalized_name(self, filename: str) -> str:
+        return os.path.splitext(os.path.basename(filename))[0] + self.normalizer.extension
+
+    # ------------------------------------------------------------------
+    def can_transcribe_bytes(self, size: int, ext: str) -> bool:
+        """Le buffer peut-il être transcrit sans fichier : format natif, ou normalisé via un pipe FFmpeg ?"""
+        if self.backend.accepts(size, ext):
+            return True
+        # Format à convertir : en mémoire ; fichier trop gros pour le moteur : sur disque
+        too_big = self.backend.max_bytes is not None and size > self.backend.max_bytes
+        return self.normalizer.available and ext not in SEEKABLE_ONLY and not too_big
+
+    def transcribe_bytes(self, data: bytes, filename: str) -> str:
+        """
+        Transcrire un buffer audio en mémoire (aucune écriture disque).
+        Formats natifs, ou normalisés par FFmpeg (stdin → stdout) — voir can_transcribe_bytes().
+        """
+        ext = os.path.splitext(filename)[1].lower()
+        print(f"📂 Transcription (mémoire) : {filename} ({ext}, {len(data)} bytes)")
+
+        if len(data) < 100:
+            raise ValueError("Fichier audio trop petit ou vide")
+        if not self.can_transcribe_bytes(len(data), ext):
+            raise ValueError(f"Format ou taille non supporté en mémoire : {ext}, {len(data)} bytes")
+
+        def run() -> str:
+            return self._transcribe_audio(data, ext, filename)
 
-        # imageio-ffmpeg
         try:
-            import imageio_ffmpeg
-            path = imageio_ffmpeg.get_ffmpeg_exe()
-            if os.path.exists(path):
-                ffmpeg_dir = os.path.dirname(path)
-                if ffmpeg_dir not in os.environ.get("PATH", ""):
-                    os.environ["PATH"] = ffmpeg_dir + os.pathsep + os.environ.get("PATH", "")
-                return path
-        except ImportError:
-            pass
-
-        return None
\ No newline at end of file
+            # Clé sur l'audio reçu : un doublon ne repasse ni par FFmpeg ni par le découpage
+            if self.cache is not None:
+                return self.cache.get_or_transcribe(self._cache_key(data), run)
+            return run()
+        except Exception as e:
+            print(f"❌ Erreur transcription ({self.backend.name}) : {e}")
+            raise
+
+    def _cache_key(self, audio) -> str:
+        return TranscriptionCache.make_key(audio, f"{self.backend.name}:{self.model}", TRANSCRIPTION_PROMPT)
+
+    # ------------------------------------------------------------------
+    def _request_transcription(self, filename: str, audio) -> str:
+        """Appel au moteur de transcription — audio : fichier ouvert ou bytes"""
+        transcription = self.backend.transcribe(filename, audio, prompt=TRANSCRIPTION_PROMPT).strip()
+        print(f"✅ Transcription : {transcription[:120]}...")
+        return transcription
@@ -0,0 +1,85 @@
+"""
+Archivage optionnel des enregistrements SeniorVoice
+Écriture en tâche de fond, dossier plafonné en taille (les plus anciens sont supprimés)
+
+Configuration (.env) :
+    AUDIO_ARCHIVE_ENABLED=false     # true pour conserver les enregistrements
+    AUDIO_ARCHIVE_MAX_MB=500        # taille maximale du dossier d'archive
+"""
+
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Optional
+
+
+class AudioArchive:
+    """Archive d'enregistrements audio, bornée en taille"""
+
+    def __init__(self, directory: str, enabled: Optional[bool] = None, max_bytes: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv("AUDIO_ARCHIVE_ENABLED", "false").lower() in ("1", "true", "yes")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("AUDIO_ARCHIVE_MAX_MB", "500")) * 1024 * 1024)
+        self.directory = directory
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            print(f"✅ Archive audio activée: {self.directory} (max {self.max_bytes // (1024 * 1024)} Mo)")
+
+    def new_filename(self, ext: str) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        return f"senior_{timestamp}{ext}"
+
+    def save(self, data: bytes, filename: str) -> Optional[str]:
+        """Écrire un enregistrement en mémoire puis faire respecter le plafond (tâche de fond)"""
+        if not self.enabled or len(data) > self.max_bytes:
+            return None
+        path = os.path.join(self.directory, filename)
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+            self._prune()
+            return path
+        except OSError as e:
+            print(f"⚠️ Archivage impossible ({filename}): {e}")
+            return None
+
+    def save_file(self, source_path: str, filename: str) -> Optional[str]:
+        """Déplacer un fichier temporaire dans l'archive (ou le supprimer si l'archive est désactivée)"""
+        try:
+            if not self.enabled or os.path.getsize(source_path) > self.max_bytes:
+                os.remove(source_path)
+                return None
+            path = os.path.join(self.directory, filename)
+            shutil.move(source_path, path)
+            self._prune()
+            return path
+        except OSError as e:
+            print(f"⚠️ Archivage impossible ({filename}): {e}")
+            return None
+
+    def _prune(self) -> None:
+        """Supprimer les enregistrements les plus anciens au-delà de max_bytes"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
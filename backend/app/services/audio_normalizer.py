@@ -0,0 +1,201 @@
+"""
+Normalisation audio SeniorVoice (FFmpeg, sans fichier temporaire)
+Avant la transcription, l'audio est réduit au strict nécessaire pour Whisper :
+mono, 16 kHz, compressé en Opus (Ogg, 24 kb/s) ou en FLAC. FFmpeg lit l'upload sur
+stdin (ou le fichier déjà sur disque) et écrit le résultat sur stdout.
+
+Un WAV 44,1 kHz stéréo de téléphone passe ainsi de ~170 Ko/s à ~3 Ko/s (Opus) avant
+d'être envoyé au moteur. Les conversions tournent sur un pool borné (un thread FFmpeg
+par conversion, AUDIO_NORMALIZE_WORKERS conversions à la fois) : une rafale d'uploads
+ne sature pas le CPU.
+
+Configuration (.env) :
+    AUDIO_NORMALIZE=true                # false = audio envoyé tel quel (formats natifs)
+    AUDIO_NORMALIZE_CODEC=opus          # opus | flac
+    AUDIO_NORMALIZE_BITRATE=24k         # débit Opus
+    AUDIO_NORMALIZE_WORKERS=0           # conversions simultanées (0 = nombre de cœurs)
+    AUDIO_NORMALIZE_MIN_BYTES=262144    # en dessous, un format natif part sans conversion
+    AUDIO_NORMALIZE_TIMEOUT_S=30
+
+Setup :
+    apt install ffmpeg    (ou pip install imageio-ffmpeg)
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+SAMPLE_RATE = 16000
+
+# Conteneurs dont l'index peut se trouver en fin de fichier : illisibles depuis un pipe
+SEEKABLE_ONLY = {".mp4", ".m4a"}
+
+CODECS = {
+    "opus": (".ogg", ["-c:a", "libopus", "-application", "voip", "-f", "ogg"]),
+    "flac": (".flac", ["-c:a", "flac", "-sample_fmt", "s16", "-f", "flac"]),
+}
+
+
+class AudioNormalizationError(RuntimeError):
+    """FFmpeg absent, en échec ou trop lent"""
+
+
+def find_ffmpeg() -> Optional[str]:
+    """Trouver FFmpeg (système ou imageio-ffmpeg) sans lancer de processus"""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        path = imageio_ffmpeg.get_ffmpeg_exe()
+        if os.path.exists(path):
+            return path
+    except (ImportError, RuntimeError):
+        pass
+    return None
+
+
+class AudioNormalizer:
+    """Conversion mono 16 kHz via FFmpeg (pipes), au plus `workers` conversions à la fois"""
+
+    def __init__(
+        self,
+        ffmpeg_path: Optional[str] = None,
+        codec: Optional[str] = None,
+        bitrate: Optional[str] = None,
+        workers: Optional[int] = None,
+        min_bytes: Optional[int] = None,
+        timeout: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        if enabled is None:
+            enabled = os.getenv("AUDIO_NORMALIZE", "true").lower() in ("1", "true", "yes")
+        if codec is None:
+            codec = os.getenv("AUDIO_NORMALIZE_CODEC", "opus").lower()
+        if codec not in CODECS:
+            raise ValueError(f"❌ AUDIO_NORMALIZE_CODEC inconnu : {codec} (choix : {', '.join(CODECS)})")
+        if workers is None:
+            workers = int(os.getenv("AUDIO_NORMALIZE_WORKERS", "0"))
+        if min_bytes is None:
+            min_bytes = int(os.getenv("AUDIO_NORMALIZE_MIN_BYTES", "262144"))
+        if timeout is None:
+            timeout = float(os.getenv("AUDIO_NORMALIZE_TIMEOUT_S", "30"))
+        self.ffmpeg_path = (ffmpeg_path or find_ffmpeg()) if enabled else None
+        self.codec = codec
+        self.extension, self._codec_args = CODECS[codec]
+        self.bitrate = bitrate or os.getenv("AUDIO_NORMALIZE_BITRATE", "24k")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.min_bytes = min_bytes
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+
+        self.conversions = 0
+        self.failures = 0
+        self.active = 0
+        self.waiting = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg_path is not None
+
+    def describe(self) -> str:
+        if not self.available:
+            return "désactivée"
+        return f"{self.codec} mono {SAMPLE_RATE // 1000} kHz, {self.workers} conversions simultanées"
+
+    def command(self, source: str = "pipe:0", pcm: bool = False) -> List[str]:
+        """Ligne de commande FFmpeg : compression (codec configuré) ou PCM 16 bits brut (pcm=True)"""
+        if pcm:
+            output = ["-c:a", "pcm_s16le", "-f", "s16le"]
+        else:
+            output = list(self._codec_args)
+            if self.codec == "opus":
+                output[-2:-2] = ["-b:a", self.bitrate]
+        return [
+            self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostats",
+            "-i", source,
+            "-vn", "-map_metadata", "-1", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            *output, "-threads", "1", "pipe:1",
+        ]
+
+    # ------------------------------------------------------------------
+    def normalize(self, data: bytes) -> bytes:
+        """Buffer audio (tout format lisible en flux) → audio normalisé, stdin → stdout"""
+        return self._convert(self.command("pipe:0"), data, len(data))
+
+    def normalize_file(self, path: str) -> bytes:
+        """Fichier déjà sur disque (MP4/M4A compris) → audio normalisé en mémoire"""
+        return self._convert(self.command(path), None, os.path.getsize(path))
+
+    def decode(self, source: Union[bytes, str]) -> bytes:
+        """Buffer ou chemin → PCM 16 bits mono 16 kHz (découpage des silences)"""
+        if isinstance(source, (bytes, bytearray)):
+            return self._convert(self.command("pipe:0", pcm=True), bytes(source), len(source), compress=False)
+        return self._convert(self.command(source, pcm=True), None, os.path.getsize(source), compress=False)
+
+    def _convert(self, cmd: List[str], data: Optional[bytes], size: int, compress: bool = True) -> bytes:
+        if not self.available:
+            raise AudioNormalizationError("FFmpeg introuvable — conversion audio impossible")
+        with self._lock:
+            self.waiting += 1
+        with self._slots:
+            with self._lock:
+                self.waiting -= 1
+                self.active += 1
+            start = time.perf_counter()
+            try:
+                output = self._spawn(cmd, data)
+            except AudioNormalizationError:
+                with self._lock:
+                    self.failures += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self._seconds += time.perf_counter() - start
+        with self._lock:
+            self.conversions += 1
+            if compress:  # taux de compression : décodages PCM exclus
+                self.bytes_in += size
+                self.bytes_out += len(output)
+        return output
+
+    def _spawn(self, cmd: List[str], data: Optional[bytes]) -> bytes:
+        try:
+            result = subprocess.run(
+                cmd,
+                input=data,
+                stdin=None if data is not None else subprocess.DEVNULL,
+                capture_output=True,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            raise AudioNormalizationError(f"FFmpeg : délai dépassé ({self.timeout:.0f} s)") from e
+        except OSError as e:
+            raise AudioNormalizationError(f"FFmpeg : {e}") from e
+        if result.returncode != 0 or not result.stdout:
+            error = result.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise AudioNormalizationError(f"FFmpeg ({result.returncode}) : {error[-1] if error else 'sortie vide'}")
+        return result.stdout
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.available,
+            "codec": self.codec,
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "conversions": self.conversions,
+            "failures": self.failures,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_in / self.bytes_out, 1) if self.bytes_out else 0.0,
+            "avg_ms": round(self._seconds * 1000 / self.conversions, 1) if self.conversions else 0.0,
+        }
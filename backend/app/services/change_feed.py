@@ -0,0 +1,103 @@
+"""
+Journal des modifications SeniorVoice (contacts, rappels, médicaments, messages)
+Chaque commit d'une session de l'application qui écrit dans ces tables :
+- reçoit un numéro (curseur) et est gardé dans un journal circulaire en mémoire
+- est annoncé aux clients connectés (événement "change" du NotificationHub)
+
+Le tableau de bord ne relit plus les listes complètes : il demande
+GET /api/changes?since=<curseur> et ne reçoit que les lignes modifiées.
+
+Configuration (.env) :
+    CHANGE_FEED_SIZE=1000     # modifications gardées ; au-delà, le client recharge tout
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+from ..database import Contact, Medication, Message, Reminder, track_savepoints
+from .notifications import NotificationHub
+
+# Tables suivies (modèle → nom exposé aux clients)
+TRACKED_TABLES = {Contact: "contacts", Reminder: "reminders", Medication: "medications", Message: "messages"}
+
+
+class ChangeFeed:
+    """Curseur + journal circulaire des lignes insérées, modifiées ou supprimées"""
+
+    def __init__(self, hub: Optional[NotificationHub] = None, size: Optional[int] = None):
+        if size is None:
+            size = int(os.getenv("CHANGE_FEED_SIZE", "1000"))
+        self.hub = hub
+        # (curseur, table, opération, id)
+        self._log: Deque[Tuple[int, str, str, int]] = deque(maxlen=max(size, 1))
+        self._cursor = 0
+        self._evicted = 0  # dernier curseur (même en partie) sorti du journal
+        self._lock = threading.Lock()
+
+    @property
+    def cursor(self) -> int:
+        return self._cursor
+
+    def record(self, changes: List[Tuple[str, str, int]]) -> int:
+        """Journaliser les modifications d'un commit et les annoncer"""
+        with self._lock:
+            self._cursor += 1
+            cursor = self._cursor
+            for table, op, row_id in changes:
+                if len(self._log) == self._log.maxlen:
+                    self._evicted = self._log[0][0]
+                self._log.append((cursor, table, op, row_id))
+        if self.hub is not None:
+            self.hub.publish("change", {
+                "cursor": cursor,
+                "changes": [{"table": table, "op": op, "id": row_id} for table, op, row_id in changes],
+            })
+        return cursor
+
+    def since(self, cursor: int) -> Optional[Dict[str, Dict[str, Set[int]]]]:
+        """Lignes modifiées après `cursor` par table, ou None si le journal ne remonte plus jusque-là"""
+        with self._lock:
+            if cursor > self._cursor or cursor < self._evicted:
+                return None
+            tables: Dict[str, Dict[str, Set[int]]] = {}
+            for entry_cursor, table, op, row_id in self._log:
+                if entry_cursor <= cursor:
+                    continue
+                changed = tables.setdefault(table, {"upserted": set(), "deleted": set()})
+                if op == "delete":
+                    changed["upserted"].discard(row_id)
+                    changed["deleted"].add(row_id)
+                else:
+                    changed["deleted"].discard(row_id)
+                    changed["upserted"].add(row_id)
+            return tables
+
+    def watch(self, session_class) -> None:
+        """Suivre les commits d'une classe de session"""
+        info_key = ("change_feed", id(self))
+
+        @event.listens_for(session_class, "after_flush")
+        def _collect(session, flush_context):
+            pending = session.info.setdefault(info_key, [])
+            for objects, op in ((session.new, "insert"), (session.dirty, "update"), (session.deleted, "delete")):
+                for obj in objects:
+                    table = TRACKED_TABLES.get(type(obj))
+                    if table and (op != "update" or session.is_modified(obj)):
+                        pending.append((table, op, obj.id))
+
+        @event.listens_for(session_class, "after_commit")
+        def _record(session):
+            if session.in_nested_transaction():
+                return  # RELEASE SAVEPOINT d'un lot : attendre le vrai commit
+            changes = session.info.pop(info_key, None)
+            if changes:
+                self.record(changes)
+
+        track_savepoints(session_class, info_key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cursor": self._cursor, "logged": len(self._log), "size": self._log.maxlen}
@@ -0,0 +1,242 @@
+"""
+Index des contacts SeniorVoice, en mémoire
+Remplace les recherches `Contact.name.ilike('%nom%')` (parcours complet de la table) :
+- clés normalisées (minuscules, sans accents, arabe translittéré) → recherche O(1)
+- squelette consonantique commun aux deux écritures (محمد ↔ Mohamed)
+- trigrammes pour les variantes et fautes de transcription (Mohamad, Fatima)
+
+Chargé depuis la table `contacts` au démarrage, mis à jour à chaque POST /api/contacts.
+Partagé par le NLP (contact cité dans la phrase) et le moteur d'actions.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+# Translittération arabe → latin (graphie tunisienne courante)
+_ARABIC_TO_LATIN = {
+    "ا": "a", "أ": "a", "إ": "i", "آ": "a", "ى": "a", "ة": "a", "ء": "", "ئ": "i", "ؤ": "ou",
+    "ب": "b", "ت": "t", "ث": "t", "ج": "j", "ح": "h", "خ": "kh", "د": "d", "ذ": "d",
+    "ر": "r", "ز": "z", "س": "s", "ش": "ch", "ص": "s", "ض": "d", "ط": "t", "ظ": "z",
+    "ع": "a", "غ": "gh", "ف": "f", "ق": "k", "ك": "k", "ل": "l", "م": "m", "ن": "n",
+    "ه": "h", "و": "ou", "ي": "i", "پ": "p", "ڤ": "v", "ڨ": "g",
+}
+# Proclitiques collés au nom : لمحمد, بفاطمة, ولعلي
+_ARABIC_PREFIXES = ("وال", "بال", "لل", "ال", "ول", "ل", "ب", "و")
+# Mots qui ne désignent pas un contact à eux seuls
+_STOP_TOKENS = {
+    "dr", "docteur", "doctor", "mr", "mme", "m", "madame", "monsieur", "mademoiselle",
+    "si", "sidi", "lalla", "el", "al", "ben", "bin", "bent", "de", "du", "la", "le",
+}
+
+_ARABIC_RE = re.compile(r"[؀-ۿ]")
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_VOWELS_RE = re.compile(r"[aeiouyw]")
+_DOUBLED_RE = re.compile(r"(.)\1+")
+
+# Similarité minimale (Dice sur trigrammes) pour une correspondance approchée
+FUZZY_THRESHOLD = 0.5
+
+
+class ContactEntry(NamedTuple):
+    id: int
+    name: str
+    phone: str
+    relation: str
+    is_emergency: bool
+
+
+def _transliterate(token: str) -> str:
+    if not _ARABIC_RE.search(token):
+        return token
+    if len(token) > 2 and token.endswith("ه"):
+        token = token[:-1] + "ة"  # فاطمه → فاطمة
+    return "".join(_ARABIC_TO_LATIN.get(char, char) for char in token)
+
+
+def _raw_tokens(text: str) -> List[str]:
+    """Minuscules, sans accents ni diacritiques arabes (écriture d'origine conservée)"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text)
+
+
+def fold_tokens(text: str) -> List[str]:
+    """Mots normalisés et translittérés en latin : « Fatma », « فاطمة » → ["fatma"]"""
+    return [_transliterate(token) for token in _raw_tokens(text)]
+
+
+def skeleton(key: str) -> str:
+    """Squelette consonantique : mohamed, mohammed, محمد → mhmd"""
+    key = key.replace(" ", "").replace("sh", "ch").replace("dj", "j").replace("q", "k").replace("ph", "f")
+    return _DOUBLED_RE.sub(r"\1", _VOWELS_RE.sub("", key))
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ContactIndex:
+    """Contacts indexés par nom normalisé, squelette et trigrammes"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[], None]] = []
+        self.loaded = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._contacts: Dict[int, ContactEntry] = {}
+        self._keys: Dict[str, Set[int]] = {}
+        self._skeletons: Dict[str, Set[int]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    # La copie envoyée aux workers du pool de processus (NLP par lot) n'a ni verrou ni abonnés
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_listeners"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    #  MISE À JOUR
+    # ------------------------------------------------------------------
+    def subscribe(self, callback: Callable[[], None]) -> None:
+        """Être prévenu de chaque modification (invalidation de cache)"""
+        self._listeners.append(callback)
+
+    def load(self, contacts: Iterable) -> None:
+        """(Re)construire l'index à partir des lignes de la table contacts"""
+        with self._lock:
+            self._reset()
+            for contact in contacts:
+                self._index(contact)
+            self.loaded = True
+        self._notify()
+
+    def add(self, contact) -> None:
+        """Indexer un contact créé (POST /api/contacts)"""
+        with self._lock:
+            self._index(contact)
+            self.loaded = True
+        self._notify()
+
+    def _index(self, contact) -> None:
+        entry = ContactEntry(
+            id=contact.id,
+            name=contact.name,
+            phone=contact.phone,
+            relation=contact.relation or "",
+            is_emergency=bool(contact.is_emergency),
+        )
+        self._contacts[entry.id] = entry
+        tokens = fold_tokens(entry.name)
+        # Nom complet et toutes ses sous-séquences : "dr ben said", "ben said", "said"
+        for start in range(len(tokens)):
+            for end in range(start + 1, len(tokens) + 1):
+                window = tokens[start:end]
+                if len(window) == 1 and window[0] in _STOP_TOKENS:
+                    continue
+                key = " ".join(window)
+                self._keys.setdefault(key, set()).add(entry.id)
+                self._skeletons.setdefault(skeleton(key), set()).add(entry.id)
+                for gram in trigrams(key):
+                    self._trigrams.setdefault(gram, set()).add(key)
+
+    def _notify(self) -> None:
+        for callback in self._listeners:
+            callback()
+
+    # ------------------------------------------------------------------
+    #  RECHERCHE
+    # ------------------------------------------------------------------
+    def _pick(self, ids: Set[int]) -> ContactEntry:
+        # Homonymes : le premier contact enregistré
+        return self._contacts[min(ids)]
+
+    def resolve(self, name: str) -> Optional[ContactEntry]:
+        """Contact désigné par `name` : exact, puis squelette, puis trigrammes"""
+        tokens = [t for t in fold_tokens(name) if t not in _STOP_TOKENS] or fold_tokens(name)
+        if not tokens:
+            return None
+        key = " ".join(tokens)
+        with self._lock:
+            ids = self._keys.get(key) or self._skeletons.get(skeleton(key))
+            if ids:
+                return self._pick(ids)
+            return self._fuzzy(key)
+
+    def _fuzzy(self, key: str) -> Optional[ContactEntry]:
+        grams = trigrams(key)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        # Coefficient de Dice entre les trigrammes de la requête et ceux de chaque clé candidate
+        best = max(
+            ((2 * count / (len(grams) + len(trigrams(candidate))), candidate) for candidate, count in shared.items()),
+            default=None,
+        )
+        if best is None or best[0] < FUZZY_THRESHOLD:
+            return None
+        return self._pick(self._keys[best[1]])
+
+    def find_in_text(self, text: str) -> Optional[ContactEntry]:
+        """Premier contact cité dans une phrase (« appelle Mohamed », « عيطلي لمحمد »)"""
+        raw_tokens = _raw_tokens(text)
+        tokens = [_transliterate(token) for token in raw_tokens]
+        with self._lock:
+            if not self._contacts:
+                return None
+            for i in range(len(tokens)):
+                # Noms composés d'abord (« ben said »), puis le mot seul
+                for n in (3, 2):
+                    ids = self._keys.get(" ".join(tokens[i:i + n])) if i + n <= len(tokens) else None
+                    if ids:
+                        return self._pick(ids)
+                for key in self._token_variants(raw_tokens[i], tokens[i]):
+                    if key in _STOP_TOKENS:
+                        continue
+                    ids = self._keys.get(key)
+                    if not ids and len(skeleton(key)) >= 3:
+                        ids = self._skeletons.get(skeleton(key))
+                    if ids:
+                        return self._pick(ids)
+        return None
+
+    @staticmethod
+    def _token_variants(raw: str, folded: str) -> List[str]:
+        variants = [folded]
+        if _ARABIC_RE.search(raw):
+            for prefix in _ARABIC_PREFIXES:
+                if raw.startswith(prefix) and len(raw) - len(prefix) >= 3:
+                    variants.append(fold_tokens(raw[len(prefix):])[0])
+        return variants
+
+    # ------------------------------------------------------------------
+    def emergency_contacts(self) -> List[ContactEntry]:
+        """Contacts d'urgence, dans l'ordre d'enregistrement (alerte sans requête SQL)"""
+        with self._lock:
+            return sorted(entry for entry in self._contacts.values() if entry.is_emergency)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return [entry.name for entry in sorted(self._contacts.values())]
+
+    def __len__(self) -> int:
+        return len(self._contacts)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "contacts": len(self._contacts),
+                "keys": len(self._keys),
+                "trigrams": len(self._trigrams),
+            }
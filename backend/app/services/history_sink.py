@@ -0,0 +1,275 @@
+"""
+Écriture différée de l'historique des actions SeniorVoice
+ActionEngine ne fait plus de INSERT action_history dans la transaction de la requête :
+les lignes sont mises en file et insérées par lots (executemany, un seul commit) par
+une tâche de fond — dès qu'un lot est plein, ou au plus tard après l'intervalle.
+Les commandes en lecture seule (heure, météo, agenda) n'écrivent plus rien.
+
+File pleine (base bloquée, rafale) : les lignes en trop sont écrites dans un fichier
+JSONL et rejouées au démarrage suivant, ou abandonnées si HISTORY_SPILL_FILE est vide.
+La file est vidée à l'arrêt de l'application (lifespan).
+
+Commandes d'un lot validées par l'appelant (commit=False) : les lignes attendent le
+commit de la session (after_commit) et sont abandonnées si elle est annulée.
+
+Configuration (.env) :
+    HISTORY_BATCH_SIZE=200              # lignes par INSERT groupé
+    HISTORY_FLUSH_INTERVAL_MS=250       # attente maximale avant écriture
+    HISTORY_MAX_QUEUE=10000             # lignes en attente au-delà desquelles on déborde
+    HISTORY_SPILL_FILE=database/history_spill.jsonl   # vide = abandon
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy import event, insert
+
+from ..database import ActionHistory, DATABASE_DIR, track_savepoints
+from .metrics import metrics
+
+DEFAULT_SPILL_FILE = os.path.join(DATABASE_DIR, "history_spill.jsonl")
+
+
+class HistorySink:
+    """File bornée d'entrées d'historique + tâche asyncio d'insertion par lots"""
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        batch_size: Optional[int] = None,
+        interval_ms: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        spill_path: Optional[str] = None,
+        runner: Optional[Callable[..., Awaitable[Any]]] = None,
+    ):
+        if batch_size is None:
+            batch_size = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+        if interval_ms is None:
+            interval_ms = int(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "250"))
+        if max_queue is None:
+            max_queue = int(os.getenv("HISTORY_MAX_QUEUE", "10000"))
+        if spill_path is None:
+            spill_path = os.getenv("HISTORY_SPILL_FILE", DEFAULT_SPILL_FILE)
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.interval = interval_ms / 1000
+        self.max_queue = max(self.batch_size, max_queue)
+        self.spill_path = spill_path or None
+        # Exécution des INSERT bloquants (pool du pipeline dans l'application)
+        self.runner = runner or asyncio.to_thread
+
+        self._queue: Deque[Dict] = deque()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flushing: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watched: tuple = ()
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self._flush_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    #  PRODUCTEURS (n'importe quel thread)
+    # ------------------------------------------------------------------
+    def add(self, row: Dict) -> None:
+        """Mettre une ligne d'historique en file (colonnes d'ActionHistory)"""
+        row.setdefault("created_at", datetime.utcnow())
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                overflow = True
+            else:
+                overflow = False
+                self._queue.append(row)
+                depth = len(self._queue)
+                self.max_depth = max(self.max_depth, depth)
+        if overflow:
+            self._overflow([row])
+            return
+        # Premier élément (démarre l'intervalle) ou lot complet (écriture immédiate)
+        if depth == 1 or depth == self.batch_size:
+            self._wake()
+
+    def defer(self, session, row: Dict) -> None:
+        """Mettre une ligne en file au commit de la session (sans suivi : tout de suite)"""
+        if not isinstance(session, self._watched):
+            self.add(row)
+            return
+        session.info.setdefault(("history_pending", id(self)), []).append(row)
+
+    def watch(self, session_class) -> None:
+        """Suivre les commits d'une classe de session (lignes différées par defer())"""
+        info_key = ("history_pending", id(self))
+        self._watched += (session_class,)
+
+        @event.listens_for(session_class, "after_commit")
+        def _enqueue(session):
+            if session.in_nested_transaction():
+                return  # RELEASE SAVEPOINT d'un lot : attendre le vrai commit
+            for row in session.info.pop(info_key, ()):
+                self.add(row)
+
+        track_savepoints(session_class, info_key)
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _overflow(self, rows: List[Dict]) -> None:
+        """File pleine ou écriture en échec : fichier de débordement, sinon abandon"""
+        if self.spill_path:
+            try:
+                with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n")
+                self.spilled += len(rows)
+                return
+            except OSError as e:
+                print(f"⚠️ Débordement de l'historique impossible ({self.spill_path}): {e}")
+        self.dropped += len(rows)
+
+    # ------------------------------------------------------------------
+    #  CYCLE DE VIE (lifespan)
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Démarrer la tâche d'écriture (depuis la boucle d'événements)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._flushing = asyncio.Lock()
+        self._replay_spill()
+        self._task = self._loop.create_task(self._run())
+        if self._queue:
+            self._wakeup.set()
+        print(f"✅ Historique différé — lots de {self.batch_size}, toutes les {self.interval * 1000:.0f} ms")
+
+    async def stop(self) -> None:
+        """Arrêter la tâche et écrire tout ce qui reste en file"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await self.flush()
+        print(f"✅ Historique vidé à l'arrêt ({written} lignes)")
+
+    def _replay_spill(self) -> None:
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            os.replace(self.spill_path, replay_path)
+        rows = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("created_at"):
+                    row["created_at"] = datetime.fromisoformat(row["created_at"])
+                # Débordement d'une version antérieure (INSERT groupé : mêmes colonnes partout)
+                row.setdefault("contact", None)
+                row.setdefault("success", None)
+                rows.append(row)
+        with self._lock:
+            self._queue.extendleft(reversed(rows))
+            self.max_depth = max(self.max_depth, len(self._queue))
+        os.remove(replay_path)
+        self.replayed += len(rows)
+        print(f"✅ Historique débordé rejoué : {len(rows)} lignes")
+
+    # ------------------------------------------------------------------
+    #  ÉCRITURE
+    # ------------------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if len(self._queue) < self.batch_size:
+                # Laisser le lot se remplir, au plus `interval`
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            await self.flush()
+
+    def _take(self) -> List[Dict]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    async def flush(self) -> int:
+        """Écrire toute la file, lot par lot ; retourne le nombre de lignes traitées"""
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        total = 0
+        async with self._flushing:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return total
+                await self.runner(self._write, batch)
+                total += len(batch)
+
+    def _write(self, batch: List[Dict]) -> None:
+        """INSERT groupé + un commit (bloquant)"""
+        start = time.perf_counter()
+        try:
+            with self.session_factory() as db:
+                db.execute(insert(ActionHistory), batch)
+                db.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Écriture de l'historique en échec ({len(batch)} lignes): {e}")
+            self._overflow(batch)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.last_flush_ms = elapsed * 1000
+            self._flush_seconds += elapsed
+            metrics.observe("history_flush", elapsed)
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "errors": self.errors,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._flush_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,83 @@
+"""
+Automate Aho-Corasick pour SeniorVoice
+Recherche simultanée de tous les mots-clés (FR + AR) en un seul passage sur le texte
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """Automate multi-motifs : trouve tous les mots-clés présents dans un texte en O(n)"""
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        # Chaque état : transitions, lien d'échec, sorties (mots-clés se terminant ici)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, int]]] = [[]]
+        self._built = False
+        for kw in keywords:
+            self.add(kw)
+
+    def add(self, keyword: str) -> None:
+        """Ajouter un mot-clé (à appeler avant build)"""
+        if not keyword:
+            return
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        if all(kw != keyword for kw, _ in self._out[state]):
+            self._out[state].append((keyword, len(keyword)))
+        self._built = False
+
+    def build(self) -> "KeywordAutomaton":
+        """Calculer les liens d'échec (parcours en largeur) et fusionner les sorties"""
+        queue = list(self._goto[0].values())
+        for s in queue:
+            self._fail[s] = 0
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # Les sorties du suffixe le plus long sont aussi des sorties de cet état
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def find(self, text: str) -> Tuple[Set[str], Set[str]]:
+        """
+        Parcourir le texte une seule fois
+
+        Returns:
+            (mots-clés présents, mots-clés présents en début de texte)
+        """
+        if not self._built:
+            self.build()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[str] = set()
+        at_start: Set[str] = set()
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for kw, length in out[state]:
+                    found.add(kw)
+                    if length == i + 1:
+                        at_start.add(kw)
+        return found, at_start
@@ -0,0 +1,122 @@
+"""
+Métriques de latence SeniorVoice
+Histogrammes en mémoire par étape du pipeline (upload, conversion, transcription,
+NLP, action, commit, TTS), exposés au format texte Prometheus sur /api/metrics
+et, en option, dans l'en-tête Server-Timing de chaque réponse.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Bornes des histogrammes (secondes)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Étapes mesurées pendant la requête en cours (pour Server-Timing)
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "seniorvoice_request_timings", default=None
+)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # dernière case : +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """Registre des histogrammes de latence, un par étape"""
+
+    def __init__(self, name: str = "seniorvoice_stage_duration_seconds", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> Histogram:
+        hist = self._histograms.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(stage, Histogram(self.buckets))
+        return hist
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.histogram(stage).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Mesurer un bloc : `with metrics.timer("nlp"): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def render_prometheus(self) -> str:
+        """Format d'exposition texte Prometheus (0.0.4)"""
+        lines = [
+            f"# HELP {self.name} Durée des étapes du pipeline SeniorVoice.",
+            f"# TYPE {self.name} histogram",
+        ]
+        # Copie sous le verrou : une première mesure d'une étape peut arriver d'un thread du pool
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        for stage, hist in histograms:
+            counts, total, count = hist.snapshot()
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+# ──────────────────────────────────────────────────────────────────────
+#  SERVER-TIMING — étapes de la requête en cours
+# ──────────────────────────────────────────────────────────────────────
+
+def start_request_timings() -> contextvars.Token:
+    """Démarrer la collecte pour une requête (middleware)"""
+    return _request_timings.set([])
+
+
+def end_request_timings(token: contextvars.Token) -> List[Tuple[str, float]]:
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def format_server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Ex. : transcription;dur=812.4, nlp;dur=0.3"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
+
+
+metrics = MetricsRegistry()
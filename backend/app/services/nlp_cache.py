@@ -0,0 +1,176 @@
+"""
+Cache LRU des résultats NLP pour SeniorVoice
+Les actions rapides envoient sans cesse les mêmes phrases : on garde le résultat
+(intent, entités, confiance) par texte normalisé, avec invalidation automatique
+dès que la configuration du NLP change.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class NLPResultCache:
+    """Cache LRU borné, thread-safe, avec compteurs hits / misses / évictions"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retourne une copie profonde de la valeur en cache, ou None"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Any) -> None:
+        """Stocke une copie profonde (l'appelant peut modifier sa propre valeur)"""
+        if self.maxsize <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Vider le cache (configuration NLP modifiée)"""
+        with self._lock:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # Le verrou ne se sérialise pas (pool de processus de process_many) : cache vide côté worker
+    def __getstate__(self):
+        return {"maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxsize"])
+
+
+# ──────────────────────────────────────────────────────────────────────
+#  CONTENEURS SURVEILLÉS — signalent toute modification en place
+# ──────────────────────────────────────────────────────────────────────
+
+def track(value: Any, on_change: Callable[[], None]) -> Any:
+    """Envelopper récursivement dicts et listes pour être prévenu de leurs modifications"""
+    if isinstance(value, dict):
+        return TrackedDict(value, on_change)
+    if isinstance(value, list):
+        return TrackedList(value, on_change)
+    return value
+
+
+def _notifying(base: type, name: str):
+    def method(self, *args, **kwargs):
+        result = getattr(base, name)(self, *args, **kwargs)
+        self._on_change()
+        return result
+    method.__name__ = name
+    return method
+
+
+class TrackedList(list):
+    """Liste qui appelle on_change après chaque modification"""
+
+    def __init__(self, iterable=(), on_change: Callable[[], None] = lambda: None):
+        self._on_change = on_change
+        super().__init__(track(v, on_change) for v in iterable)
+
+    def __reduce__(self):
+        return (TrackedList, (list(self), self._on_change))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [track(v, self._on_change) for v in value]
+        else:
+            value = track(value, self._on_change)
+        super().__setitem__(index, value)
+        self._on_change()
+
+    def append(self, value):
+        super().append(track(value, self._on_change))
+        self._on_change()
+
+    def insert(self, index, value):
+        super().insert(index, track(value, self._on_change))
+        self._on_change()
+
+    def extend(self, values):
+        super().extend(track(v, self._on_change) for v in values)
+        self._on_change()
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    __delitem__ = _notifying(list, "__delitem__")
+    __imul__ = _notifying(list, "__imul__")
+    remove = _notifying(list, "remove")
+    pop = _notifying(list, "pop")
+    clear = _notifying(list, "clear")
+    sort = _notifying(list, "sort")
+    reverse = _notifying(list, "reverse")
+
+
+class TrackedDict(dict):
+    """Dictionnaire qui appelle on_change après chaque modification"""
+
+    def __init__(self, mapping=(), on_change: Callable[[], None] = lambda: None):
+        self._on_change = on_change
+        super().__init__((k, track(v, on_change)) for k, v in dict(mapping).items())
+
+    def __reduce__(self):
+        return (TrackedDict, (dict(self), self._on_change))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, track(value, self._on_change))
+        self._on_change()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            super().__setitem__(k, track(v, self._on_change))
+        self._on_change()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    __delitem__ = _notifying(dict, "__delitem__")
+    pop = _notifying(dict, "pop")
+    popitem = _notifying(dict, "popitem")
+    clear = _notifying(dict, "clear")
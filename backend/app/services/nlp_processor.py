@@ -4,14 +4,44 @@ Détection d'intention et extraction d'entités
 Supporte le français et l'arabe dialectal tunisien
 """
 
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
+from .contact_index import ContactIndex
+from .keyword_automaton import KeywordAutomaton
+from .nlp_cache import NLPResultCache, track
+
+# Hackathon SeniorVoice : mots d'hésitation fréquents chez les seniors
+_HESITATION_PATTERNS = [
+    re.compile(p) for p in (
+        r"\beuh\b", r"\bben\b", r"\bbah\b", r"\bbon\b\s+", r"\balors\b\s+",
+        r"\bmmm+\b", r"\baaa+\b", r"\bيعني\b", r"\bااا\b", r"\bامم\b",
+    )
+]
+_WHITESPACE_RE = re.compile(r"\s+")
+
 
 class NLPProcessor:
     """Processeur NLP pour détecter les intentions et extraire les entités"""
 
-    def __init__(self):
+    # process_many : nombre de textes distincts à partir duquel on passe au pool de processus
+    # (sous la taille maximale d'un lot de /api/process-text-batch, MAX_TEXT_BATCH_SIZE)
+    PARALLEL_THRESHOLD = int(os.getenv("NLP_BATCH_PARALLEL_THRESHOLD", "500"))
+
+    def __init__(self, cache_size: Optional[int] = None, contact_index: Optional[ContactIndex] = None):
+        # Cache LRU des résultats par texte normalisé (0 = désactivé)
+        if cache_size is None:
+            cache_size = int(os.getenv("NLP_CACHE_SIZE", "1024"))
+        self.cache = NLPResultCache(cache_size)
+        self._matcher_dirty = True
+
+        # Contacts de la base (index partagé avec le moteur d'actions)
+        self.contact_index = contact_index
+        if contact_index is not None:
+            contact_index.subscribe(self._on_vocabulary_changed)
+
         # ──────────────────────────────────────────────────────────────
         # INTENTIONS — chaque intent a :
         #   "keywords"      : mots isolés (score +1.0 chacun)
@@ -267,73 +297,224 @@ class NLPProcessor:
             "levothyrox", "metoprolol", "ramipril", "furosémide",
         ]
 
-        # Contacts connus (à adapter selon la base)
+        # Contacts de secours quand aucun index de la base n'est chargé (NLP seul, tests)
         self.known_contacts = [
             "mohamed", "fatma", "amina", "ali", "samu", "ben said",
             "محمد", "فاطمة", "فاطمه",
         ]
 
+        # Moteur de détection précompilé (automate + regex compilées)
+        self._build_intent_matcher()
+
     # ──────────────────────────────────────────────────────────────────
-    #  POINT D'ENTRÉE
+    #  CONFIGURATION SURVEILLÉE — toute modification invalide le cache
     # ──────────────────────────────────────────────────────────────────
-    def process(self, text: str) -> Dict:
-        if not text or not text.strip():
-            return {"intent": "unknown", "entities": {}, "confidence": 0.0, "raw_text": ""}
+    @property
+    def intent_patterns(self) -> Dict:
+        return self._intent_patterns
 
-        text_clean = text.strip()
-        text_lower = text_clean.lower()
+    @intent_patterns.setter
+    def intent_patterns(self, value: Dict) -> None:
+        self._intent_patterns = track(value, self._on_intent_patterns_changed)
+        self._on_intent_patterns_changed()
 
-        # Hackathon SeniorVoice : Nettoyage des mots d'hésitation fréquents chez les seniors
-        hesitations = [r"\beuh\b", r"\bben\b", r"\bbah\b", r"\bbon\b\s+", r"\balors\b\s+", r"\bmmm+\b", r"\baaa+\b", r"\bيعني\b", r"\bااا\b", r"\bامم\b"]
-        for hes in hesitations:
-            text_lower = re.sub(hes, " ", text_lower)
-        text_lower = re.sub(r"\s+", " ", text_lower).strip()
+    @property
+    def known_meds(self) -> List[str]:
+        return self._known_meds
 
-        intent, confidence = self._detect_intent(text_lower)
-        entities = self._extract_entities(text_lower, intent)
+    @known_meds.setter
+    def known_meds(self, value: List[str]) -> None:
+        self._known_meds = track(list(value), self._on_vocabulary_changed)
+        self._on_vocabulary_changed()
 
-        return {
-            "intent": intent,
-            "entities": entities,
-            "confidence": confidence,
-            "raw_text": text_clean,
-        }
+    @property
+    def known_contacts(self) -> List[str]:
+        return self._known_contacts
+
+    @known_contacts.setter
+    def known_contacts(self, value: List[str]) -> None:
+        self._known_contacts = track(list(value), self._on_vocabulary_changed)
+        self._on_vocabulary_changed()
+
+    def _on_intent_patterns_changed(self) -> None:
+        # L'automate sera reconstruit à la prochaine détection
+        self._matcher_dirty = True
+        self.cache.clear()
+
+    def _on_vocabulary_changed(self) -> None:
+        self.cache.clear()
+
+    def cache_stats(self) -> Dict:
+        """Compteurs du cache de résultats (hits, misses, évictions, taux de succès)"""
+        return self.cache.stats()
 
     # ──────────────────────────────────────────────────────────────────
-    #  DÉTECTION D'INTENTION
+    #  MOTEUR DE DÉTECTION PRÉCOMPILÉ
     # ──────────────────────────────────────────────────────────────────
-    def _detect_intent(self, text: str) -> Tuple[str, float]:
-        scores: Dict[str, float] = {}
+    def _build_intent_matcher(self) -> None:
+        """
+        Compiler intent_patterns une seule fois :
+        - un automate Aho-Corasick pour tous les mots-clés forts, normaux et blockers
+        - les regex de chaque intent précompilées
+        À rappeler si intent_patterns est modifié.
+        """
+        automaton = KeywordAutomaton()
+        # mot-clé → [(intent, score, bonus début de phrase)] — les doublons comptent plusieurs fois
+        keyword_index: Dict[str, List[Tuple[str, float, float]]] = {}
+        # blocker → intents bloqués
+        blocker_index: Dict[str, List[str]] = {}
+        compiled_patterns: Dict[str, List[re.Pattern]] = {}
+        # Détecteur d'urgence : mots-clés forts seuls (chacun suffit pour emergency_alert)
+        emergency = KeywordAutomaton(
+            kw.lower() for kw in self.intent_patterns.get("emergency_alert", {}).get("strong_keywords", [])
+        )
 
         for intent_name, data in self.intent_patterns.items():
-            score = 0.0
-
-            # Vérifier les blockers — si un blocker est présent, score = 0 pour cet intent
-            if any(b in text for b in data.get("blockers", [])):
-                continue
+            for b in data.get("blockers", []):
+                automaton.add(b)
+                blocker_index.setdefault(b, []).append(intent_name)
 
-            # Mots-clés forts (score ×2)
             for kw in data.get("strong_keywords", []):
-                if kw.lower() in text:
-                    score += 2.0
-                    if text.startswith(kw.lower()):
-                        score += 0.5
+                kw = kw.lower()
+                automaton.add(kw)
+                keyword_index.setdefault(kw, []).append((intent_name, 2.0, 0.5))
 
-            # Mots-clés normaux
             for kw in data.get("keywords", []):
-                if kw.lower() in text:
-                    score += 1.0
+                kw = kw.lower()
+                automaton.add(kw)
+                keyword_index.setdefault(kw, []).append((intent_name, 1.0, 0.0))
 
-            # Patterns regex
+            compiled = []
             for pattern in data.get("patterns", []):
                 try:
-                    if re.search(pattern, text, re.IGNORECASE | re.UNICODE):
-                        score += 1.5
+                    compiled.append(re.compile(pattern, re.IGNORECASE | re.UNICODE))
                 except re.error:
                     pass
+            compiled_patterns[intent_name] = compiled
 
-            if score > 0:
-                scores[intent_name] = score
+        self._automaton = automaton.build()
+        self._emergency_automaton = emergency.build()
+        self._keyword_index = keyword_index
+        self._blocker_index = blocker_index
+        self._compiled_patterns = compiled_patterns
+        self._matcher_dirty = False
+
+    # ──────────────────────────────────────────────────────────────────
+    #  POINT D'ENTRÉE
+    # ──────────────────────────────────────────────────────────────────
+    def process(self, text: str) -> Dict:
+        if not text or not text.strip():
+            return {"intent": "unknown", "entities": {}, "confidence": 0.0, "raw_text": ""}
+
+        text_clean = text.strip()
+        text_lower = self._normalize(text_clean)
+
+        cached = self.cache.get(text_lower)
+        if cached is not None:
+            intent, entities, confidence = cached
+        else:
+            intent, entities, confidence = self._analyze(text_lower)
+            self.cache.put(text_lower, (intent, entities, confidence))
+
+        return {
+            "intent": intent,
+            "entities": entities,
+            "confidence": confidence,
+            "raw_text": text_clean,
+        }
+
+    def spot_emergency(self, text: str) -> bool:
+        """
+        Détection d'urgence avant tout scoring (« au secours », « نجدة », « samu »…)
+        Un mot-clé fort d'urgence donne toujours emergency_alert dans process() :
+        pas de faux positif par rapport au pipeline complet.
+        """
+        if not text:
+            return False
+        if self._matcher_dirty:
+            self._build_intent_matcher()
+        found, _at_start = self._emergency_automaton.find(text.lower())
+        return bool(found)
+
+    def process_many(self, texts: List[str], max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Traiter un lot de commandes texte (re-scoring hors ligne, console aidant)
+
+        Les textes identiques (après strip puis après normalisation) ne sont analysés
+        qu'une fois. Au-delà de PARALLEL_THRESHOLD textes distincts, l'analyse est
+        répartie sur un pool de processus.
+
+        Returns:
+            Une liste de résultats dans le même ordre et au même format que process()
+        """
+        # 1. Normalisation partagée : une seule fois par texte distinct
+        normalized: Dict[str, str] = {}
+        for text in texts:
+            text_clean = (text or "").strip()
+            if text_clean and text_clean not in normalized:
+                normalized[text_clean] = self._normalize(text_clean)
+
+        # 2. Analyse : une seule fois par texte normalisé distinct absent du cache
+        by_text: Dict[str, Tuple[str, Dict, float]] = {}
+        for t in dict.fromkeys(normalized.values()):
+            cached = self.cache.get(t)
+            if cached is not None:
+                by_text[t] = cached
+        unique = [t for t in dict.fromkeys(normalized.values()) if t not in by_text]
+        if len(unique) >= self.PARALLEL_THRESHOLD and max_workers != 1:
+            analyzed = self._analyze_parallel(unique, max_workers)
+        else:
+            analyzed = [self._analyze(t) for t in unique]
+        for t, result in zip(unique, analyzed):
+            self.cache.put(t, result)
+            by_text[t] = result
+
+        # 3. Assemblage — chaque résultat a son propre dict d'entités (modifiable par l'appelant)
+        results = []
+        for text in texts:
+            text_clean = (text or "").strip()
+            if not text_clean:
+                results.append({"intent": "unknown", "entities": {}, "confidence": 0.0, "raw_text": ""})
+                continue
+            intent, entities, confidence = by_text[normalized[text_clean]]
+            results.append({
+                "intent": intent,
+                "entities": dict(entities),
+                "confidence": confidence,
+                "raw_text": text_clean,
+            })
+        return results
+
+    def _analyze(self, text_lower: str) -> Tuple[str, Dict, float]:
+        """Intent + entités d'un texte déjà normalisé"""
+        intent, confidence = self._detect_intent(text_lower)
+        entities = self._extract_entities(text_lower, intent)
+        return intent, entities, confidence
+
+    def _analyze_parallel(self, texts: List[str], max_workers: Optional[int]) -> List[Tuple[str, Dict, float]]:
+        """Répartir l'analyse sur un pool de processus (un NLPProcessor copié par worker)"""
+        workers = max_workers or min(os.cpu_count() or 1, 8)
+        chunk_size = max(1, -(-len(texts) // (workers * 4)))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(self,)) as pool:
+            results = []
+            for chunk_result in pool.map(_analyze_batch_chunk, chunks):
+                results.extend(chunk_result)
+        return results
+
+    def _normalize(self, text: str) -> str:
+        """Minuscules + nettoyage des mots d'hésitation fréquents chez les seniors"""
+        text_lower = text.lower()
+        for hes in _HESITATION_PATTERNS:
+            text_lower = hes.sub(" ", text_lower)
+        return _WHITESPACE_RE.sub(" ", text_lower).strip()
+
+    # ──────────────────────────────────────────────────────────────────
+    #  DÉTECTION D'INTENTION
+    # ──────────────────────────────────────────────────────────────────
+    def _detect_intent(self, text: str) -> Tuple[str, float]:
+        scores = self._score_intents(text)
 
         if not scores:
             return "unknown", 0.0
@@ -349,6 +530,40 @@ class NLPProcessor:
 
         return best_intent, round(confidence, 2)
 
+    def _score_intents(self, text: str) -> Dict[str, float]:
+        """
+        Scores par intent en un seul passage de l'automate :
+        mots-clés forts +2.0 (+0.5 en début de phrase), mots-clés +1.0, regex +1.5.
+        Un blocker présent dans le texte exclut l'intent.
+        """
+        if self._matcher_dirty:
+            self._build_intent_matcher()
+
+        found, at_start = self._automaton.find(text)
+
+        blocked = set()
+        keyword_scores: Dict[str, float] = {}
+        for kw in found:
+            blocked.update(self._blocker_index.get(kw, ()))
+            for intent_name, weight, start_bonus in self._keyword_index.get(kw, ()):
+                if kw in at_start:
+                    weight += start_bonus
+                keyword_scores[intent_name] = keyword_scores.get(intent_name, 0.0) + weight
+
+        # Parcourir dans l'ordre de intent_patterns (départage des égalités inchangé)
+        scores: Dict[str, float] = {}
+        for intent_name, patterns in self._compiled_patterns.items():
+            if intent_name in blocked:
+                continue
+            score = keyword_scores.get(intent_name, 0.0)
+            for pattern in patterns:
+                if pattern.search(text):
+                    score += 1.5
+            if score > 0:
+                scores[intent_name] = score
+
+        return scores
+
     # ──────────────────────────────────────────────────────────────────
     #  EXTRACTION D'ENTITÉS
     # ──────────────────────────────────────────────────────────────────
@@ -368,6 +583,12 @@ class NLPProcessor:
             if contact:
                 entities["contact"] = contact
 
+        if intent == "read_messages":
+            # Uniquement un contact connu : « lis mes messages de Fatma »
+            contact = self._match_known_contact(text)
+            if contact:
+                entities["contact"] = contact
+
         if intent == "send_message":
             msg = self._extract_message_content(text)
             if msg:
@@ -451,11 +672,21 @@ class NLPProcessor:
     # ──────────────────────────────────────────────────────────────────
     #  EXTRACTION : NOM DE CONTACT
     # ──────────────────────────────────────────────────────────────────
-    def _extract_contact_name(self, text: str) -> Optional[str]:
-        # D'abord chercher dans les contacts connus
+    def _match_known_contact(self, text: str) -> Optional[str]:
+        """Contact de la base cité dans la phrase (index : accents, arabe ↔ latin)"""
+        if self.contact_index is not None and self.contact_index.loaded:
+            entry = self.contact_index.find_in_text(text)
+            return entry.name if entry else None
         for c in self.known_contacts:
             if c in text.lower():
                 return c.capitalize()
+        return None
+
+    def _extract_contact_name(self, text: str) -> Optional[str]:
+        # D'abord chercher dans les contacts connus
+        known = self._match_known_contact(text)
+        if known:
+            return known
 
         stop_words = {
             "le", "la", "les", "un", "une", "des", "mon", "ma", "mes",
@@ -578,4 +809,19 @@ class NLPProcessor:
         if m:
             return m.group(1).strip()[:120]
 
-        return None
\ No newline at end of file
+        return None
+
+
+# ──────────────────────────────────────────────────────────────────────
+#  WORKERS DU POOL DE PROCESSUS (process_many)
+# ──────────────────────────────────────────────────────────────────────
+_batch_worker_nlp: Optional[NLPProcessor] = None
+
+
+def _init_batch_worker(nlp: NLPProcessor) -> None:
+    global _batch_worker_nlp
+    _batch_worker_nlp = nlp
+
+
+def _analyze_batch_chunk(texts: List[str]) -> List[Tuple[str, Dict, float]]:
+    return [_batch_worker_nlp._analyze(t) for t in texts]
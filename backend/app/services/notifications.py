@@ -0,0 +1,74 @@
+"""
+Diffusion des notifications SeniorVoice vers les clients connectés
+Un abonné = une file asyncio bornée ; publish() peut être appelé depuis n'importe quel
+thread (pool du pipeline, planificateur). Un client trop lent perd ses plus anciens
+événements au lieu de ralentir les autres.
+
+Configuration (.env) :
+    NOTIFICATION_QUEUE_SIZE=100     # événements en attente par client
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Optional, Set
+
+
+class NotificationHub:
+    """Publication / abonnement en mémoire, un événement = un dict"""
+
+    def __init__(self, queue_size: Optional[int] = None):
+        if queue_size is None:
+            queue_size = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "100"))
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        """Nouvelle file d'événements (à appeler depuis la boucle)"""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event_type: str, data: Dict) -> Dict:
+        """Diffuser un événement à tous les abonnés (thread-safe)"""
+        with self._lock:
+            event = {"id": next(self._ids), "type": event_type, "time": time.time(), "data": data}
+            self.published += 1
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return event
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(event)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        return event
+
+    def _dispatch(self, event: Dict) -> None:
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Client lent : abandonner son plus ancien événement
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,113 @@
+"""
+Exécution hors boucle d'événements pour SeniorVoice
+Le client Groq, le NLP et les commits SQLAlchemy sont bloquants : on les exécute sur
+un pool de threads borné pour que /api/health et le tableau de bord restent réactifs
+pendant les transcriptions.
+
+Configuration (.env) :
+    PIPELINE_WORKERS=8              # threads du pool (toutes étapes confondues)
+    TRANSCRIPTION_CONCURRENCY=4     # transcriptions simultanées maximum
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class PipelineExecutor:
+    """Pool de threads borné + limite de transcriptions simultanées"""
+
+    def __init__(self, max_workers: Optional[int] = None, transcription_concurrency: Optional[int] = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("PIPELINE_WORKERS", "8"))
+        if transcription_concurrency is None:
+            transcription_concurrency = int(os.getenv("TRANSCRIPTION_CONCURRENCY", "4"))
+        self.max_workers = max_workers
+        # Garder au moins un thread libre pour le NLP / la base quand le pool le permet
+        self.transcription_concurrency = max(1, min(transcription_concurrency, max_workers - 1))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._transcription_slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_flight = 0
+        self.transcriptions_in_flight = 0
+        self.transcriptions_waiting = 0
+        print(f"✅ Pool du pipeline initialisé — {max_workers} threads, "
+              f"{self.transcription_concurrency} transcriptions simultanées")
+
+    def _submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="seniorvoice-pipeline")
+        # Copier le contexte : les mesures Server-Timing suivent la requête dans le thread
+        context = contextvars.copy_context()
+        return self._pool.submit(functools.partial(context.run, fn, *args, **kwargs))
+
+    async def _wait(self, future: Future) -> Any:
+        self.in_flight += 1
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Exécuter une fonction bloquante sur le pool sans bloquer la boucle"""
+        return await self._wait(self._submit(fn, *args, **kwargs))
+
+    async def transcribe(self, fn: Callable, *args, **kwargs) -> Any:
+        """Comme run(), mais au plus `transcription_concurrency` appels à la fois"""
+        loop = asyncio.get_running_loop()
+        slots = self._get_transcription_slots()
+        self.transcriptions_waiting += 1
+        try:
+            # Requête annulée pendant l'attente (client parti) : ne plus la compter
+            await slots.acquire()
+        finally:
+            self.transcriptions_waiting -= 1
+        try:
+            future = self._submit(fn, *args, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        self.transcriptions_in_flight += 1
+
+        def _done(_future: Future) -> None:
+            # Créneau rendu quand le thread a fini, pas quand la requête est annulée :
+            # la transcription en cours continue et compte toujours dans la limite
+            try:
+                loop.call_soon_threadsafe(self._transcription_done, slots)
+            except RuntimeError:
+                pass  # boucle fermée (arrêt)
+
+        future.add_done_callback(_done)
+        return await self._wait(future)
+
+    def _transcription_done(self, slots: asyncio.Semaphore) -> None:
+        self.transcriptions_in_flight -= 1
+        slots.release()
+
+    def _get_transcription_slots(self) -> asyncio.Semaphore:
+        # Le sémaphore appartient à une boucle : le recréer si la boucle a changé (rechargement, tests)
+        loop = asyncio.get_running_loop()
+        if self._transcription_slots is None or self._slots_loop is not loop:
+            self._transcription_slots = asyncio.Semaphore(self.transcription_concurrency)
+            self._slots_loop = loop
+        return self._transcription_slots
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "transcription_concurrency": self.transcription_concurrency,
+            "in_flight": self.in_flight,
+            "transcriptions_in_flight": self.transcriptions_in_flight,
+            "transcriptions_waiting": self.transcriptions_waiting,
+        }
+
+    def shutdown(self) -> None:
+        """Arrêt propre : attendre les tâches en cours (bloquant, le lifespan l'appelle via asyncio.to_thread)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            print("✅ Pool du pipeline arrêté")
+
@@ -0,0 +1,211 @@
+"""
+Planificateur des rappels, alarmes et prises de médicaments SeniorVoice
+Les échéances sont gardées dans un tas (heapq) alimenté par l'agenda matérialisé : la
+tâche de fond dort jusqu'à la prochaine échéance (aucun sondage de la base), la
+déclenche, prévient les clients connectés, puis :
+- rappel / alarme : marqué déclenché en base (is_done, fired_at) — il sort de l'agenda
+- médicament : reprogrammé le lendemain à la même heure
+
+Une modification de l'agenda (nouveau rappel, rappel fait…) invalide les anciennes
+entrées du tas par numéro de version, sans reconstruire le tas.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .agenda_index import AgendaChanges, AgendaEntry, AgendaIndex
+from .notifications import NotificationHub
+
+# Réveil de sécurité (changement d'heure système, mise en veille) : au plus une heure de sommeil
+MAX_SLEEP_SECONDS = 3600.0
+
+
+class ReminderScheduler:
+    """Tas d'échéances + tâche asyncio réveillée à la prochaine échéance"""
+
+    def __init__(
+        self,
+        agenda: AgendaIndex,
+        hub: NotificationHub,
+        mark_fired: Optional[Callable[[List[int]], Awaitable[None]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.agenda = agenda
+        self.hub = hub
+        self.mark_fired = mark_fired
+        self.clock = clock
+
+        # (échéance, n° d'ordre, version de la source, créneau)
+        self._heap: List[Tuple[float, int, int, AgendaEntry]] = []
+        self._versions: Dict[Tuple[str, int], int] = {}
+        self._version_counter = itertools.count(1)
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.fired = 0
+
+        agenda.subscribe(self._on_agenda_changed)
+
+    # ------------------------------------------------------------------
+    #  CYCLE DE VIE (lifespan)
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Démarrer la tâche de fond (depuis la boucle d'événements)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._on_agenda_changed(None)
+        self._task = self._loop.create_task(self._run())
+        print(f"✅ Planificateur démarré — {len(self._versions)} échéances suivies")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        print("✅ Planificateur arrêté")
+
+    # ------------------------------------------------------------------
+    #  ÉCHÉANCES
+    # ------------------------------------------------------------------
+    @staticmethod
+    def next_occurrence(minutes: int, after: float) -> float:
+        """Prochain HH:MM (heure locale) strictement après `after`"""
+        now = datetime.fromtimestamp(after)
+        due = now.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+        if due.timestamp() <= after:
+            due += timedelta(days=1)
+        return due.timestamp()
+
+    def _on_agenda_changed(self, changes: AgendaChanges) -> None:
+        """Appelé par l'agenda après chaque commit (n'importe quel thread)"""
+        now = self.clock()
+        with self._lock:
+            if changes is None:
+                self._heap.clear()
+                self._versions.clear()
+                by_source: Dict[Tuple[str, int], List[AgendaEntry]] = {}
+                for entry in self.agenda.today():
+                    by_source.setdefault((entry.kind, entry.source_id), []).append(entry)
+                changes = [(kind, source_id, entries) for (kind, source_id), entries in by_source.items()]
+            for kind, source_id, entries in changes:
+                self._schedule(kind, source_id, entries, now)
+            self._compact()
+        self._wake()
+
+    def _schedule(self, kind: str, source_id: int, entries: List[AgendaEntry], now: float) -> None:
+        timed = [entry for entry in entries if entry.minutes >= 0]
+        if not timed:
+            self._versions.pop((kind, source_id), None)
+            return
+        version = next(self._version_counter)
+        self._versions[(kind, source_id)] = version
+        for entry in timed:
+            heapq.heappush(self._heap, (self.next_occurrence(entry.minutes, now), next(self._order), version, entry))
+
+    def _is_current(self, version: int, entry: AgendaEntry) -> bool:
+        return self._versions.get((entry.kind, entry.source_id)) == version
+
+    def _compact(self) -> None:
+        # Entrées périmées trop nombreuses : reconstruire le tas (O(n))
+        if len(self._heap) > 1024 and len(self._heap) > 4 * len(self._versions):
+            self._heap = [item for item in self._heap if self._is_current(item[2], item[3])]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> List[AgendaEntry]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _order, version, entry = heapq.heappop(self._heap)
+                if not self._is_current(version, entry):
+                    continue
+                due.append(entry)
+                if entry.kind == "medication":
+                    # Prise quotidienne : même heure le lendemain
+                    heapq.heappush(self._heap, (self.next_occurrence(entry.minutes, when), next(self._order), version, entry))
+                else:
+                    self._versions.pop((entry.kind, entry.source_id), None)
+        return due
+
+    def _next_delay(self, now: float) -> Optional[float]:
+        with self._lock:
+            while self._heap and not self._is_current(self._heap[0][2], self._heap[0][3]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - now)
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    # ------------------------------------------------------------------
+    #  BOUCLE
+    # ------------------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(self.clock())
+            if due:
+                await self._fire(due)
+                continue
+            delay = self._next_delay(self.clock())
+            timeout = MAX_SLEEP_SECONDS if delay is None else min(delay, MAX_SLEEP_SECONDS)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, due: List[AgendaEntry]) -> None:
+        for entry in due:
+            self.hub.publish("reminder_due", {
+                "kind": entry.kind,
+                "id": entry.source_id,
+                "type": entry.type,
+                "title": entry.title,
+                "time": entry.time,
+                "message": self._message(entry),
+            })
+            print(f"🔔 Échéance {entry.time} : {entry.title}")
+        self.fired += len(due)
+
+        reminder_ids = [entry.source_id for entry in due if entry.kind == "reminder"]
+        if reminder_ids and self.mark_fired is not None:
+            try:
+                await self.mark_fired(reminder_ids)
+            except Exception as e:
+                print(f"⚠️ Rappels déclenchés non enregistrés {reminder_ids}: {e}")
+
+    @staticmethod
+    def _message(entry: AgendaEntry) -> str:
+        if entry.kind == "medication":
+            return f"C'est l'heure de prendre {entry.title}."
+        if entry.type == "alarm":
+            return f"Il est {entry.time}, c'est l'heure de votre alarme !"
+        return f"Rappel : {entry.title}."
+
+    def stats(self) -> Dict:
+        with self._lock:
+            live = [item for item in self._heap if self._is_current(item[2], item[3])]
+            next_due = min(live)[0] if live else None
+            return {
+                "running": self._task is not None and not self._task.done(),
+                "scheduled": len(live),
+                "heap": len(self._heap),
+                "fired": self.fired,
+                "next_due": datetime.fromtimestamp(next_due).isoformat(timespec="seconds") if next_due else None,
+            }
@@ -0,0 +1,183 @@
+"""
+Découpage des silences avant transcription SeniorVoice
+Les enregistrements des seniors contiennent de longs silences : attente avant de parler,
+hésitations, micro resté ouvert. Avant l'appel au moteur, l'audio (PCM 16 bits mono)
+passe par une détection d'activité vocale vectorisée (NumPy) :
+- énergie et taux de passage par zéro par trame de 20 ms (les consonnes sifflantes,
+  peu énergétiques, sont gardées grâce au passage par zéro)
+- seuil adapté au bruit de fond de l'enregistrement
+- silences de début et de fin coupés (≈200 ms de marge autour de la parole)
+- pauses internes ramenées à 500 ms
+- enregistrement sans parole rejeté avant tout appel réseau
+
+Configuration (.env) :
+    AUDIO_TRIM_SILENCE=true             # false = audio transcrit en entier
+    AUDIO_TRIM_MIN_RMS=300              # énergie minimale de la parole (échelle int16)
+    AUDIO_TRIM_PADDING_MS=200           # marge gardée autour de la parole
+    AUDIO_TRIM_MAX_PAUSE_MS=500         # pause interne maximale conservée
+    AUDIO_TRIM_MIN_SPEECH_MS=150        # en dessous : enregistrement considéré vide
+
+Setup :
+    pip install numpy
+"""
+
+import os
+import threading
+from typing import Dict, NamedTuple, Optional
+
+try:
+    import numpy as np
+except ImportError:  # découpage désactivé, audio transcrit en entier
+    np = None
+
+FRAME_MS = 20
+
+
+class SilentAudioError(ValueError):
+    """Aucune parole dans l'enregistrement : inutile d'appeler le moteur"""
+
+
+class TrimResult(NamedTuple):
+    pcm: bytes
+    sample_rate: int
+    original_seconds: float
+    kept_seconds: float
+
+    @property
+    def saved_seconds(self) -> float:
+        return self.original_seconds - self.kept_seconds
+
+
+class SilenceTrimmer:
+    """VAD énergie + passage par zéro sur PCM 16 bits mono, vectorisée par trames"""
+
+    def __init__(
+        self,
+        min_rms: Optional[float] = None,
+        padding_ms: Optional[int] = None,
+        max_pause_ms: Optional[int] = None,
+        min_speech_ms: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        noise_ratio: float = 3.0,
+        peak_ratio: float = 0.25,
+        zcr_min: float = 0.25,
+    ):
+        if enabled is None:
+            enabled = os.getenv("AUDIO_TRIM_SILENCE", "true").lower() in ("1", "true", "yes")
+        if min_rms is None:
+            min_rms = float(os.getenv("AUDIO_TRIM_MIN_RMS", "300"))
+        if padding_ms is None:
+            padding_ms = int(os.getenv("AUDIO_TRIM_PADDING_MS", "200"))
+        if max_pause_ms is None:
+            max_pause_ms = int(os.getenv("AUDIO_TRIM_MAX_PAUSE_MS", "500"))
+        if min_speech_ms is None:
+            min_speech_ms = int(os.getenv("AUDIO_TRIM_MIN_SPEECH_MS", "150"))
+        self.enabled = enabled and np is not None
+        self.min_rms = min_rms
+        self.padding_frames = max(0, padding_ms // FRAME_MS)
+        self.max_pause_frames = max(1, max_pause_ms // FRAME_MS)
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+        self.noise_ratio = noise_ratio
+        self.peak_ratio = peak_ratio
+        self.zcr_min = zcr_min
+        self._lock = threading.Lock()
+
+        self.clips = 0
+        self.rejected = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+
+        if enabled and np is None:
+            print("⚠️  NumPy non installé — découpage des silences désactivé (pip install numpy)")
+
+    def describe(self) -> str:
+        if not self.enabled:
+            return "désactivé"
+        return f"pauses ≤ {self.max_pause_frames * FRAME_MS} ms, marge {self.padding_frames * FRAME_MS} ms"
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def downmix(pcm: bytes, channels: int) -> bytes:
+        """PCM 16 bits entrelacé → mono (moyenne des canaux)"""
+        if channels <= 1:
+            return pcm
+        samples = np.frombuffer(pcm[:len(pcm) // (2 * channels) * 2 * channels], dtype="<i2")
+        return samples.reshape(-1, channels).mean(axis=1).astype("<i2").tobytes()
+
+    @staticmethod
+    def frame_features(frames: "np.ndarray"):
+        """Trames (n, échantillons) int16 → (énergie RMS, taux de passage par zéro) par trame"""
+        samples = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        zcr = np.mean((samples[:, 1:] * samples[:, :-1]) < 0, axis=1)
+        return rms, zcr
+
+    def classify(self, rms: "np.ndarray", zcr: "np.ndarray", context: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """
+        Booléen « parole » par trame. context : RMS des trames précédentes (flux continu),
+        prises en compte dans l'estimation du bruit de fond et du niveau de la parole
+        """
+        reference = rms if context is None or not len(context) else np.concatenate((context, rms))
+        # Bruit de fond = trames les plus calmes ; plafonné par rapport aux trames les plus
+        # fortes pour qu'un court extrait entièrement parlé ne soit pas pris pour du bruit
+        noise = float(np.percentile(reference, 10))
+        threshold = max(self.min_rms, min(noise * self.noise_ratio, float(reference.max()) * self.peak_ratio))
+        return (rms > threshold) | ((rms > threshold / 2) & (zcr > self.zcr_min))
+
+    def speech_mask(self, frames: "np.ndarray") -> "np.ndarray":
+        """Trames (n, échantillons) int16 → booléen « parole » par trame"""
+        return self.classify(*self.frame_features(frames))
+
+    def trim(self, pcm: bytes, sample_rate: int) -> TrimResult:
+        """Couper les silences ; SilentAudioError si l'enregistrement ne contient pas de parole"""
+        samples = np.frombuffer(pcm[:len(pcm) // 2 * 2], dtype="<i2")
+        frame = max(1, sample_rate * FRAME_MS // 1000)
+        count = len(samples) // frame
+        original = len(samples) / sample_rate
+        frames = samples[:count * frame].reshape(count, frame)
+
+        speech = self.speech_mask(frames) if count else np.zeros(0, dtype=bool)
+        if int(speech.sum()) < self.min_speech_frames:
+            with self._lock:
+                self.clips += 1
+                self.rejected += 1
+                self.seconds_in += original
+            raise SilentAudioError(f"Aucune parole détectée ({original:.1f} s d'audio)")
+
+        # Plages de silence [début, fin) : marge gardée contre la parole aux extrémités,
+        # pauses internes raccourcies (moitié après la parole, moitié avant la reprise)
+        keep = speech.copy()
+        edges = np.diff(np.concatenate(([1], speech.astype(np.int8), [1])))
+        pad, pause = self.padding_frames, self.max_pause_frames
+        for start, end in zip(np.flatnonzero(edges == -1), np.flatnonzero(edges == 1)):
+            if start == 0:
+                keep[max(start, end - pad):end] = True
+            elif end == count:
+                keep[start:start + pad] = True
+            elif end - start > pause:
+                keep[start:start + pause // 2] = True
+                keep[end - (pause - pause // 2):end] = True
+            else:
+                keep[start:end] = True
+
+        kept = frames[keep]
+        result = TrimResult(
+            pcm=kept.astype("<i2", copy=False).tobytes(),
+            sample_rate=sample_rate,
+            original_seconds=original,
+            kept_seconds=kept.size / sample_rate,
+        )
+        with self._lock:
+            self.clips += 1
+            self.seconds_in += result.original_seconds
+            self.seconds_out += result.kept_seconds
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "clips": self.clips,
+            "rejected": self.rejected,
+            "seconds_in": round(self.seconds_in, 1),
+            "seconds_saved": round(self.seconds_in - self.seconds_out, 1),
+        }
@@ -0,0 +1,306 @@
+"""
+Reconnaissance vocale en continu SeniorVoice (WebSocket /api/voice-stream)
+Le client envoie le micro en PCM 16 bits mono (16 kHz) pendant que le senior parle :
+- détection d'activité vocale du découpage des silences (silence_trimmer, NumPy) sur les
+  trames de 20 ms reçues, bruit de fond estimé sur les dernières secondes
+- urgence (« au secours », « نجدة ») repérée dès la première partielle : l'alerte part
+  sans attendre la fin de la phrase
+- transcription partielle de l'énoncé en cours toutes les ~800 ms de parole (une seule à
+  la fois, sur les 8 dernières secondes au plus), suivie d'une détection d'intention
+  sur ce texte partiel
+- fin d'énoncé après un silence (700 ms) : la transcription partielle lancée dès la
+  première pause (200 ms) couvre déjà toute la parole (énoncé de moins de 8 s) et est
+  réutilisée telle quelle — la réponse part dès la fin de la parole, sans attendre une transcription complète
+
+Configuration (.env) :
+    STREAM_PARTIAL_INTERVAL_MS=800      # parole entre deux transcriptions partielles
+    STREAM_PARTIAL_WINDOW_S=8           # audio transcrit au plus par une partielle (fin de l'énoncé)
+    STREAM_ENDPOINT_SILENCE_MS=700      # silence qui termine un énoncé
+    STREAM_MAX_UTTERANCE_S=30           # énoncé coupé au-delà
+    STREAM_VAD_MIN_RMS=300              # énergie minimale de la parole (échelle int16)
+
+Setup :
+    pip install numpy
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .silence_trimmer import SilenceTrimmer, np
+from .wav_utils import SAMPLE_RATE, pcm_to_wav
+
+FRAME_MS = 20
+
+
+class StreamVAD:
+    """VAD du découpage des silences appliquée au flux : bruit de fond estimé sur les `context_ms` précédentes"""
+
+    def __init__(self, min_rms: Optional[float] = None, context_ms: int = 3000):
+        if np is None:
+            raise RuntimeError("❌ NumPy n'est pas installé : pip install numpy")
+        if min_rms is None:
+            min_rms = float(os.getenv("STREAM_VAD_MIN_RMS", "300"))
+        self.trimmer = SilenceTrimmer(min_rms=min_rms, enabled=True)
+        self._context: Deque[float] = deque(maxlen=max(1, context_ms // FRAME_MS))
+
+    def speech_frames(self, pcm: bytes, frame_bytes: int) -> List[bool]:
+        """Trames consécutives de `frame_bytes` octets (PCM little-endian) → parole ou non, par trame"""
+        frames = np.frombuffer(pcm, dtype="<i2").reshape(-1, frame_bytes // 2)
+        rms, zcr = self.trimmer.frame_features(frames)
+        context = np.fromiter(self._context, dtype=np.float32, count=len(self._context))
+        speech = self.trimmer.classify(rms, zcr, context)
+        self._context.extend(rms.tolist())
+        return speech.tolist()
+
+
+class SpeechSegmenter:
+    """Découpe le flux PCM en énoncés : événements "speech_start", "partial", "speech_end" """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        vad: Optional[StreamVAD] = None,
+        partial_interval_ms: Optional[int] = None,
+        partial_window_s: Optional[float] = None,
+        endpoint_silence_ms: Optional[int] = None,
+        max_utterance_s: Optional[float] = None,
+        start_frames: int = 3,
+        preroll_ms: int = 300,
+        tail_ms: int = 100,
+        pause_ms: int = 200,
+    ):
+        if partial_interval_ms is None:
+            partial_interval_ms = int(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "800"))
+        if partial_window_s is None:
+            partial_window_s = float(os.getenv("STREAM_PARTIAL_WINDOW_S", "8"))
+        if endpoint_silence_ms is None:
+            endpoint_silence_ms = int(os.getenv("STREAM_ENDPOINT_SILENCE_MS", "700"))
+        if max_utterance_s is None:
+            max_utterance_s = float(os.getenv("STREAM_MAX_UTTERANCE_S", "30"))
+        self.sample_rate = sample_rate
+        self.vad = vad or StreamVAD()
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+        self.partial_bytes = self._bytes(partial_interval_ms)
+        self.window_bytes = max(self.partial_bytes, self._bytes(partial_window_s * 1000))
+        self.endpoint_frames = max(1, endpoint_silence_ms // FRAME_MS)
+        self.pause_frames = max(1, min(pause_ms // FRAME_MS, self.endpoint_frames - 1))
+        self.max_bytes = self._bytes(max_utterance_s * 1000)
+        self.start_frames = start_frames
+        self.tail_bytes = self._bytes(tail_ms)
+        self._pending = bytearray()
+        self._preroll: Deque[bytes] = deque(maxlen=max(start_frames, preroll_ms // FRAME_MS))
+        self.reset()
+
+    def _bytes(self, ms: float) -> int:
+        return int(self.sample_rate * ms / 1000) * 2
+
+    def reset(self) -> None:
+        """Prêt pour l'énoncé suivant"""
+        self._preroll.clear()
+        self._utterance = bytearray()
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._speech_end = 0       # fin de la dernière trame de parole dans l'énoncé
+        self._last_partial = 0
+
+    def feed(self, pcm: bytes) -> List[str]:
+        events = []
+        self._pending.extend(pcm)
+        size = len(self._pending) // self.frame_bytes * self.frame_bytes
+        if not size:
+            return events
+        block = bytes(self._pending[:size])
+        del self._pending[:size]
+        # Une passe de VAD vectorisée pour toutes les trames reçues
+        for i, speech in enumerate(self.vad.speech_frames(block, self.frame_bytes)):
+            event = self._frame(block[i * self.frame_bytes:(i + 1) * self.frame_bytes], speech)
+            if event:
+                events.append(event)
+        return events
+
+    def _frame(self, frame: bytes, speech: bool) -> Optional[str]:
+        if not self.in_speech:
+            self._preroll.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run < self.start_frames:
+                return None
+            # Début d'énoncé, avec un peu d'audio avant (attaque des consonnes)
+            self.in_speech = True
+            self._utterance = bytearray(b"".join(self._preroll))
+            self._speech_end = len(self._utterance)
+            self._silence_run = 0
+            return "speech_start"
+
+        self._utterance.extend(frame)
+        if speech:
+            self._silence_run = 0
+            self._speech_end = len(self._utterance)
+        else:
+            self._silence_run += 1
+        if self._silence_run >= self.endpoint_frames or len(self._utterance) >= self.max_bytes:
+            return "speech_end"
+        # Partielle toutes les `partial_interval_ms` de parole, et dès la première pause :
+        # si le senior a fini, la transcription est prête avant la fin du silence de clôture
+        if self._speech_end > self._last_partial and (
+            (speech and self._speech_end - self._last_partial >= self.partial_bytes)
+            or self._silence_run == self.pause_frames
+        ):
+            self._last_partial = self._speech_end
+            return "partial"
+        return None
+
+    @property
+    def speech_end(self) -> int:
+        """Position (octets) de la fin de la dernière trame de parole de l'énoncé"""
+        return self._speech_end
+
+    def utterance(self) -> bytes:
+        """Énoncé en cours, silence final coupé (garde ~100 ms de queue)"""
+        return bytes(self._utterance[:self._speech_end + self.tail_bytes])
+
+    def partial_audio(self) -> Tuple[bytes, bool]:
+        """Audio d'une partielle : fin de l'énoncé, `partial_window_s` au plus (True : énoncé entier)"""
+        pcm = self.utterance()
+        if len(pcm) <= self.window_bytes:
+            return pcm, True
+        return pcm[-self.window_bytes:], False
+
+    def duration(self, pcm: bytes) -> float:
+        return len(pcm) / 2 / self.sample_rate
+
+
+class StreamingSession:
+    """Un client /api/voice-stream : transcriptions partielles, puis commande exécutée en fin d'énoncé"""
+
+    def __init__(
+        self,
+        segmenter: SpeechSegmenter,
+        transcribe: Callable[[bytes], Awaitable[str]],
+        analyze: Callable[[str], Awaitable[Dict]],
+        complete: Callable[[str, Dict], Awaitable[Dict]],
+        emit: Callable[[Dict], Awaitable[None]],
+        emergency: Optional[Callable[[str], Awaitable[Optional[Dict]]]] = None,
+    ):
+        self.segmenter = segmenter
+        self.transcribe = transcribe      # WAV → texte
+        self.analyze = analyze            # texte → résultat NLP
+        self.complete = complete          # (texte, résultat NLP) → réponse finale (action + TTS)
+        self.emit = emit
+        self.emergency = emergency        # texte → réponse d'urgence immédiate, ou None
+        self._utterance_id = 0
+        self._answered: Optional[int] = None   # énoncé déjà traité par le chemin d'urgence
+        self._partial_task: Optional[asyncio.Task] = None
+        # Dernière transcription partielle : (fin de parole couverte si elle couvre tout l'énoncé, texte, résultat NLP)
+        self._last_partial: Optional[Tuple[Optional[int], str, Dict]] = None
+        self.utterances = 0
+        self.partials = 0
+        self.reused = 0
+        self.emergencies = 0
+
+    async def feed(self, pcm: bytes) -> None:
+        for event in self.segmenter.feed(pcm):
+            if event == "speech_start":
+                self._last_partial = None
+                self._utterance_id += 1
+                await self.emit({"type": "vad", "speech": True})
+            elif event == "partial":
+                # Une seule transcription partielle à la fois : les suivantes couvriront plus d'audio
+                if self._partial_task is None or self._partial_task.done():
+                    pcm, whole = self.segmenter.partial_audio()
+                    self._partial_task = asyncio.create_task(
+                        self._partial(pcm, self.segmenter.speech_end if whole else None, self._utterance_id)
+                    )
+            elif event == "speech_end":
+                await self.emit({"type": "vad", "speech": False})
+                await self._finalize()
+
+    async def end(self) -> None:
+        """Le client a relâché le micro : terminer l'énoncé en cours"""
+        if self.segmenter.in_speech:
+            await self.emit({"type": "vad", "speech": False})
+            await self._finalize()
+
+    async def close(self) -> None:
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+            await asyncio.gather(self._partial_task, return_exceptions=True)
+
+    async def _partial(self, pcm: bytes, speech_end: Optional[int], utterance_id: int) -> None:
+        if self._answered == utterance_id:
+            return
+        started = time.perf_counter()
+        try:
+            text = await self.transcribe(pcm_to_wav(pcm, self.segmenter.sample_rate))
+            if not text:
+                return
+            # Urgence dès la première partielle : réponse sans attendre la fin de la phrase
+            if await self._answer_emergency(text, pcm, utterance_id, started):
+                return
+            result = await self.analyze(text)
+        except Exception as e:
+            print(f"⚠️ Transcription partielle échouée : {e}")
+            return
+        self._last_partial = (speech_end, text, result)
+        self.partials += 1
+        await self.emit({
+            "type": "partial",
+            "text": text,
+            "intent": result["intent"],
+            "confidence": result["confidence"],
+        })
+
+    async def _answer_emergency(self, text: str, pcm: bytes, utterance_id: int, started: float) -> bool:
+        if self.emergency is None:
+            return False
+        response = await self.emergency(text)
+        if response is None:
+            return False
+        self._answered = utterance_id
+        self.emergencies += 1
+        await self.emit({
+            "type": "final",
+            **response,
+            "fast_path": True,
+            "audio_seconds": round(self.segmenter.duration(pcm), 2),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+        return True
+
+    async def _finalize(self) -> None:
+        pcm, speech_end = self.segmenter.utterance(), self.segmenter.speech_end
+        self.segmenter.reset()
+        started = time.perf_counter()
+        if self._partial_task is not None:
+            await asyncio.gather(self._partial_task, return_exceptions=True)
+            self._partial_task = None
+        if self._answered == self._utterance_id:
+            # Alerte déjà envoyée sur une partielle
+            self._last_partial = None
+            return
+
+        last, self._last_partial = self._last_partial, None
+        if last is not None and last[0] == speech_end:
+            # Aucune parole depuis la dernière transcription partielle
+            _covered, text, result = last
+            self.reused += 1
+        else:
+            text = await self.transcribe(pcm_to_wav(pcm, self.segmenter.sample_rate))
+            if not text:
+                await self.emit({"type": "no_speech"})
+                return
+            if await self._answer_emergency(text, pcm, self._utterance_id, started):
+                return
+            result = await self.analyze(text)
+
+        response = await self.complete(text, result)
+        self.utterances += 1
+        await self.emit({
+            "type": "final",
+            **response,
+            "audio_seconds": round(self.segmenter.duration(pcm), 2),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
@@ -0,0 +1,107 @@
+"""
+Gabarits de réponses vocales SeniorVoice
+Les réponses du moteur d'actions sont de la prose fixe avec un ou deux emplacements
+(« Il est actuellement {hour} heures et {minute} minutes »). Un gabarit déclare ces
+emplacements et leur type ; le rendu donne le texte de la réponse et la liste de ses
+segments, que la synthèse segmentée (tts_service, TTS_MODE=segments) assemble :
+- fragments fixes et vocabulaires fermés (heures, minutes, contacts) pré-rendus au démarrage
+- texte libre (titre d'un rappel, contenu d'un message) synthétisé à la demande
+
+    ALARM = SpeechTemplate("L'alarme de {title} sonnera à {time:time}.")
+    ALARM.render(title="la pharmacie", time="08:30")
+    → SpeechResponse("L'alarme de la pharmacie sonnera à 08:30.",
+                     [("text", "L'alarme de "), ("free", "la pharmacie"), ("text", " sonnera à "),
+                      ("time_hour", "08"), ("minute", "30")])
+"""
+
+import re
+from string import Formatter
+from typing import Dict, List, NamedTuple, Tuple
+
+# Emplacement sans type : texte libre
+FREE = "free"
+
+_TIME = re.compile(r"(\d{2}):(\d{2})")
+
+
+# Vocabulaires fermés : valeur affichée → texte prononcé (pré-rendus au démarrage)
+VOCABULARIES: Dict[str, Dict[str, str]] = {
+    "hour": {f"{h:02d}": str(h) for h in range(24)},
+    "minute": {f"{m:02d}": str(m) for m in range(60)},
+    # "08:30" (entité time du NLP) → « 8 heures » + « 30 »
+    "time_hour": {f"{h:02d}": f"{h} heure{'s' if h > 1 else ''}" for h in range(24)},
+}
+
+# Vocabulaires alimentés à l'exécution (noms des contacts)
+DYNAMIC_KINDS = {"contact"}
+
+Segment = Tuple[str, str]  # (type, valeur) — type "text" : fragment fixe du gabarit
+
+
+def _speakable(text: str) -> bool:
+    """Fragment prononçable (la ponctuation seule ne donne pas de clip)"""
+    return any(c.isalnum() for c in text)
+
+
+def vocabulary(kind: str, values) -> None:
+    """Déclarer un vocabulaire fermé dont les valeurs se prononcent telles quelles"""
+    VOCABULARIES[kind] = {value: value for value in values}
+
+
+def expand(kind: str, value: str) -> List[Segment]:
+    """Emplacement → segments à assembler ; hors vocabulaire = texte libre"""
+    if kind == "time":
+        m = _TIME.fullmatch(value)
+        if m is None:
+            return [(FREE, value)]
+        hour, minute = m.groups()
+        return [("time_hour", hour)] + ([("minute", minute)] if minute != "00" else [])
+    if kind in VOCABULARIES:
+        return [(kind, value)] if value in VOCABULARIES[kind] else [(FREE, value)]
+    if kind in DYNAMIC_KINDS:
+        return [(kind, value)]
+    return [(FREE, value)]
+
+
+def spoken(kind: str, value: str) -> str:
+    """Texte prononcé pour un segment"""
+    return VOCABULARIES.get(kind, {}).get(value, value)
+
+
+class SpeechResponse(NamedTuple):
+    text: str
+    segments: List[Segment]
+
+
+class SpeechTemplate:
+    """Gabarit « texte {nom:type} texte » ; type parmi hour, minute, time, contact ou un vocabulaire déclaré (défaut : libre)"""
+
+    registry: List["SpeechTemplate"] = []
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.parts: List[Tuple[str, str, str]] = [
+            (literal, name or "", kind or FREE)
+            for literal, name, kind, _ in Formatter().parse(pattern)
+        ]
+        SpeechTemplate.registry.append(self)
+
+    @property
+    def fragments(self) -> List[str]:
+        """Fragments fixes (pré-rendus au démarrage)"""
+        return [literal for literal, _, _ in self.parts if _speakable(literal)]
+
+    def render(self, **values) -> SpeechResponse:
+        text: List[str] = []
+        segments: List[Segment] = []
+        for literal, name, kind in self.parts:
+            if literal:
+                text.append(literal)
+                if _speakable(literal):
+                    segments.append(("text", literal))
+            if name:
+                value = str(values[name])
+                text.append(value)
+                if value.strip():
+                    segments.extend(expand(kind, value))
+        return SpeechResponse("".join(text), segments)
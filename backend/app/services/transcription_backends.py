@@ -0,0 +1,165 @@
+"""
+Moteurs de transcription pour SeniorVoice
+- "groq"  : API Groq (Whisper Large v3) — nécessite GROQ_API_KEY et le réseau
+- "local" : Whisper sur CPU via faster-whisper (CTranslate2, int8) — hors ligne
+
+Configuration (.env) :
+    TRANSCRIPTION_BACKEND=groq          # groq | local (défaut : groq si GROQ_API_KEY, sinon local)
+    GROQ_WHISPER_MODEL=whisper-large-v3
+    LOCAL_WHISPER_MODEL=small           # tiny | base | small | medium | large-v3 | chemin local
+    LOCAL_WHISPER_COMPUTE_TYPE=int8
+    LOCAL_WHISPER_THREADS=0             # 0 = automatique
+    LOCAL_WHISPER_BEAM_SIZE=1
+
+Setup local :
+    pip install faster-whisper
+"""
+
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional, Set, Union
+
+AudioInput = Union[bytes, BinaryIO]
+
+
+class TranscriptionBackend(ABC):
+    """Interface commune des moteurs de transcription"""
+
+    name = "base"
+    # Formats acceptés sans conversion, taille maximale d'un envoi (None = pas de limite)
+    native_formats: Set[str] = set()
+    max_bytes: Optional[int] = None
+    # Audio envoyé sur le réseau : chaque octet économisé compte (normalisation des gros uploads)
+    remote = False
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    def transcribe(self, filename: str, audio: AudioInput, prompt: str = "") -> str:
+        """Transcrire un fichier ouvert ou un buffer — retourne le texte brut"""
+
+    def accepts(self, size: int, ext: str) -> bool:
+        """L'audio peut-il être envoyé tel quel (sans conversion) ?"""
+        if ext.lower() not in self.native_formats:
+            return False
+        return self.max_bytes is None or size <= self.max_bytes
+
+    def describe(self) -> str:
+        return f"{self.name} ({self.model})"
+
+
+class GroqTranscriptionBackend(TranscriptionBackend):
+    """Whisper Large v3 via l'API Groq — gratuit, rapide, précis (FR + AR)"""
+
+    name = "groq"
+    # Groq accepte nativement ces formats, jusqu'à 25 Mo (free)
+    native_formats = {".flac", ".mp3", ".mp4", ".m4a", ".ogg", ".wav", ".webm", ".mpeg", ".mpga"}
+    max_bytes = 25 * 1024 * 1024
+    remote = True
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError(
+                "❌ GROQ_API_KEY manquant !\n"
+                "1. Inscrivez-vous gratuitement sur https://console.groq.com\n"
+                "2. Allez dans API Keys → créez une clé\n"
+                "3. Ajoutez dans votre .env :  GROQ_API_KEY=gsk_xxxxxxxx\n"
+                "   (ou TRANSCRIPTION_BACKEND=local pour transcrire hors ligne)"
+            )
+        from groq import Groq
+
+        # Modèle recommandé — whisper-large-v3 = meilleure précision (FR + AR)
+        # Alternative plus rapide : whisper-large-v3-turbo
+        super().__init__(model or os.getenv("GROQ_WHISPER_MODEL", "whisper-large-v3"))
+        self.client = Groq(api_key=api_key)
+
+    def transcribe(self, filename: str, audio: AudioInput, prompt: str = "") -> str:
+        response = self.client.audio.transcriptions.create(
+            file=(filename, audio),
+            model=self.model,
+            # Ne PAS forcer la langue — Groq détecte automatiquement FR et AR
+            # Si vous voulez forcer : language="fr" ou language="ar"
+            prompt=prompt,
+            response_format="text",
+            temperature=0.0,  # 0 = plus déterministe, meilleur pour commandes vocales
+        )
+        # response est une str quand response_format="text"
+        return str(response).strip()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Whisper sur CPU (faster-whisper / CTranslate2 int8) — chargé au premier appel"""
+
+    name = "local"
+    # Décodage via PyAV : tous les formats courants, pas de limite de taille
+    native_formats = {".flac", ".mp3", ".mp4", ".m4a", ".ogg", ".wav", ".webm", ".mpeg", ".mpga", ".aac", ".opus"}
+    max_bytes = None
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        compute_type: Optional[str] = None,
+        cpu_threads: Optional[int] = None,
+        beam_size: Optional[int] = None,
+    ):
+        super().__init__(model or os.getenv("LOCAL_WHISPER_MODEL", "small"))
+        self.compute_type = compute_type or os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+        self.cpu_threads = cpu_threads if cpu_threads is not None else int(os.getenv("LOCAL_WHISPER_THREADS", "0"))
+        self.beam_size = beam_size or int(os.getenv("LOCAL_WHISPER_BEAM_SIZE", "1"))
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        """Charger le modèle une seule fois, au premier besoin"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        from faster_whisper import WhisperModel
+                    except ImportError as e:
+                        raise RuntimeError(
+                            "❌ faster-whisper n'est pas installé : pip install faster-whisper"
+                        ) from e
+                    print(f"⏳ Chargement du modèle Whisper local '{self.model}' ({self.compute_type})...")
+                    self._model = WhisperModel(
+                        self.model,
+                        device="cpu",
+                        compute_type=self.compute_type,
+                        cpu_threads=self.cpu_threads,
+                    )
+                    print(f"✅ Modèle Whisper local chargé: {self.model}")
+        return self._model
+
+    def warmup(self) -> None:
+        self._get_model()
+
+    def transcribe(self, filename: str, audio: AudioInput, prompt: str = "") -> str:
+        if isinstance(audio, (bytes, bytearray)):
+            audio = io.BytesIO(audio)
+        segments, _info = self._get_model().transcribe(
+            audio,
+            initial_prompt=prompt or None,
+            beam_size=self.beam_size,
+            temperature=0.0,
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+BACKENDS = {
+    GroqTranscriptionBackend.name: GroqTranscriptionBackend,
+    LocalWhisperBackend.name: LocalWhisperBackend,
+}
+
+
+def create_backend(name: Optional[str] = None) -> TranscriptionBackend:
+    """Instancier le moteur choisi par configuration (TRANSCRIPTION_BACKEND)"""
+    name = (name or os.getenv("TRANSCRIPTION_BACKEND") or "").lower()
+    if not name:
+        name = "groq" if os.getenv("GROQ_API_KEY") else "local"
+    if name not in BACKENDS:
+        raise ValueError(f"❌ TRANSCRIPTION_BACKEND inconnu : {name} (choix : {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
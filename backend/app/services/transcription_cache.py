@@ -0,0 +1,167 @@
+"""
+Cache des transcriptions SeniorVoice, adressé par contenu
+Clé = SHA-256(modèle + prompt + octets audio) : un enregistrement renvoyé à l'identique
+(nouvel essai, upload relancé par le frontend) est servi sans appel au moteur.
+
+Stockage sur disque (SQLite), plafonné en taille, éviction LRU.
+
+Configuration (.env) :
+    TRANSCRIPTION_CACHE_ENABLED=true
+    TRANSCRIPTION_CACHE_MAX_MB=50
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Optional, Union
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache")
+
+
+class TranscriptionCache:
+    """Cache disque des transcriptions, borné en taille, éviction LRU"""
+
+    # Table, colonne de la valeur et son type SQLite (les sous-classes stockent autre chose)
+    table = "transcriptions"
+    column = "text"
+    column_type = "TEXT"
+    filename = "transcriptions.db"
+    max_mb_env = ("TRANSCRIPTION_CACHE_MAX_MB", "50")
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv(*self.max_mb_env)) * 1024 * 1024)
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, self.filename)
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f" key TEXT PRIMARY KEY, {self.column} {self.column_type} NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table}_last_access ON {self.table} (last_access)"
+        )
+        self._total_bytes = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+        # Uploads identiques simultanés : un seul appel au moteur, les autres attendent
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(audio: Union[bytes, BinaryIO], model: str, prompt: str) -> str:
+        """Empreinte du contenu audio + modèle + prompt"""
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        digest.update(b"\0")
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            digest.update(audio)
+        else:
+            for chunk in iter(lambda: audio.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self.column} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    @staticmethod
+    def _size(value) -> int:
+        return len(value.encode("utf-8"))
+
+    def put(self, key: str, text: str) -> None:
+        size = len(key) + self._size(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, {self.column}, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Supprimer les entrées les moins récemment utilisées au-delà du plafond"""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+
+    def get_or_transcribe(self, key: str, transcribe: Callable[[], str]) -> str:
+        """Servir depuis le cache, sinon transcrire une seule fois même si l'upload arrive en double"""
+        text = self.get(key)
+        if text is not None:
+            return text
+
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            event.wait(timeout=120)
+            text = self.get(key)
+            if text is not None:
+                return text
+
+        try:
+            text = transcribe()
+            self.put(key, text)
+            return text
+        finally:
+            if owner:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._total_bytes = 0
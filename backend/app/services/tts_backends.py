@@ -0,0 +1,167 @@
+"""
+Moteurs de synthèse vocale SeniorVoice (hors ligne, CPU)
+- "piper"  : Piper (VITS / ONNX Runtime) — voix naturelles, plus rapide que le temps réel sur CPU
+- "espeak" : espeak-ng en ligne de commande — voix synthétique, très léger
+- "none"   : pas d'audio côté serveur, le navigateur lit le texte (speechSynthesis)
+
+Chaque moteur retourne du PCM 16 bits mono et sa fréquence d'échantillonnage.
+Français et arabe : une voix par langue, choisie d'après l'écriture du texte.
+
+Configuration (.env) :
+    TTS_BACKEND=piper                   # piper | espeak | none (défaut : piper si une voix est
+                                        # configurée, sinon espeak s'il est installé, sinon none)
+    PIPER_VOICE_FR=voices/fr_FR-siwis-medium.onnx
+    PIPER_VOICE_AR=voices/ar_JO-kareem-medium.onnx
+    TTS_LENGTH_SCALE=1.15               # > 1 : débit plus lent (seniors)
+    ESPEAK_RATE=140                     # mots par minute
+
+Setup Piper :
+    pip install "piper-tts>=1.3"
+    python -m piper.download_voices fr_FR-siwis-medium ar_JO-kareem-medium --download-dir voices
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from .wav_utils import wav_to_pcm
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+_ARABIC = re.compile(r"[؀-ۿݐ-ݿﭐ-﷿ﹰ-﻿]")
+
+
+def detect_language(text: str) -> str:
+    """ "ar" si le texte contient de l'arabe, sinon "fr" """
+    return "ar" if _ARABIC.search(text) else "fr"
+
+
+class TTSBackend:
+    """Interface commune des moteurs de synthèse"""
+
+    name = "base"
+
+    def __init__(self, languages: Optional[Set[str]] = None):
+        self.languages: Set[str] = languages or set()
+
+    def supports(self, language: str) -> bool:
+        return language in self.languages
+
+    def voice_id(self, language: str) -> str:
+        """Identifiant de la voix (clé du cache : changer de voix invalide l'audio)"""
+        return f"{self.name}:{language}"
+
+    def synthesize(self, text: str, language: str) -> Tuple[bytes, int]:
+        """Texte → (PCM 16 bits mono, fréquence d'échantillonnage)"""
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return f"{self.name} ({', '.join(sorted(self.languages)) or 'aucune voix'})"
+
+
+class NoTTSBackend(TTSBackend):
+    """Pas de synthèse serveur : lecture par le navigateur"""
+
+    name = "none"
+
+    def describe(self) -> str:
+        return "none (lecture par le navigateur)"
+
+
+class PiperTTSBackend(TTSBackend):
+    """Piper (ONNX, CPU) — une voix chargée par langue, au premier besoin"""
+
+    name = "piper"
+
+    def __init__(self, voices: Optional[Dict[str, str]] = None, length_scale: Optional[float] = None):
+        if voices is None:
+            voices = {
+                language: os.getenv(f"PIPER_VOICE_{language.upper()}", "")
+                for language in ("fr", "ar")
+            }
+        self.voices = {
+            language: path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+            for language, path in voices.items() if path
+        }
+        super().__init__(set(self.voices))
+        self.length_scale = length_scale or float(os.getenv("TTS_LENGTH_SCALE", "1.15"))
+        self._loaded: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def voice_id(self, language: str) -> str:
+        return f"{self.name}:{os.path.basename(self.voices.get(language, ''))}:{self.length_scale}"
+
+    def _voice(self, language: str):
+        voice = self._loaded.get(language)
+        if voice is None:
+            with self._lock:
+                voice = self._loaded.get(language)
+                if voice is None:
+                    try:
+                        from piper import PiperVoice
+                    except ImportError as e:
+                        raise RuntimeError("❌ piper-tts n'est pas installé : pip install piper-tts") from e
+                    print(f"⏳ Chargement de la voix Piper '{os.path.basename(self.voices[language])}'...")
+                    voice = self._loaded[language] = PiperVoice.load(self.voices[language])
+        return voice
+
+    def warmup(self) -> None:
+        for language in self.voices:
+            self._voice(language)
+
+    def synthesize(self, text: str, language: str) -> Tuple[bytes, int]:
+        from piper import SynthesisConfig
+
+        voice = self._voice(language)
+        config = SynthesisConfig(length_scale=self.length_scale)
+        pcm = b"".join(chunk.audio_int16_bytes for chunk in voice.synthesize(text, syn_config=config))
+        return pcm, voice.config.sample_rate
+
+
+class EspeakTTSBackend(TTSBackend):
+    """espeak-ng (processus par phrase, sortie WAV sur stdout)"""
+
+    name = "espeak"
+    VOICES = {"fr": "fr-fr", "ar": "ar"}
+
+    def __init__(self, executable: Optional[str] = None, rate: Optional[int] = None):
+        super().__init__(set(self.VOICES))
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+        self.rate = rate or int(os.getenv("ESPEAK_RATE", "140"))
+
+    def voice_id(self, language: str) -> str:
+        return f"{self.name}:{self.VOICES[language]}:{self.rate}"
+
+    def synthesize(self, text: str, language: str) -> Tuple[bytes, int]:
+        if self.executable is None:
+            raise RuntimeError("❌ espeak-ng introuvable : apt install espeak-ng")
+        result = subprocess.run(
+            [self.executable, "-v", self.VOICES[language], "-s", str(self.rate), "--stdout", text],
+            capture_output=True, timeout=30, check=True,
+        )
+        return wav_to_pcm(result.stdout)
+
+
+BACKENDS = {
+    PiperTTSBackend.name: PiperTTSBackend,
+    EspeakTTSBackend.name: EspeakTTSBackend,
+    NoTTSBackend.name: NoTTSBackend,
+}
+
+
+def create_tts_backend(name: Optional[str] = None) -> TTSBackend:
+    """Instancier le moteur choisi par configuration (TTS_BACKEND)"""
+    name = (name or os.getenv("TTS_BACKEND") or "").lower()
+    if not name:
+        if os.getenv("PIPER_VOICE_FR") or os.getenv("PIPER_VOICE_AR"):
+            name = "piper"
+        elif shutil.which("espeak-ng") or shutil.which("espeak"):
+            name = "espeak"
+        else:
+            name = "none"
+    if name not in BACKENDS:
+        raise ValueError(f"❌ TTS_BACKEND inconnu : {name} (choix : {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
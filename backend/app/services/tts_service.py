@@ -1,27 +1,313 @@
 """
 Service TTS pour SeniorVoice
-Text-to-Speech - retourne le texte de la réponse vocale
-(pas de génération mp3, juste du texte pour affichage et lecture côté frontend)
+Text-to-Speech côté serveur : la réponse est synthétisée par un moteur hors ligne (Piper,
+espeak-ng — voir tts_backends) et servie en WAV sur GET /api/tts/<clé>.wav.
+
+Cache adressé par contenu : clé = SHA-256(voix + texte). Les réponses fixes ou répétées
+du moteur d'actions (aide, « Quel rappel souhaitez-vous créer ? », confirmations) ne sont
+synthétisées qu'une fois, puis lues sur disque, y compris après redémarrage.
+Sans moteur (TTS_BACKEND=none) ou pour une langue sans voix, seul le texte est renvoyé
+et le navigateur le lit (speechSynthesis).
+
+Synthèse segmentée (TTS_MODE=segments) : les réponses issues d'un gabarit
+(speech_templates) sont assemblées à partir de clips PCM — fragments fixes, heures,
+minutes, noms des contacts — pré-rendus au démarrage. Seul le texte libre (titre d'un
+rappel, contenu d'un message) passe par le moteur ; les buffers PCM sont concaténés
+tels quels sous un en-tête WAV, sans réencodage.
+
+Lecture en flux (GET /api/tts/<clé>/stream) : les réponses longues (messages, agenda)
+sont synthétisées phrase par phrase — séparateurs « … » et « . » — et envoyées au fil
+de l'eau ; la lecture commence dès la première phrase.
+
+Configuration (.env) :
+    TTS_MODE=phrase                     # phrase | segments
+    TTS_CACHE_ENABLED=true
+    TTS_CACHE_MAX_MB=100
+    TTS_PENDING_MAX=1000                # textes annoncés mais pas encore synthétisés
 """
 
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from .contact_index import ContactIndex
+from .speech_templates import FREE, VOCABULARIES, Segment, SpeechTemplate, spoken
+from .transcription_cache import TranscriptionCache
+from .tts_backends import TTSBackend, create_tts_backend, detect_language
+from .wav_utils import pcm_to_wav, wav_to_pcm
+
+MODES = ("phrase", "segments")
+
+# Séparateurs de phrases des réponses longues (« … » entre messages, « . » entre créneaux)
+_SENTENCE_BREAK = re.compile(r" … |(?<=[.!?]) ")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BREAK.split(text) if sentence.strip()]
+
+
+class TTSCache(TranscriptionCache):
+    """Cache disque de l'audio synthétisé (WAV), borné en taille, éviction LRU"""
+
+    table = "speech"
+    column = "audio"
+    column_type = "BLOB"
+    filename = "tts.db"
+    max_mb_env = ("TTS_CACHE_MAX_MB", "100")
+
+    _size = staticmethod(len)
+
+    @staticmethod
+    def make_key(text: str, voice: str) -> str:
+        """Empreinte de la voix + texte"""
+        return hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_or_synthesize(self, key: str, synthesize) -> bytes:
+        return self.get_or_transcribe(key, synthesize)
+
 
 class TTSService:
-    """Service de synthèse vocale (texte uniquement, pas de génération de fichiers audio)"""
+    """Synthèse vocale serveur avec cache de phrases (texte seul si aucun moteur)"""
+
+    def __init__(
+        self,
+        backend: Optional[TTSBackend] = None,
+        cache: Optional[TTSCache] = None,
+        pending_max: Optional[int] = None,
+        mode: Optional[str] = None,
+        contact_index: Optional[ContactIndex] = None,
+    ):
+        mode = (mode or os.getenv("TTS_MODE", "phrase")).lower()
+        if mode not in MODES:
+            raise ValueError(f"❌ TTS_MODE inconnu : {mode} (choix : {', '.join(MODES)})")
+        self.backend = backend or create_tts_backend()
+        if (
+            cache is None and self.backend.languages
+            and os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        ):
+            cache = TTSCache()
+        self.cache = cache
+        self.pending_max = pending_max or int(os.getenv("TTS_PENDING_MAX", "1000"))
+        self.mode = mode
+        self.contact_index = contact_index
+        # Clé → (texte, langue, segments) : de quoi synthétiser à la demande une réponse annoncée
+        self._pending: "OrderedDict[str, Tuple[str, str, Optional[List[Segment]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Clips pré-rendus (segments) : (type, valeur) → PCM, tous à la même fréquence
+        self._clips: Dict[Segment, bytes] = {}
+        self._clip_rate: Optional[int] = None
+        self._contact_names: Optional[Set[str]] = None
+        if contact_index is not None:
+            contact_index.subscribe(self._contacts_changed)
+
+        self.syntheses = 0
+        self.failures = 0
+        self.assembled = 0
+        self.live_segments = 0
+        self.streamed_sentences = 0
+        self._seconds = 0.0
+        self._audio_seconds = 0.0
 
-    def __init__(self):
-        print("✅ Service TTS initialisé (mode texte)")
+        print(f"✅ Service TTS initialisé ({self.backend.describe()}, mode {self.mode})")
 
-    def generate_response(self, text: str) -> dict:
+    @property
+    def segmented(self) -> bool:
+        return self.mode == "segments" and self.backend.supports("fr")
+
+    def key(self, text: str, language: str) -> str:
+        return TTSCache.make_key(text, self.backend.voice_id(language))
+
+    def generate_response(self, text: str, segments: Optional[List[Segment]] = None) -> dict:
         """
         Préparer la réponse vocale
 
         Args:
             text: Texte à convertir en parole
+            segments: Découpage du texte par son gabarit (réponses du moteur d'actions)
 
         Returns:
-            {"text": str, "speech_rate": str}
+            {"text": str, "speech_rate": str, "audio_url": str, "stream_url": str,
+             "language": str, "segmented": bool}
+            audio_url vide si aucune voix serveur pour cette langue,
+            stream_url seulement pour une réponse de plusieurs phrases
         """
-        return {
+        response = {
             "text": text,
             "speech_rate": "slow",  # Débit lent pour seniors
+            "audio_url": "",
+            "stream_url": "",
+            "language": detect_language(text),
+            "segmented": False,
+        }
+        if text.strip() and self.backend.supports(response["language"]):
+            key = self.key(text, response["language"])
+            if not self.segmented or response["language"] != "fr":
+                segments = None  # gabarits en français : texte arabe synthétisé d'un bloc
+            with self._lock:
+                self._pending[key] = (text, response["language"], segments)
+                self._pending.move_to_end(key)
+                while len(self._pending) > self.pending_max:
+                    self._pending.popitem(last=False)
+            response["audio_url"] = f"/api/tts/{key}.wav"
+            response["segmented"] = bool(segments)
+            if not segments and len(split_sentences(text)) > 1:
+                response["stream_url"] = f"/api/tts/{key}/stream"
+        return response
+
+    def pending(self, key: str) -> Optional[Tuple[str, str]]:
+        """(texte, langue) d'une réponse annoncée, None si la clé est inconnue ou expirée"""
+        with self._lock:
+            pending = self._pending.get(key)
+        return pending[:2] if pending else None
+
+    def sentence_pcm(self, sentence: str, language: str) -> Tuple[bytes, int]:
+        """Une phrase d'une réponse lue en flux → PCM (cache de phrases)"""
+        with self._lock:
+            self.streamed_sentences += 1
+        return self._pcm(sentence, language)
+
+    def audio(self, key: str) -> Optional[bytes]:
+        """WAV d'une réponse annoncée : lu dans le cache, sinon synthétisé. None = clé inconnue"""
+        if self.cache is not None:
+            wav = self.cache.get(key)
+            if wav is not None:
+                return wav
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is None:
+            return None
+        text, language, segments = pending
+        if segments:
+            wav = self.assemble(segments)
+            if wav is not None:
+                return wav
+        return self.synthesize(text, language)
+
+    def synthesize(self, text: str, language: Optional[str] = None) -> bytes:
+        """Texte → WAV, via le cache (une seule synthèse pour des demandes simultanées)"""
+        language = language or detect_language(text)
+        if self.cache is None:
+            return self._synthesize(text, language)
+        return self.cache.get_or_synthesize(
+            self.key(text, language), lambda: self._synthesize(text, language)
+        )
+
+    def _synthesize(self, text: str, language: str) -> bytes:
+        start = time.perf_counter()
+        try:
+            pcm, sample_rate = self.backend.synthesize(text, language)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        with self._lock:
+            self.syntheses += 1
+            self._seconds += time.perf_counter() - start
+            self._audio_seconds += len(pcm) / 2 / sample_rate
+        return pcm_to_wav(pcm, sample_rate)
+
+    # ------------------------------------------------------------------
+    #  SYNTHÈSE SEGMENTÉE
+    # ------------------------------------------------------------------
+    def _pcm(self, text: str, language: str) -> Tuple[bytes, int]:
+        """Texte → PCM via le cache de phrases"""
+        return wav_to_pcm(self.synthesize(text, language))
+
+    def _contacts_changed(self) -> None:
+        self._contact_names = None
+
+    def _is_contact(self, name: str) -> bool:
+        if self.contact_index is None:
+            return False
+        names = self._contact_names
+        if names is None:
+            names = self._contact_names = set(self.contact_index.names())
+        return name in names
+
+    def _render_clip(self, segment: Segment) -> Optional[bytes]:
+        kind, value = segment
+        pcm, sample_rate = self._pcm(value if kind == "text" else spoken(kind, value), "fr")
+        if self._clip_rate is None:
+            self._clip_rate = sample_rate
+        if sample_rate != self._clip_rate:
+            return None
+        self._clips[segment] = pcm
+        return pcm
+
+    def vocabulary(self) -> List[Segment]:
+        """Tout ce qui se pré-rend : fragments des gabarits, vocabulaires fermés, noms des contacts"""
+        segments = {("text", fragment) for template in SpeechTemplate.registry for fragment in template.fragments}
+        segments.update((kind, value) for kind, values in VOCABULARIES.items() for value in values)
+        if self.contact_index is not None:
+            segments.update(("contact", name) for name in self.contact_index.names())
+        return sorted(segments)
+
+    def prerender(self) -> int:
+        """Rendre les clips manquants (lifespan, en tâche de fond) ; nombre de clips rendus"""
+        if not self.segmented:
+            return 0
+        start = time.perf_counter()
+        rendered = 0
+        for segment in self.vocabulary():
+            if segment in self._clips:
+                continue
+            try:
+                if self._render_clip(segment) is not None:
+                    rendered += 1
+            except Exception as e:
+                print(f"⚠️  Pré-rendu TTS interrompu : {e}")
+                break
+        print(f"✅ TTS segmenté — {rendered} clips pré-rendus en {time.perf_counter() - start:.1f}s")
+        return rendered
+
+    def start(self) -> None:
+        """Pré-rendu des clips sans retarder le démarrage (segments manquants rendus à la demande)"""
+        if self.segmented:
+            threading.Thread(target=self.prerender, name="tts-prerender", daemon=True).start()
+
+    def assemble(self, segments: List[Segment]) -> Optional[bytes]:
+        """Segments → WAV par concaténation de PCM ; None si les fréquences diffèrent"""
+        parts = []
+        for segment in segments:
+            kind, value = segment
+            pcm = self._clips.get(segment)
+            if pcm is None and kind != FREE and (kind != "contact" or self._is_contact(value)):
+                pcm = self._render_clip(segment)
+            elif pcm is None:
+                # Texte libre (ou nom inconnu) : synthèse à la demande, cache de phrases
+                pcm, sample_rate = self._pcm(value, detect_language(value))
+                with self._lock:
+                    self.live_segments += 1
+                if self._clip_rate is not None and sample_rate != self._clip_rate:
+                    return None
+                self._clip_rate = self._clip_rate or sample_rate
+            if pcm is None:
+                return None
+            parts.append(pcm)
+        with self._lock:
+            self.assembled += 1
+        return pcm_to_wav(b"".join(parts), self._clip_rate)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend.name,
+            "mode": self.mode,
+            "languages": sorted(self.backend.languages),
+            "syntheses": self.syntheses,
+            "failures": self.failures,
+            "pending": len(self._pending),
+            "clips": len(self._clips),
+            "clip_bytes": sum(map(len, list(self._clips.values()))),
+            "assembled": self.assembled,
+            "live_segments": self.live_segments,
+            "streamed_sentences": self.streamed_sentences,
+            "avg_ms": round(self._seconds * 1000 / self.syntheses, 1) if self.syntheses else 0.0,
+            # < 1 : plus rapide que le temps réel
+            "real_time_factor": round(self._seconds / self._audio_seconds, 3) if self._audio_seconds else 0.0,
+            "cache": self.cache.stats() if self.cache else None,
         }
@@ -0,0 +1,36 @@
+"""
+Conversions WAV ↔ PCM 16 bits mono SeniorVoice
+Partagées par la transcription (audio découpé, flux du micro) et la synthèse vocale
+(clips assemblés, lecture en flux).
+"""
+
+import io
+import struct
+import wave
+from typing import Tuple
+
+SAMPLE_RATE = 16000
+
+# Taille inconnue (flux) : lecteurs et navigateurs lisent jusqu'à la fin de la réponse
+STREAM_SIZE = 0xFFFFFFFF
+
+
+def wav_header(sample_rate: int, data_size: int = STREAM_SIZE) -> bytes:
+    """En-tête WAV PCM 16 bits mono (data_size par défaut : flux de taille inconnue)"""
+    riff_size = STREAM_SIZE if data_size == STREAM_SIZE else 36 + data_size
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", riff_size, b"WAVE", b"fmt ", 16, 1, 1,
+        sample_rate, sample_rate * 2, 2, 16, b"data", data_size,
+    )
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """PCM 16 bits mono → fichier WAV en mémoire (format natif des moteurs de transcription)"""
+    return wav_header(sample_rate, len(pcm)) + pcm
+
+
+def wav_to_pcm(data: bytes) -> Tuple[bytes, int]:
+    """WAV 16 bits mono → (PCM, fréquence)"""
+    with wave.open(io.BytesIO(data)) as wav:
+        return wav.readframes(wav.getnframes()), wav.getframerate()
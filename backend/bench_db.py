@@ -0,0 +1,132 @@
+"""
+Benchmark SQLite concurrent lectures/écritures - SeniorVoice
+Compare les profils "default" et "production" (WAL, synchronous=NORMAL, mmap, busy timeout)
+pendant que des lecteurs interrogent les messages (comme /api/messages) et que des
+écrivains enregistrent l'historique (comme ActionEngine.execute).
+
+Usage: python bench_db.py [durée_s] [lecteurs] [écrivains]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from app.database import ActionHistory, Base, Contact, Message, create_db_engine, run_migrations
+
+
+def _setup(profile: str, directory: str):
+    path = os.path.join(directory, f"bench_{profile}.db")
+    engine = create_db_engine(f"sqlite:///{path}", profile=profile)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    contacts = [Contact(name=f"Contact {i}", phone=f"+216 {i}") for i in range(20)]
+    db.add_all(contacts)
+    db.flush()
+    for i in range(2000):
+        db.add(Message(contact_id=contacts[i % 20].id, content=f"Message {i}"))
+    db.commit()
+    db.close()
+    return engine, Session
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run_profile(profile: str, duration: float, readers: int, writers: int, directory: str) -> dict:
+    engine, Session = _setup(profile, directory)
+    stop = threading.Event()
+    read_latencies, write_latencies = [], []
+    errors = []
+    lock = threading.Lock()
+
+    def reader():
+        db = Session()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                messages = (
+                    db.query(Message).options(joinedload(Message.contact))
+                    .order_by(Message.created_at.desc()).limit(20).all()
+                )
+                [m.contact.name for m in messages if m.contact]
+                db.rollback()  # fin de la transaction de lecture
+            except Exception as e:
+                db.rollback()
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - t0)
+        db.close()
+
+    def writer():
+        db = Session()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                db.add(ActionHistory(transcription="quelle heure est-il", detected_intent="get_time",
+                                     entities_json="{}", action_result="Il est 10 heures"))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                write_latencies.append(time.perf_counter() - t0)
+        db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    return {
+        "reads_per_s": len(read_latencies) / duration,
+        "writes_per_s": len(write_latencies) / duration,
+        "read_p50_ms": _percentile(read_latencies, 50) * 1000,
+        "read_p99_ms": _percentile(read_latencies, 99) * 1000,
+        "write_p50_ms": _percentile(write_latencies, 50) * 1000,
+        "write_p99_ms": _percentile(write_latencies, 99) * 1000,
+        "errors": len(errors),
+    }
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    print("=" * 72)
+    print(f"🗄️  SQLite — {readers} lecteurs + {writers} écrivains pendant {duration:.0f} s")
+    print("=" * 72)
+    print(f"  {'Profil':<12}{'lect/s':>9}{'écr/s':>9}{'lect p50':>10}{'lect p99':>10}"
+          f"{'écr p50':>10}{'écr p99':>10}{'erreurs':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in ("default", "production"):
+            r = run_profile(profile, duration, readers, writers, directory)
+            print(f"  {profile:<12}{r['reads_per_s']:>9.0f}{r['writes_per_s']:>9.0f}"
+                  f"{r['read_p50_ms']:>8.2f}ms{r['read_p99_ms']:>8.2f}ms"
+                  f"{r['write_p50_ms']:>8.2f}ms{r['write_p99_ms']:>8.2f}ms{r['errors']:>9}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+SLO du chemin rapide d'urgence - SeniorVoice
+Texte → réponse d'alerte (hors transcription) avec 5000 contacts indexés en mémoire,
+dont 10 contacts d'urgence. Code de sortie 1 si le p99 dépasse le SLO.
+
+Usage: python bench_emergency.py [alertes] [slo_p99_ms]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.routers import voice
+from app.services.contact_index import ContactIndex
+
+EMERGENCY_SLO_P99_MS = 5.0
+TEXTS = ("au secours je suis tombé", "نجدة عاوني", "appelez le samu vite")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    slo_ms = float(sys.argv[2]) if len(sys.argv) > 2 else EMERGENCY_SLO_P99_MS
+
+    index = ContactIndex()
+    index.load(
+        SimpleNamespace(id=i, name=f"Contact {i}", phone=f"+216 {i}", relation="", is_emergency=i % 500 == 0)
+        for i in range(1, 5001)
+    )
+    voice.action_engine.contact_index = index
+    voice.history_sink.add = lambda row: None  # pas d'écriture dans la base du bench
+
+    async def scenario():
+        latencies = []
+        for i in range(count):
+            start = time.perf_counter()
+            response = await voice._emergency_fast_path(TEXTS[i % len(TEXTS)])
+            latencies.append(time.perf_counter() - start)
+            assert response is not None and response.intent == "emergency_alert"
+        return sorted(latencies)
+
+    latencies = asyncio.run(scenario())
+    p50_ms = latencies[len(latencies) // 2] * 1000
+    p99_ms = latencies[int(0.99 * len(latencies))] * 1000
+
+    print("=" * 60)
+    print(f"🚨 Chemin rapide d'urgence — {count} alertes, 5000 contacts")
+    print("=" * 60)
+    print(f"  p50 : {p50_ms:6.2f} ms")
+    print(f"  p99 : {p99_ms:6.2f} ms   (SLO {slo_ms:.1f} ms)")
+    print(f"  {'✅ SLO respecté' if p99_ms < slo_ms else '❌ SLO dépassé'}")
+    print("=" * 60)
+    sys.exit(0 if p99_ms < slo_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
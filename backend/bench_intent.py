@@ -0,0 +1,93 @@
+"""
+Micro-benchmark de la détection d'intention - SeniorVoice
+Compare la boucle historique (mots-clés + re.search non compilés)
+au moteur précompilé (automate Aho-Corasick + regex compilées)
+sur dataset/seniorvoice_dataset.json
+
+Usage: python bench_intent.py [repetitions]
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.nlp_processor import NLPProcessor
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "seniorvoice_dataset.json")
+
+
+def legacy_scores(nlp: NLPProcessor, text: str) -> Dict[str, float]:
+    """Implémentation de référence : la boucle de scoring d'origine, intent par intent"""
+    scores: Dict[str, float] = {}
+
+    for intent_name, data in nlp.intent_patterns.items():
+        score = 0.0
+
+        if any(b in text for b in data.get("blockers", [])):
+            continue
+
+        for kw in data.get("strong_keywords", []):
+            if kw.lower() in text:
+                score += 2.0
+                if text.startswith(kw.lower()):
+                    score += 0.5
+
+        for kw in data.get("keywords", []):
+            if kw.lower() in text:
+                score += 1.0
+
+        for pattern in data.get("patterns", []):
+            try:
+                if re.search(pattern, text, re.IGNORECASE | re.UNICODE):
+                    score += 1.5
+            except re.error:
+                pass
+
+        if score > 0:
+            scores[intent_name] = score
+
+    return scores
+
+
+def load_texts(nlp: NLPProcessor):
+    with open(DATASET_PATH, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    return [nlp._normalize(item["transcription_attendue"]) for item in dataset]
+
+
+def _time_per_utterance(fn, texts, repetitions: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for t in texts:
+            fn(t)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repetitions * len(texts)) * 1e6
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    nlp = NLPProcessor()
+    texts = load_texts(nlp)
+
+    mismatches = [t for t in texts if legacy_scores(nlp, t) != nlp._score_intents(t)]
+
+    before = _time_per_utterance(lambda t: legacy_scores(nlp, t), texts, repetitions)
+    after = _time_per_utterance(nlp._score_intents, texts, repetitions)
+
+    print("=" * 60)
+    print(f"📊 Détection d'intention — {len(texts)} phrases × {repetitions} répétitions")
+    print("=" * 60)
+    print(f"  Avant (boucle + re.search)   : {before:8.1f} µs / phrase")
+    print(f"  Après (automate + compilées) : {after:8.1f} µs / phrase")
+    print(f"  Gain                          : ×{before / after:.2f}")
+    print(f"  Scores identiques             : {len(texts) - len(mismatches)}/{len(texts)}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark NLP SeniorVoice — précision et débit de NLPProcessor.process
+Charge dataset/seniorvoice_dataset.json, l'enrichit éventuellement avec les modèles de
+generate_dataset.py, puis mesure :
+  - précision / rappel / F1 par intention + matrice de confusion
+  - débit (phrases/s) et latence p50 / p95 / p99
+Les résultats sont écrits en JSON pour comparer deux versions.
+
+Usage:
+    python bench_nlp.py                              # dataset seul
+    python bench_nlp.py --expand 10000               # + 10 000 phrases générées
+    python bench_nlp.py --compare ancien.json        # écart avec un run précédent
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.nlp_processor import NLPProcessor
+from generate_dataset import INTENTS, TEMPLATES, VARS
+
+DATASET_PATH = os.path.join(BACKEND_DIR, "dataset", "seniorvoice_dataset.json")
+
+
+# ──────────────────────────────────────────────────────────────────────
+#  DONNÉES
+# ──────────────────────────────────────────────────────────────────────
+def load_dataset(path: str = DATASET_PATH) -> List[Tuple[str, str]]:
+    """[(phrase, intention attendue)]"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(item["transcription_attendue"], item["intention_cible"]) for item in json.load(f)]
+
+
+def expand_dataset(count: int, seed: int = 42) -> List[Tuple[str, str]]:
+    """Générer `count` phrases à partir des modèles de generate_dataset.py (reproductible)"""
+    rng = random.Random(seed)
+    samples = []
+    for i in range(count):
+        intent = INTENTS[i % len(INTENTS)]
+        text = rng.choice(TEMPLATES[intent])
+        for key, values in VARS.items():
+            if key in text:
+                text = text.replace(key, rng.choice(values))
+        samples.append((text, intent))
+    return samples
+
+
+# ──────────────────────────────────────────────────────────────────────
+#  MESURES
+# ──────────────────────────────────────────────────────────────────────
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_benchmark(samples: List[Tuple[str, str]], nlp: NLPProcessor) -> Dict:
+    latencies = []
+    predictions = []
+
+    # Échauffement (imports paresseux, caches du module re)
+    for text, _expected in samples[:200]:
+        nlp.process(text)
+    nlp.cache.clear()
+
+    start = time.perf_counter()
+    for text, _expected in samples:
+        t0 = time.perf_counter()
+        result = nlp.process(text)
+        latencies.append(time.perf_counter() - t0)
+        predictions.append(result["intent"])
+    elapsed = time.perf_counter() - start
+
+    labels = list(INTENTS) + ["unknown"]
+    confusion = {expected: {predicted: 0 for predicted in labels} for expected in labels}
+    for (_text, expected), predicted in zip(samples, predictions):
+        confusion.setdefault(expected, {p: 0 for p in labels})
+        confusion[expected][predicted] = confusion[expected].get(predicted, 0) + 1
+
+    per_intent = {}
+    for intent in INTENTS:
+        tp = confusion[intent][intent]
+        fp = sum(confusion[other].get(intent, 0) for other in confusion if other != intent)
+        fn = sum(n for predicted, n in confusion[intent].items() if predicted != intent)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_intent[intent] = {
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "support": tp + fn,
+        }
+
+    correct = sum(1 for (_t, e), p in zip(samples, predictions) if e == p)
+    latencies.sort()
+    return {
+        "samples": len(samples),
+        "unique_texts": len({t for t, _ in samples}),
+        "accuracy": round(correct / len(samples), 4) if samples else 0.0,
+        "macro_f1": round(sum(m["f1"] for m in per_intent.values()) / len(per_intent), 4),
+        "per_intent": per_intent,
+        "confusion_matrix": confusion,
+        "throughput_per_s": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 4),
+            "p95": round(percentile(latencies, 95) * 1000, 4),
+            "p99": round(percentile(latencies, 99) * 1000, 4),
+        },
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+
+
+# ──────────────────────────────────────────────────────────────────────
+#  RAPPORT
+# ──────────────────────────────────────────────────────────────────────
+def print_report(report: Dict) -> None:
+    print("=" * 72)
+    print(f"🧪 Benchmark NLP — {report['samples']} phrases ({report['unique_texts']} distinctes)")
+    print("=" * 72)
+    print(f"  Exactitude : {report['accuracy']:.2%}   F1 macro : {report['macro_f1']:.2%}")
+    lat = report["latency_ms"]
+    print(f"  Débit      : {report['throughput_per_s']:.0f} phrases/s")
+    print(f"  Latence    : p50 {lat['p50']:.3f} ms · p95 {lat['p95']:.3f} ms · p99 {lat['p99']:.3f} ms")
+    print()
+    print(f"  {'Intention':<18}{'Précision':>10}{'Rappel':>10}{'F1':>10}{'N':>8}")
+    for intent, m in report["per_intent"].items():
+        print(f"  {intent:<18}{m['precision']:>10.2%}{m['recall']:>10.2%}{m['f1']:>10.2%}{m['support']:>8}")
+    print()
+
+    # Matrice de confusion : lignes = attendu, colonnes = prédit
+    labels = list(report["confusion_matrix"])
+    short = [label[:6] for label in labels]
+    print("  Confusion (ligne = attendu, colonne = prédit)")
+    print("  " + " " * 18 + "".join(f"{s:>8}" for s in short))
+    for expected in labels:
+        row = report["confusion_matrix"][expected]
+        if not sum(row.values()):
+            continue
+        print(f"  {expected:<18}" + "".join(f"{row.get(p, 0):>8}" for p in labels))
+    print("=" * 72)
+
+
+def print_comparison(report: Dict, previous: Dict) -> None:
+    print(f"📊 Comparaison avec {previous.get('revision') or 'run précédent'} ({previous.get('timestamp', '?')})")
+    for key in ("accuracy", "macro_f1", "throughput_per_s"):
+        print(f"  {key:<18}{previous.get(key, 0):>12} → {report[key]:<12}")
+    for p in ("p50", "p95", "p99"):
+        before = previous.get("latency_ms", {}).get(p, 0)
+        print(f"  latence {p:<10}{before:>12} → {report['latency_ms'][p]:<12}")
+    changed = [
+        intent for intent, m in report["per_intent"].items()
+        if previous.get("per_intent", {}).get(intent, {}).get("f1") != m["f1"]
+    ]
+    if changed:
+        print(f"  F1 modifié : {', '.join(changed)}")
+    print("=" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark précision/débit de NLPProcessor")
+    parser.add_argument("--expand", type=int, default=0, help="phrases générées à ajouter au dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="garder le cache LRU du NLP (désactivé par défaut)")
+    parser.add_argument("--output", default=os.path.join(BACKEND_DIR, "bench_nlp.json"))
+    parser.add_argument("--compare", help="fichier JSON d'un run précédent")
+    args = parser.parse_args()
+
+    samples = load_dataset()
+    if args.expand:
+        samples += expand_dataset(args.expand, args.seed)
+
+    # Sans cache par défaut : on mesure le traitement, pas les hits
+    nlp = NLPProcessor() if args.cache else NLPProcessor(cache_size=0)
+    report = run_benchmark(samples, nlp)
+    report.update({
+        "revision": _git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "expand": args.expand,
+        "seed": args.seed,
+        "cache": args.cache,
+    })
+
+    print_report(report)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
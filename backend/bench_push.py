@@ -0,0 +1,150 @@
+"""
+Charge serveur par tableau de bord connecté - SeniorVoice
+Lance l'API (uvicorn, processus séparé), connecte N tableaux de bord au flux
+/api/events et écrit des contacts à cadence fixe (comme create_contact). À chaque
+événement "change", chaque tableau de bord se resynchronise :
+- "complet" : relit /api/reminders, /api/medications, /api/contacts, /api/messages
+  (ancien Dashboard.jsx)
+- "delta"   : GET /api/changes?since=<curseur> (nouveau Dashboard.jsx)
+Une phase "repos" mesure le coût d'un abonné inactif (keepalive seul).
+
+Temps CPU du serveur lu dans /proc/<pid>/stat (Linux) : par resynchronisation, et
+par tableau de bord et par écriture (au repos : par seconde). Les contacts créés
+restent dans la base configurée.
+
+Usage: python bench_push.py [durée_s] [tableaux] [écritures/s] [port]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FULL_LISTS = ("/reminders", "/medications", "/contacts", "/messages")
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime, stime (champs 14 et 15)
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Dashboard:
+    def __init__(self, client: httpx.AsyncClient, mode: str):
+        self.client = client
+        self.mode = mode
+        self.cursor = 0
+        self.syncs = 0
+        self.bytes = 0
+        self.pending = asyncio.Event()
+
+    async def run(self, ready: asyncio.Event) -> None:
+        self.cursor = (await self.client.get("/changes")).json()["cursor"]
+        syncer = asyncio.create_task(self._sync_loop())
+        try:
+            async with self.client.stream("GET", "/events") as response:
+                ready.set()
+                event_type = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event_type = line[6:].strip()
+                    elif line.startswith("data:") and event_type == "change":
+                        self.pending.set()
+        finally:
+            syncer.cancel()
+
+    async def _sync_loop(self) -> None:
+        # Événements regroupés : une resynchronisation couvre tous les changements reçus entre-temps
+        while True:
+            await self.pending.wait()
+            self.pending.clear()
+            if self.mode == "complet":
+                responses = await asyncio.gather(*(self.client.get(path) for path in FULL_LISTS))
+            else:
+                responses = [await self.client.get("/changes", params={"since": self.cursor})]
+                self.cursor = responses[0].json()["cursor"]
+            self.syncs += 1
+            self.bytes += sum(len(r.content) for r in responses)
+
+
+async def run_phase(base_url: str, pid: int, mode: str, duration: float, dashboards: int, writes_per_s: float) -> dict:
+    limits = httpx.Limits(max_connections=dashboards * 5 + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        boards = [Dashboard(client, mode) for _ in range(dashboards)]
+        ready = [asyncio.Event() for _ in boards]
+        tasks = [asyncio.create_task(board.run(event)) for board, event in zip(boards, ready)]
+        await asyncio.gather(*(event.wait() for event in ready))
+        await asyncio.sleep(0.5)
+
+        writes = 0
+        cpu_start, t0 = _cpu_seconds(pid), time.perf_counter()
+        while time.perf_counter() - t0 < duration:
+            if writes_per_s > 0:
+                await client.post("/contacts", json={"name": f"Bench {time.time_ns()}", "phone": "+216 00"})
+                writes += 1
+                await asyncio.sleep(max(0.0, t0 + writes / writes_per_s - time.perf_counter()))
+            else:
+                await asyncio.sleep(duration)
+        await asyncio.sleep(0.5)  # fin des resynchronisations en cours
+        cpu = _cpu_seconds(pid) - cpu_start
+        elapsed = time.perf_counter() - t0
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    syncs = sum(board.syncs for board in boards)
+    return {
+        "writes": writes,
+        "syncs": syncs,
+        "kb": sum(board.bytes for board in boards) / 1024,
+        "cpu_pct": 100 * cpu / elapsed,
+        "cpu_ms_per_sync": 1000 * cpu / syncs if syncs else 0.0,
+        # Coût d'une écriture pour un tableau de bord connecté (au repos : par seconde)
+        "cpu_ms_per_board": 1000 * cpu / dashboards / (writes or elapsed),
+    }
+
+
+async def main() -> None:
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    dashboards = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    writes_per_s = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+    port = int(sys.argv[4]) if len(sys.argv) > 4 else 8765
+    base_url = f"http://127.0.0.1:{port}/api"
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL,
+        env={**os.environ, "TRANSCRIPTION_CACHE_ENABLED": "false"},
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/health")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.2)
+
+        print("=" * 78)
+        print(f"📡 {dashboards} tableaux de bord, {writes_per_s:g} écritures/s, {duration:.0f} s par phase")
+        print("=" * 78)
+        print(f"  {'Phase':<10}{'écritures':>10}{'resyncs':>9}{'Ko reçus':>10}{'CPU serveur':>13}"
+              f"{'ms CPU/resync':>15}{'ms CPU/tableau':>16}")
+        for mode, rate in (("repos", 0.0), ("complet", writes_per_s), ("delta", writes_per_s)):
+            r = await run_phase(base_url, server.pid, mode, duration, dashboards, rate)
+            print(f"  {mode:<10}{r['writes']:>10}{r['syncs']:>9}{r['kb']:>10.0f}{r['cpu_pct']:>12.1f}%"
+                  f"{r['cpu_ms_per_sync']:>15.2f}{r['cpu_ms_per_board']:>16.2f}")
+        print("=" * 78)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,21 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 
 # ⚠️ Must be called BEFORE any app imports so that os.getenv() works everywhere
 load_dotenv()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response, HTMLResponse
 from contextlib import asynccontextmanager
 
-from app.database import init_db, seed_db
+from app.database import init_db, seed_db, dispose_async_engine
 from app.routers import voice
+from app.services.metrics import start_request_timings, end_request_timings, format_server_timing
+
+# En-tête Server-Timing (durée de chaque étape du pipeline) — désactivé par défaut
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
 
 
 # Gestionnaire de cycle de vie
@@ -22,6 +27,10 @@ async def lifespan(app: FastAPI):
     print("✅ Base de données initialisée")
     seed_db()
     print("✅ Données d'exemple chargées")
+    voice.load_indexes()
+    voice.scheduler.start()
+    voice.history_sink.start()
+    voice.tts.start()
     print("✅ Tous les services sont prêts")
     print("=" * 50)
     print("🧓 SeniorVoice est opérationnel!")
@@ -31,6 +40,11 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     print("👋 Arrêt de SeniorVoice...")
+    await voice.scheduler.stop()
+    await voice.history_sink.stop()
+    # Attente des tâches du pool hors de la boucle d'événements
+    await asyncio.to_thread(voice.executor.shutdown)
+    await dispose_async_engine()
 
 
 # Créer l'application FastAPI
@@ -50,6 +64,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if SERVER_TIMING_ENABLED:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        token = start_request_timings()
+        try:
+            response = await call_next(request)
+        finally:
+            timings = end_request_timings(token)
+        if timings:
+            response.headers["Server-Timing"] = format_server_timing(timings)
+        return response
+
 # Inclure les routes API
 app.include_router(voice.router)
 
@@ -108,13 +134,22 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "process_voice": "/api/process-voice",
+            "voice_stream": "/api/voice-stream",
             "contacts": "/api/contacts",
             "reminders": "/api/reminders",
             "medications": "/api/medications",
             "messages": "/api/messages",
             "agenda": "/api/agenda",
+            "changes": "/api/changes",
+            "events": "/api/events",
+            "ws": "/api/ws",
             "history": "/api/history",
+            "history_intents_per_hour": "/api/history/stats/intents-per-hour",
+            "history_failure_rate": "/api/history/stats/failure-rate",
+            "tts": "/api/tts/{key}.wav",
+            "tts_stream": "/api/tts/{key}/stream",
             "health": "/api/health",
+            "metrics": "/api/metrics",
             "docs": "/docs"
         }
     }
@@ -28,5 +28,133 @@ def test_hesitations():
         print(f"Entités extraites : {result['entities']}")
         print("-" * 50)
 
+
+def test_intent_scores_match_reference():
+    """Le moteur précompilé doit donner exactement les scores de la boucle d'origine"""
+    from bench_intent import legacy_scores, load_texts
+
+    nlp = NLPProcessor()
+    texts = load_texts(nlp) + [
+        "rappelle-moi de prendre mon doliprane à 8h",
+        "quelle heure est-il",
+        "je dois prendre mon médicament à quelle heure",
+        "ارسل رسالة لمحمد",
+        "au secours j'ai mal",
+        "",
+    ]
+    for text in texts:
+        assert nlp._score_intents(text) == legacy_scores(nlp, text), text
+
+
+
+def test_process_many_matches_process():
+    """process_many doit donner les mêmes résultats que process, dans le même ordre"""
+    nlp = NLPProcessor()
+    texts = [
+        "euh quelle heure est-il",
+        "quelle heure est-il",
+        "  quelle heure est-il  ",
+        "",
+        "appelle Mohamed",
+        "ذكرني نشري الدوا",
+        "appelle Mohamed",
+    ]
+    results = nlp.process_many(texts)
+    assert results == [nlp.process(t) for t in texts]
+
+    # Chaque résultat a son propre dict d'entités
+    results[4]["entities"]["_raw_text"] = "appelle Mohamed"
+    assert "_raw_text" not in results[6]["entities"]
+
+
+def test_largest_accepted_batch_uses_process_pool():
+    """Un lot à la taille maximale de /api/process-text-batch passe par le pool de processus"""
+    from app.routers.voice import MAX_BATCH_SIZE
+
+    nlp = NLPProcessor()
+    assert nlp.PARALLEL_THRESHOLD <= MAX_BATCH_SIZE
+    parallel = []
+
+    def analyze_parallel(texts, max_workers):
+        parallel.append(len(texts))
+        return [nlp._analyze(t) for t in texts]
+
+    nlp._analyze_parallel = analyze_parallel
+    texts = [f"appelle Contact {i}" for i in range(MAX_BATCH_SIZE)]
+    results = nlp.process_many(texts)
+    assert parallel == [MAX_BATCH_SIZE]
+    assert [r["intent"] for r in results] == ["call_contact"] * MAX_BATCH_SIZE
+
+
+def test_result_cache():
+    """Cache LRU : copies indépendantes, compteurs, éviction et invalidation automatique"""
+    nlp = NLPProcessor(cache_size=2)
+
+    first = nlp.process("appelle Karim")
+    first["entities"]["_raw_text"] = "appelle Karim"
+    again = nlp.process("euh appelle Karim")
+    assert "_raw_text" not in again["entities"]
+    assert again["raw_text"] == "euh appelle Karim"
+    assert nlp.cache_stats()["hits"] == 1
+
+    nlp.process("quelle heure est-il")
+    nlp.process("lis mes messages")
+    assert nlp.cache_stats()["evictions"] == 1
+
+    # Modification en place de la configuration → cache vidé, automate reconstruit
+    nlp.intent_patterns["get_time"]["strong_keywords"].append("saa9a")
+    assert len(nlp.cache) == 0
+    assert nlp.process("saa9a")["intent"] == "get_time"
+
+    nlp.process("ajoute le sirop zorbax")
+    nlp.known_meds.append("zorbax")
+    assert len(nlp.cache) == 0
+    assert nlp.process("ajoute le sirop zorbax")["entities"]["medication"] == "Zorbax"
+
+
+def test_contact_index():
+    """Contacts de la base : accents, casse, arabe ↔ latin, fautes, index partagé avec le cache"""
+    from types import SimpleNamespace
+    from app.services.contact_index import ContactIndex
+
+    def contact(id, name):
+        return SimpleNamespace(id=id, name=name, phone=f"+216 {id}", relation="", is_emergency=False)
+
+    index = ContactIndex()
+    index.load([contact(1, "Mohamed"), contact(2, "Fatma"), contact(3, "Dr. Ben Said"), contact(4, "Hélène")])
+    assert index.resolve("MOHAMMED").id == 1
+    assert index.resolve("محمد").id == 1
+    assert index.resolve("Mohamad").id == 1
+    assert index.resolve("فاطمه").id == 2
+    assert index.resolve("ben said").id == 3
+    assert index.resolve("helene").id == 4
+    assert index.resolve("Karim") is None
+
+    nlp = NLPProcessor(contact_index=index)
+    assert nlp.process("نحب نعيط لمحمد")["entities"]["contact"] == "Mohamed"
+    assert nlp.process("appelle le docteur ben said")["entities"]["contact"] == "Dr. Ben Said"
+    assert nlp.process("lis mes messages de Fatma")["entities"]["contact"] == "Fatma"
+
+    # Nouveau contact (POST /api/contacts) → cache du NLP invalidé
+    assert nlp.process("appelle Karim")["entities"]["contact"] == "Karim"
+    index.add(contact(5, "Karim Jaziri"))
+    assert len(nlp.cache) == 0
+    assert nlp.process("appelle Karim")["entities"]["contact"] == "Karim Jaziri"
+
+
+def test_emergency_spotter_agrees_with_full_scoring():
+    """Le détecteur rapide ne doit jamais déclencher d'alerte que process() ne donnerait pas"""
+    nlp = NLPProcessor()
+    spotted = ["au secours", "AU SECOURS aidez-moi", "appelle le samu", "نجدة نجدة", "عاوني", "c'est urgent"]
+    not_spotted = ["quelle heure est-il", "appelle Mohamed", "j'ai besoin d'aide", "ذكرني نشري الدوا", ""]
+    for text in spotted:
+        assert nlp.spot_emergency(text), text
+        assert nlp.process(text)["intent"] == "emergency_alert", text
+    for text in not_spotted:
+        assert not nlp.spot_emergency(text), text
+
+
 if __name__ == "__main__":
     test_hesitations()
+    test_largest_accepted_batch_uses_process_pool()
+    test_emergency_spotter_agrees_with_full_scoring()
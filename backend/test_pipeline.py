@@ -0,0 +1,190 @@
+"""
+Tests du pool d'exécution du pipeline - SeniorVoice
+Les étapes bloquantes ne doivent pas geler la boucle d'événements
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.metrics import MetricsRegistry, end_request_timings, format_server_timing, start_request_timings
+from app.services.pipeline_executor import PipelineExecutor
+
+
+def test_slow_transcriptions_do_not_block_event_loop():
+    executor = PipelineExecutor(max_workers=4, transcription_concurrency=2)
+    peak = 0
+    current = 0
+    lock = threading.Lock()
+
+    def slow_transcribe(path):
+        nonlocal peak, current
+        with lock:
+            current += 1
+            peak = max(peak, current)
+        time.sleep(0.2)
+        with lock:
+            current -= 1
+        return path
+
+    async def health_check():
+        # Simule /api/health : doit répondre pendant que les transcriptions tournent
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        return time.perf_counter() - start
+
+    async def scenario():
+        transcriptions = [asyncio.create_task(executor.transcribe(slow_transcribe, f"a{i}.webm")) for i in range(4)]
+        await asyncio.sleep(0.05)
+        latency = await health_check()
+        stats = executor.stats()
+        results = await asyncio.gather(*transcriptions)
+        return latency, stats, results
+
+    latency, stats, results = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert latency < 0.05
+    assert stats["transcriptions_in_flight"] == 2
+    assert stats["transcriptions_waiting"] == 2
+    assert peak == 2
+    assert results == [f"a{i}.webm" for i in range(4)]
+
+
+
+def test_cancelled_waiting_transcription_is_not_counted():
+    executor = PipelineExecutor(max_workers=2, transcription_concurrency=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(executor.transcribe(release.wait))
+        waiting = asyncio.create_task(executor.transcribe(release.wait))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["transcriptions_waiting"] == 1
+        # Client parti pendant l'attente du créneau
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        cancelled = executor.stats()
+        release.set()
+        await running
+        # Le créneau libéré sert la transcription suivante
+        await asyncio.wait_for(executor.transcribe(len, "ok"), timeout=1)
+        return cancelled
+
+    cancelled = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert cancelled["transcriptions_waiting"] == 0
+    assert cancelled["transcriptions_in_flight"] == 1
+    assert executor.stats()["transcriptions_in_flight"] == 0
+
+
+def test_cancelled_running_transcription_keeps_its_slot():
+    executor = PipelineExecutor(max_workers=3, transcription_concurrency=1)
+    release = threading.Event()
+    started = []
+
+    def transcribe(name):
+        started.append(name)
+        release.wait()
+        return name
+
+    async def scenario():
+        running = asyncio.create_task(executor.transcribe(transcribe, "annulée"))
+        await asyncio.sleep(0.05)
+        # Client parti pendant la transcription : le thread continue
+        running.cancel()
+        await asyncio.gather(running, return_exceptions=True)
+        following = asyncio.create_task(executor.transcribe(transcribe, "suivante"))
+        await asyncio.sleep(0.05)
+        during = (list(started), executor.stats())
+        release.set()
+        return during, await asyncio.wait_for(following, timeout=1)
+
+    (started_during, stats), result = asyncio.run(scenario())
+    executor.shutdown()
+
+    # Le créneau n'est rendu qu'à la fin du thread : jamais deux transcriptions à la fois
+    assert started_during == ["annulée"]
+    assert stats["transcriptions_in_flight"] == 1 and stats["transcriptions_waiting"] == 1
+    assert result == "suivante" and executor.stats()["transcriptions_in_flight"] == 0
+
+
+def test_stage_histograms_and_server_timing():
+    registry = MetricsRegistry(buckets=(0.01, 0.1))
+    executor = PipelineExecutor(max_workers=2)
+
+    def nlp_stage():
+        # Mesuré dans un thread du pool : doit rester attaché à la requête
+        registry.observe("nlp", 0.05)
+
+    async def request():
+        token = start_request_timings()
+        registry.observe("transcription", 0.5)
+        await executor.run(nlp_stage)
+        return end_request_timings(token)
+
+    timings = asyncio.run(request())
+    executor.shutdown()
+
+    assert [stage for stage, _ in timings] == ["transcription", "nlp"]
+    assert format_server_timing(timings) == "transcription;dur=500.0, nlp;dur=50.0"
+
+    text = registry.render_prometheus()
+    assert 'seniorvoice_stage_duration_seconds_bucket{stage="nlp",le="0.1"} 1' in text
+    assert 'seniorvoice_stage_duration_seconds_bucket{stage="transcription",le="0.1"} 0' in text
+    assert 'seniorvoice_stage_duration_seconds_count{stage="transcription"} 1' in text
+
+
+def test_emergency_fast_path_skips_nlp_and_database(monkeypatch):
+    """Chemin rapide : ni scoring NLP ni session SQL (SLO de latence : bench_emergency.py)"""
+    from types import SimpleNamespace
+    from app.routers import voice
+    from app.services.contact_index import ContactIndex
+
+    def forbidden(*args, **kwargs):
+        raise AssertionError("appel interdit sur le chemin rapide")
+
+    index = ContactIndex()
+    index.load(
+        SimpleNamespace(id=i, name=f"Contact {i}", phone=f"+216 {i}", relation="", is_emergency=i % 500 == 0)
+        for i in range(1, 5001)
+    )
+    monkeypatch.setattr(voice.action_engine, "contact_index", index)
+    monkeypatch.setattr(voice.nlp, "process", forbidden)
+    monkeypatch.setattr(voice.action_engine, "execute", forbidden)
+    monkeypatch.setattr(voice, "SessionLocal", forbidden)
+    monkeypatch.setattr(voice.executor, "run", forbidden)
+    logged = []
+    monkeypatch.setattr(voice.history_sink, "add", logged.append)
+
+    async def scenario():
+        responses = [
+            await voice._emergency_fast_path(text)
+            for text in ("au secours je suis tombé", "نجدة عاوني", "appelez le samu vite")
+        ]
+        assert await voice._emergency_fast_path("quelle heure est-il") is None
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert all(r is not None and r.intent == "emergency_alert" for r in responses)
+    assert [c["name"] for c in responses[-1].action_data["emergency_contacts"]] == [
+        f"Contact {i}" for i in range(500, 5001, 500)
+    ]
+    # Historique différé (history_sink), une entrée par alerte
+    assert len(logged) == 3 and logged[0]["detected_intent"] == "emergency_alert"
+
+
+if __name__ == "__main__":
+    test_slow_transcriptions_do_not_block_event_loop()
+    test_cancelled_waiting_transcription_is_not_counted()
+    test_cancelled_running_transcription_keeps_its_slot()
+    test_stage_histograms_and_server_timing()
+    import pytest
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_emergency_fast_path_skips_nlp_and_database(monkeypatch)
+    print("✅ Pool du pipeline OK")
@@ -0,0 +1,468 @@
+"""
+Tests du nombre de requêtes SQL - SeniorVoice
+Échoue si le N+1 revient sur la lecture des messages
+"""
+
+import asyncio
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TRANSCRIPTION_CACHE_ENABLED", "false")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, Contact, Message
+from app.services.action_engine import ActionEngine
+
+
+def make_session(n_messages: int = 20, url: str = "sqlite://"):
+    engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    contacts = [Contact(name=f"Contact {i}", phone=f"+216 {i}") for i in range(10)]
+    db.add_all(contacts)
+    db.flush()
+    for i in range(n_messages):
+        db.add(Message(contact_id=contacts[i % 10].id, content=f"Message {i}"))
+    db.add(Message(contact_id=None, content="Sans expéditeur"))
+    db.commit()
+    db.expunge_all()
+    return engine, db
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_read_messages_single_query():
+    engine, db = make_session()
+    with count_queries(engine) as statements:
+        result = ActionEngine()._handle_read_messages({}, db)
+    assert len(result["data"]["messages"]) == 5
+    assert all(m["from"] for m in result["data"]["messages"])
+    assert len(statements) == 1, statements
+
+
+def test_read_messages_filtered_by_contact():
+    engine, db = make_session()
+    with count_queries(engine) as statements:
+        result = ActionEngine()._handle_read_messages({"contact": "Contact 3"}, db)
+    assert {m["from"] for m in result["data"]["messages"]} == {"Contact 3"}
+    # Recherche du contact + messages
+    assert len(statements) == 2, statements
+
+
+def test_contact_lookup_uses_index():
+    from app.services.contact_index import ContactIndex
+
+    engine, db = make_session()
+    index = ContactIndex()
+    index.load(db.query(Contact).all())
+    engine_with_index = ActionEngine(contact_index=index)
+    with count_queries(engine) as statements:
+        result = engine_with_index._handle_read_messages({"contact": "contact 3"}, db)
+        call = engine_with_index._handle_call_contact({"contact": "Contact 7"}, db)
+    assert {m["from"] for m in result["data"]["messages"]} == {"Contact 3"}
+    assert call["data"]["phone"] == "+216 7"
+    # Plus de Contact.name.ilike('%…%') : seule la requête des messages reste
+    assert len(statements) == 1, statements
+
+def test_get_messages_single_query():
+    from app.routers.voice import get_messages
+
+    engine, db = make_session()
+    with count_queries(engine) as statements:
+        response = asyncio.run(get_messages(db=db))
+    assert len(response.messages) == 20
+    assert sum(1 for m in response.messages if m.contact_name) >= 19
+    assert len(statements) == 1, statements
+
+
+def test_production_profile_and_migrations(tmp_path):
+    from sqlalchemy import text
+    from app.database import MIGRATIONS, create_db_engine, run_migrations
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sv.db'}", profile="production")
+    # Base créée avant les index (schéma d'origine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, contact_id INTEGER, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE reminders (id INTEGER PRIMARY KEY, reminder_time VARCHAR, is_done BOOLEAN)"))
+        conn.execute(text("CREATE TABLE contacts (id INTEGER PRIMARY KEY, is_emergency BOOLEAN)"))
+        conn.execute(text("CREATE TABLE action_history (id INTEGER PRIMARY KEY, transcription TEXT, "
+                          "detected_intent VARCHAR, entities_json TEXT, action_result TEXT, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO action_history (detected_intent, entities_json) "
+                          "VALUES ('call_contact', \"{'contact': 'Mohamed', '_raw_text': 'appelle Mohamed'}\")"))
+    run_migrations(engine)
+    run_migrations(engine)  # idempotent
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA user_version")).scalar() == len(MIGRATIONS)
+        indexes = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+        # Historique antérieur : repr Python convertie en JSON, contact extrait
+        entities, contact = conn.execute(text("SELECT entities_json, contact FROM action_history")).one()
+    assert {"ix_messages_created_at", "ix_messages_contact_id", "ix_reminders_is_done",
+            "ix_reminders_reminder_time", "ix_contacts_is_emergency", "ix_action_history_created_at",
+            "ix_action_history_intent_id", "ix_action_history_contact_id", "ix_action_history_created_intent"} <= indexes
+    assert entities == '{"contact": "Mohamed"}' and contact == "Mohamed"
+
+
+
+def test_async_session_endpoints_and_actions(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy import func, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.database import ActionHistory, create_async_db_engine
+    from app.routers.voice import get_agenda, get_messages
+
+    path = tmp_path / "sv.db"
+    make_session(url=f"sqlite:///{path}")
+
+    async def scenario():
+        async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+        Session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        async def read(endpoint):
+            async with Session() as session:
+                return await endpoint(db=session)
+
+        try:
+            # Lectures concurrentes : une session par client, comme avec Depends(get_session)
+            messages, agenda = await asyncio.gather(read(get_messages), read(get_agenda))
+            async with Session() as session:
+                result = await ActionEngine().execute_async("send_message", {
+                    "contact": "Contact 3", "message_content": "Bonjour", "_raw_text": "envoie bonjour",
+                }, session)
+            async with Session() as session:
+                sent = await session.scalar(select(func.count()).select_from(Message).where(Message.direction == "sent"))
+                history = await session.scalar(select(func.count()).select_from(ActionHistory))
+            return messages, agenda, result, sent, history
+        finally:
+            await async_engine.dispose()
+
+    messages, agenda, result, sent, history = asyncio.run(scenario())
+    assert len(messages.messages) == 20
+    assert agenda.items == []
+    assert result["success"] and result["data"]["contact"] == "Contact 3"
+    assert sent == 1 and history == 1
+
+
+def test_batch_item_failure_rolls_back_to_savepoint(tmp_path):
+    from app.database import Reminder, create_db_engine
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sv.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    actions = ActionEngine()
+
+    def failing(entities, db):
+        db.add(Reminder(title="à moitié", reminder_time="08:00"))
+        db.flush()
+        raise RuntimeError("panne après flush")
+
+    actions.action_handlers["add_medication"] = failing
+
+    def run(db, items):
+        return [actions.execute(intent, dict(entities), db, commit=False) for intent, entities in items]
+
+    ok = ("create_reminder", {"reminder_title": "marcher", "time": "09:00"})
+    with Session() as db:
+        results = run(db, [ok, ("add_medication", {"medication": "Doliprane"}), ok])
+        db.commit()
+    assert [r["success"] for r in results] == [True, False, True]
+
+    # Lot annulé par l'appelant : les SAVEPOINT déjà relâchés sont annulés aussi
+    with Session() as db:
+        run(db, [ok])
+        db.rollback()
+
+    with Session() as db:
+        assert [r.title for r in db.query(Reminder).order_by(Reminder.id)] == ["marcher", "marcher"]
+
+
+def test_batch_item_failure_keeps_earlier_pending_changes(tmp_path):
+    from sqlalchemy.orm import Session as BaseSession
+    from app.database import Reminder, create_db_engine
+    from app.services.agenda_index import AgendaIndex
+    from app.services.change_feed import ChangeFeed
+    from app.services.history_sink import HistorySink
+    from app.services.notifications import NotificationHub
+
+    class BatchSession(BaseSession):
+        pass
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sv.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, class_=BatchSession)
+    agenda = AgendaIndex()
+    agenda.watch(BatchSession)
+    agenda.load([], [])
+    feed = ChangeFeed(NotificationHub())
+    feed.watch(BatchSession)
+    sink = HistorySink(Session, spill_path=str(tmp_path / "spill.jsonl"))
+    sink.watch(BatchSession)
+    actions = ActionEngine(agenda=agenda, history=sink)
+
+    def failing(entities, db):
+        db.add(Reminder(title="à moitié", reminder_time="08:00"))
+        db.flush()
+        raise RuntimeError("panne après flush")
+
+    actions.action_handlers["add_medication"] = failing
+
+    start = feed.cursor
+    with Session() as db:
+        for intent, entities in [
+            ("create_reminder", {"reminder_title": "marcher", "time": "09:00"}),
+            ("add_medication", {"medication": "Doliprane"}),
+            ("create_reminder", {"reminder_title": "nager", "time": "10:00"}),
+        ]:
+            actions.execute(intent, dict(entities, _raw_text=intent), db, commit=False)
+        db.commit()
+        ids = {r.id for r in db.query(Reminder)}
+
+    # Le retour au SAVEPOINT de la commande en échec n'annule que ses propres changements
+    assert [(e.time, e.title) for e in agenda.today()] == [("09:00", "marcher"), ("10:00", "nager")]
+    assert feed.since(start) == {"reminders": {"upserted": ids, "deleted": set()}}
+    assert [(row["transcription"], row["success"]) for row in sink._queue] == [
+        ("create_reminder", True), ("create_reminder", True),
+    ]
+
+
+def test_batch_history_waits_for_commit(tmp_path):
+    from sqlalchemy.orm import Session as BaseSession
+    from app.services.history_sink import HistorySink
+
+    class BatchSession(BaseSession):
+        pass
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, class_=BatchSession)
+    sink = HistorySink(Session, spill_path=str(tmp_path / "spill.jsonl"))
+    sink.watch(BatchSession)
+    actions = ActionEngine(history=sink)
+    entities = {"_raw_text": "quelle heure est-il"}
+
+    # Lot annulé : rien en file
+    with Session() as db:
+        actions.execute("get_time", dict(entities), db, commit=False)
+        assert len(sink) == 0
+        db.rollback()
+    assert len(sink) == 0
+
+    # Lot validé : lignes en file au commit seulement
+    with Session() as db:
+        actions.execute("get_time", dict(entities), db, commit=False)
+        actions.execute("get_time", dict(entities), db, commit=False)
+        assert len(sink) == 0
+        db.commit()
+    assert len(sink) == 2
+
+
+def test_agenda_index_incremental():
+    from datetime import datetime
+    from app.database import AppSession, Medication, Reminder
+    from app.services.agenda_index import AgendaIndex
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, class_=AppSession)
+    agenda = AgendaIndex()
+    agenda.watch(AppSession)
+
+    with Session() as db:
+        db.add_all([
+            Medication(name="Metformine", dosage="850mg", schedule_time="08:00, 13:00, 20:00"),
+            Reminder(title="Appeler Mohamed", reminder_time="18:00"),
+            Reminder(title="Sans heure", reminder_time="non défini"),
+        ])
+        db.commit()
+        agenda.load(db.query(Reminder).all(), db.query(Medication).all())
+
+    assert [e.time for e in agenda.today()] == ["08:00", "13:00", "18:00", "20:00", "non défini"]
+    assert [e.time for e in agenda.upcoming(2, now=datetime(2026, 1, 1, 12, 30))] == ["13:00", "18:00"]
+
+    # Créations, rappel fait, rollback : appliqués (ou non) sans relire les tables
+    with Session() as db, count_queries(engine) as statements:
+        db.add(Reminder(title="Alarme", reminder_time="7h30", reminder_type="alarm"))
+        db.get(Reminder, 1).is_done = True
+        db.commit()
+        db.add(Medication(name="Annulé", schedule_time="09:00"))
+        db.flush()
+        db.rollback()
+        # Lot : SAVEPOINT relâché puis lot annulé
+        with db.begin_nested():
+            db.add(Reminder(title="Lot annulé", reminder_time="10:00"))
+        db.rollback()
+    assert not any("FROM medications" in s for s in statements)
+    assert [(e.time, e.title) for e in agenda.today()] == [
+        ("07:30", "Alarme"), ("08:00", "Metformine (850mg)"), ("13:00", "Metformine (850mg)"),
+        ("20:00", "Metformine (850mg)"), ("non défini", "Sans heure"),
+    ]
+    assert agenda.counts() == {"reminders": 2, "medications": 1}
+
+
+def test_change_feed_deltas():
+    from app.database import AppSession, Reminder
+    from app.services.change_feed import ChangeFeed
+    from app.services.notifications import NotificationHub
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, class_=AppSession)
+    hub = NotificationHub()
+    feed = ChangeFeed(hub, size=4)
+    feed.watch(AppSession)
+
+    with Session() as db:
+        db.add(Contact(name="Mohamed", phone="+216 1"))
+        db.add(Reminder(title="Pharmacie", reminder_time="10:00"))
+        db.commit()
+        start = feed.cursor
+        db.add(Message(contact_id=1, content="Bonjour"))
+        db.get(Reminder, 1).is_done = True
+        db.commit()
+        db.add(Contact(name="Annulé", phone="+216 2"))
+        db.flush()
+        db.rollback()
+        db.delete(db.get(Message, 1))
+        db.commit()
+
+    assert hub.published == 3
+    assert feed.since(start) == {
+        "reminders": {"upserted": {1}, "deleted": set()},
+        "messages": {"upserted": set(), "deleted": {1}},
+    }
+    assert feed.since(feed.cursor) == {}
+    # Journal dépassé (ou curseur inconnu) : le client doit tout recharger
+    with Session() as db:
+        db.add_all([Contact(name=f"Contact {i}", phone=f"+216 {i}") for i in range(5)])
+        db.commit()
+    assert feed.since(start) is None
+    assert feed.since(feed.cursor + 1) is None
+
+
+def test_history_sink_batches_and_spills(tmp_path):
+    from sqlalchemy import func, select
+    from app.database import ActionHistory
+    from app.services.history_sink import HistorySink
+
+    engine, db = make_session()
+    Session = sessionmaker(bind=engine)
+    spill = tmp_path / "spill.jsonl"
+    sink = HistorySink(Session, batch_size=100, interval_ms=50, max_queue=300, spill_path=str(spill))
+    engine_actions = ActionEngine(history=sink)
+
+    def count():
+        with Session() as s:
+            return s.scalar(select(func.count()).select_from(ActionHistory))
+
+    # Sans tâche de fond : la file se remplit, le surplus déborde sur disque
+    for i in range(350):
+        sink.add(ActionEngine.history_row("get_time", {"_raw_text": f"heure {i}"}, {"response_text": "10h"}))
+    assert sink.stats()["depth"] == 300 and sink.spilled == 50 and count() == 0
+
+    async def scenario():
+        sink.start()  # rejoue les 50 lignes débordées en tête de file
+        await asyncio.sleep(0.2)
+        with Session() as s:
+            # Commande en lecture seule : aucune écriture dans la transaction de la requête
+            with count_queries(engine) as statements:
+                result = engine_actions.execute("get_time", {"_raw_text": "quelle heure est-il"}, s)
+        assert result["success"] and not any("INSERT" in st for st in statements)
+        await sink.stop()
+
+    asyncio.run(scenario())
+    stats = sink.stats()
+    assert count() == 351 and stats["depth"] == 0 and stats["replayed"] == 50
+    assert stats["batches"] == 5 and stats["dropped"] == 0 and not spill.exists()
+    with Session() as s:
+        first = s.query(ActionHistory).order_by(ActionHistory.id).first()
+    assert first.transcription == "heure 300"  # débordement rejoué en premier
+
+
+def test_history_json_pagination_and_stats():
+    from datetime import datetime, timedelta
+    from app.database import ActionHistory
+    from app.routers.voice import get_failure_rate, get_history, get_intents_per_hour
+
+    engine, db = make_session()
+    actions = ActionEngine()
+    result = actions.execute("send_message", {
+        "contact": "contact 3", "message_content": "Bonjour", "_raw_text": "envoie bonjour",
+    }, db)
+    assert result["success"]
+    row = db.query(ActionHistory).one()
+    assert json.loads(row.entities_json) == {"contact": "contact 3", "message_content": "Bonjour"}
+    assert row.contact == "Contact 3" and row.success is True  # nom résolu
+
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+    for i in range(60):
+        db.add(ActionHistory(**{
+            **ActionEngine.history_row(
+                "call_contact" if i % 2 else "get_time",
+                {"contact": "Mohamed"} if i % 2 else {},
+                {"success": i % 4 != 1, "response_text": "ok"},
+            ),
+            "created_at": base + timedelta(minutes=3 * i),
+        }))
+    db.commit()
+
+    def call(endpoint, **params):
+        defaults = {"limit": 20, "before": None, "intent": None, "contact": None, "since": None, "until": None}
+        if endpoint is not get_history:
+            defaults = {k: None for k in params}
+        return asyncio.run(endpoint(**{**defaults, **params}, db=db))
+
+    # Pagination par curseur, sans doublon ni trou
+    seen, cursor = [], None
+    while True:
+        page = call(get_history, limit=25, before=cursor)
+        seen += [h.id for h in page.history]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True) and len(seen) == len(set(seen)) == 61
+
+    calls = call(get_history, limit=200, contact="mohamed", intent="call_contact")
+    assert len(calls.history) == 30 and calls.history[0].entities == {"contact": "Mohamed"}
+    window = call(get_history, limit=200, since=base, until=base + timedelta(hours=1))
+    assert len(window.history) == 20
+
+    hourly = call(get_intents_per_hour, since=base, until=base + timedelta(hours=1))
+    assert [(b.intent, b.count) for b in hourly.buckets] == [("call_contact", 10), ("get_time", 10)]
+    rates = {r.intent: r for r in call(get_failure_rate, since=base, until=None).intents}
+    assert rates["call_contact"].failures == 15 and rates["call_contact"].failure_rate == 0.5
+    assert rates["get_time"].failures == 0
+
+    # Statistiques calculées dans l'index, sans parcourir la table ; pages servies par index
+    with count_queries(engine) as statements:
+        call(get_failure_rate, since=base, until=None)
+        call(get_intents_per_hour, since=base, until=None)
+        call(get_history, limit=20, contact="Mohamed")
+        call(get_history, limit=20, intent="get_time", before=30)
+    with engine.connect() as conn:
+        plans = [" ".join(r[-1] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + st, (0,) * st.count("?")))
+                 for st in statements]
+    assert all("COVERING INDEX ix_action_history_created_intent" in p for p in plans[:2]), plans
+    assert "ix_action_history_contact_id" in plans[2] and "ix_action_history_intent_id" in plans[3], plans
+    assert not any("TEMP B-TREE" in p and "ORDER BY" in p for p in plans[2:]), plans
@@ -0,0 +1,83 @@
+"""
+Tests du planificateur des rappels - SeniorVoice
+Déclenchement à l'échéance, invalidation, reprogrammation des médicaments, volume
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.agenda_index import AgendaIndex, medication_entries, reminder_entries
+from app.services.notifications import NotificationHub
+from app.services.scheduler import ReminderScheduler
+
+
+def reminder(id, time_text, done=False, kind="general"):
+    return SimpleNamespace(id=id, title=f"Rappel {id}", reminder_time=time_text, reminder_type=kind, is_done=done)
+
+
+def medication(id, schedule):
+    return SimpleNamespace(id=id, name=f"Médicament {id}", dosage="", schedule_time=schedule)
+
+
+def fake_clock(start: datetime):
+    """Horloge qui démarre à `start` et avance en temps réel"""
+    offset = start.timestamp() - time.time()
+    return lambda: time.time() + offset
+
+
+def test_fires_due_items_and_reschedules_medications():
+    agenda = AgendaIndex()
+    agenda.load([reminder(1, "08:00"), reminder(2, "08:00"), reminder(3, "09:00")], [medication(1, "08:00, 20:00")])
+    fired_ids = []
+
+    async def mark_fired(ids):
+        fired_ids.extend(ids)
+        agenda.apply([("reminder", i, []) for i in ids])
+
+    async def scenario():
+        hub = NotificationHub()
+        queue = hub.subscribe()
+        scheduler = ReminderScheduler(agenda, hub, mark_fired=mark_fired,
+                                      clock=fake_clock(datetime(2026, 3, 2, 7, 59, 59, 800000)))
+        scheduler.start()
+        # Rappel 2 fait avant l'échéance : ne doit pas sonner
+        agenda.apply([("reminder", 2, reminder_entries(reminder(2, "08:00", done=True)))])
+        events = [await asyncio.wait_for(queue.get(), timeout=2) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return events, stats
+
+    events, stats = asyncio.run(scenario())
+    assert sorted((e["data"]["kind"], e["data"]["id"]) for e in events) == [("medication", 1), ("reminder", 1)]
+    assert fired_ids == [1]
+    assert stats["fired"] == 2
+    # Restent : rappel 3 (09:00), médicament à 20:00 et le même demain à 08:00
+    assert stats["scheduled"] == 3
+    assert stats["next_due"] == "2026-03-02T09:00:00"
+
+
+def test_scales_to_tens_of_thousands_of_schedules():
+    agenda = AgendaIndex()
+    # Deux prises par jour, une par minute de la journée ; 40 000 échéances
+    meds = [medication(i, f"{(i // 60) % 24:02d}:{i % 60:02d}, {(i // 60 + 12) % 24:02d}:00") for i in range(20000)]
+    agenda.load([], meds)
+    scheduler = ReminderScheduler(agenda, NotificationHub(), clock=lambda: datetime(2026, 3, 2, 12, 0).timestamp())
+
+    start = time.perf_counter()
+    scheduler._on_agenda_changed(None)
+    # 1000 modifications incrémentales (invalidations par version)
+    for med in meds[:1000]:
+        med.schedule_time = "23:59"
+        agenda.apply([("medication", med.id, medication_entries(med))])
+    elapsed = time.perf_counter() - start
+
+    assert scheduler._next_delay(datetime(2026, 3, 2, 12, 0).timestamp()) == 60.0  # 12:01
+    assert scheduler.stats()["scheduled"] == 39000
+    assert elapsed < 2.0, elapsed
@@ -0,0 +1,506 @@
+"""
+Tests des moteurs de transcription - SeniorVoice
+L'application doit démarrer sans GROQ_API_KEY (moteur local hors ligne)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.audio_analyzer import VoiceAnalyzer
+from app.services.audio_normalizer import AudioNormalizationError, AudioNormalizer, find_ffmpeg
+from app.services.silence_trimmer import SilenceTrimmer, SilentAudioError
+from app.services.tts_backends import TTSBackend
+from app.services.transcription_backends import (
+    LocalWhisperBackend, TranscriptionBackend, create_backend,
+)
+
+
+class FakeBackend(TranscriptionBackend):
+    name = "fake"
+    native_formats = {".webm", ".wav"}
+    max_bytes = 1000
+
+    def __init__(self):
+        super().__init__("fake-model")
+        self.calls = []
+
+    def transcribe(self, filename, audio, prompt=""):
+        self.calls.append((filename, audio, prompt))
+        return " quelle heure est-il "
+
+
+def test_local_backend_without_api_key(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.delenv("TRANSCRIPTION_BACKEND", raising=False)
+    backend = create_backend()
+    assert isinstance(backend, LocalWhisperBackend)
+    # Chargement paresseux : aucun modèle tant qu'on ne transcrit pas
+    assert backend._model is None
+
+
+def test_incomplete_backend_fails_at_instantiation():
+    class NoTranscribe(TranscriptionBackend):
+        name = "incomplet"
+
+    with pytest.raises(TypeError):
+        NoTranscribe("modèle")
+
+
+def test_voice_analyzer_delegates_to_backend(monkeypatch):
+    monkeypatch.setenv("TRANSCRIPTION_CACHE_ENABLED", "false")
+    backend = FakeBackend()
+    analyzer = VoiceAnalyzer(backend=backend, normalizer=AudioNormalizer(enabled=False))
+
+    assert analyzer.can_transcribe_bytes(500, ".webm")
+    assert not analyzer.can_transcribe_bytes(5000, ".webm")
+    assert not analyzer.can_transcribe_bytes(500, ".aiff")
+
+    assert analyzer.transcribe_bytes(b"x" * 500, "rec.webm") == "quelle heure est-il"
+    filename, audio, prompt = backend.calls[0]
+    assert filename == "rec.webm" and audio == b"x" * 500 and prompt
+
+
+class FakeNormalizer(AudioNormalizer):
+    """FFmpeg simulé : sortie 8x plus petite, durée fixe, pour observer le pool"""
+
+    def __init__(self, **kwargs):
+        super().__init__(ffmpeg_path="ffmpeg", codec="opus", **kwargs)
+        self.peak = 0
+        self.fail = False
+
+    def _spawn(self, cmd, data):
+        import time
+        self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        if self.fail:
+            raise AudioNormalizationError("FFmpeg (1) : Invalid data found")
+        return b"OggS" + b"n" * ((len(data) if data is not None else 800) // 8)
+
+
+def test_normalization_routing_and_bounded_pool(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setenv("TRANSCRIPTION_CACHE_ENABLED", "false")
+    backend = FakeBackend()
+    backend.remote = True
+    normalizer = FakeNormalizer(workers=2, min_bytes=400)
+    analyzer = VoiceAnalyzer(backend=backend, normalizer=normalizer, trimmer=SilenceTrimmer(enabled=False))
+
+    # Petit format natif : tel quel ; gros upload : compressé avant l'envoi
+    analyzer.transcribe_bytes(b"x" * 300, "rec.webm")
+    analyzer.transcribe_bytes(b"x" * 800, "rec.wav")
+    assert backend.calls[0][:2] == ("rec.webm", b"x" * 300)
+    assert backend.calls[1][0] == "rec.ogg" and len(backend.calls[1][1]) == 104
+    cmd = normalizer.command()
+    assert cmd[cmd.index("-ac") + 1] == "1" and cmd[cmd.index("-ar") + 1] == "16000"
+    assert cmd[cmd.index("-i") + 1] == "pipe:0" and cmd[-1] == "pipe:1"
+
+    # Format non natif : converti en mémoire ; MP4 (index en fin de fichier) : depuis le disque
+    assert analyzer.can_transcribe_bytes(500, ".aiff") and not analyzer.can_transcribe_bytes(500, ".m4a")
+    path = tmp_path / "rec.m4a"
+    path.write_bytes(b"m" * 800)
+    analyzer.transcribe(str(path))
+    assert backend.calls[-1][0] == "rec.ogg"
+
+    # Échec FFmpeg : l'original part s'il est accepté, sinon erreur
+    normalizer.fail = True
+    analyzer.transcribe_bytes(b"x" * 800, "rec.wav")
+    assert backend.calls[-1][0] == "rec.wav"
+    with pytest.raises(AudioNormalizationError):
+        analyzer.transcribe_bytes(b"x" * 500, "rec.aiff")
+    normalizer.fail = False
+
+    # Rafale : jamais plus de `workers` FFmpeg à la fois
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: analyzer.transcribe_bytes(bytes([i]) * 900, "rec.wav"), range(16)))
+    stats = normalizer.stats()
+    assert normalizer.peak == 2 and stats["active"] == 0 and stats["waiting"] == 0
+    assert stats["failures"] == 2 and stats["ratio"] > 7
+
+
+def test_ffmpeg_pipe_downmixes_to_16k_mono():
+    import io
+    import math
+    import struct
+    import wave
+
+    if find_ffmpeg() is None:
+        pytest.skip("FFmpeg non installé")
+    # 3 s de WAV 44,1 kHz stéréo, comme un enregistrement de téléphone
+    frames = b"".join(struct.pack("<hh", v, v) for v in (
+        int(8000 * math.sin(2 * math.pi * 220 * n / 44100)) for n in range(44100 * 3)
+    ))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        w.writeframes(frames)
+    data = buffer.getvalue()
+
+    opus = AudioNormalizer(codec="opus", workers=1).normalize(data)
+    assert opus[:4] == b"OggS" and len(data) / len(opus) > 10
+    flac = AudioNormalizer(codec="flac", workers=1).normalize(data)
+    assert flac[:4] == b"fLaC" and len(data) / len(flac) > 5
+
+
+def test_silence_trimming_before_transcription(monkeypatch):
+    pytest.importorskip("numpy")
+    import math
+    import random
+    import struct
+    from app.services.wav_utils import pcm_to_wav
+
+    monkeypatch.setenv("TRANSCRIPTION_CACHE_ENABLED", "false")
+    rng = random.Random(7)
+
+    def noise(seconds):
+        return [rng.randint(-40, 40) for _ in range(int(16000 * seconds))]
+
+    def voice(seconds):
+        return [int(6000 * math.sin(2 * math.pi * 180 * n / 16000)) + rng.randint(-40, 40)
+                for n in range(int(16000 * seconds))]
+
+    def wav(samples):
+        return pcm_to_wav(struct.pack(f"<{len(samples)}h", *samples))
+
+    backend = FakeBackend()
+    backend.max_bytes = None
+    analyzer = VoiceAnalyzer(backend=backend, normalizer=AudioNormalizer(enabled=False), trimmer=SilenceTrimmer())
+
+    # 3 s d'attente, 1 s de parole, 4 s d'hésitation, 1 s de parole, 5 s de micro ouvert
+    recording = wav(noise(3) + voice(1) + noise(4) + voice(1) + noise(5))
+    assert analyzer.transcribe_bytes(recording, "rec.wav") == "quelle heure est-il"
+    filename, sent, _prompt = backend.calls[-1]
+    kept = (len(sent) - 44) / 2 / 16000
+    # 2 s de parole + 2 × 200 ms de marge + une pause ramenée à 500 ms
+    assert filename == "rec.wav" and 2.8 <= kept <= 3.0
+    stats = analyzer.trimmer.stats()
+    assert stats["clips"] == 1 and 11 <= stats["seconds_saved"] <= 11.2
+
+    # Silence seul : rejeté sans appel au moteur
+    calls = len(backend.calls)
+    with pytest.raises(SilentAudioError):
+        analyzer.transcribe_bytes(wav(noise(4)), "vide.wav")
+    assert len(backend.calls) == calls and analyzer.trimmer.stats()["rejected"] == 1
+
+    # Court extrait entièrement parlé : rien à couper, l'original part tel quel
+    short = wav(voice(0.8))
+    analyzer.transcribe_bytes(short, "court.wav")
+    assert backend.calls[-1][:2] == ("court.wav", short)
+
+
+def test_transcription_cache_serves_duplicate_uploads(tmp_path):
+    from app.services.transcription_cache import TranscriptionCache
+
+    backend = FakeBackend()
+    cache = TranscriptionCache(path=str(tmp_path / "transcriptions.db"), max_bytes=10_000)
+    analyzer = VoiceAnalyzer(backend=backend, cache=cache)
+
+    audio = b"\x1a\x45\xdf\xa3" * 200
+    assert analyzer.transcribe_bytes(audio, "rec.webm") == "quelle heure est-il"
+    assert analyzer.transcribe_bytes(audio, "retry.webm") == "quelle heure est-il"
+    assert len(backend.calls) == 1
+    assert cache.stats()["hits"] == 1
+
+    # Même audio, autre modèle → autre clé
+    backend.model = analyzer.model = "other-model"
+    analyzer.transcribe_bytes(audio, "rec.webm")
+    assert len(backend.calls) == 2
+
+
+def test_transcription_cache_lru_eviction(tmp_path):
+    from app.services.transcription_cache import TranscriptionCache
+
+    cache = TranscriptionCache(path=str(tmp_path / "t.db"), max_bytes=300)
+    for i in range(4):
+        cache.put(f"key{i}".ljust(64, "0"), "x" * 50)
+    assert cache.get("key0".ljust(64, "0")) is None
+    assert cache.get("key3".ljust(64, "0")) == "x" * 50
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] <= 300
+
+
+class FakeTTSBackend(TTSBackend):
+    name = "fake-tts"
+
+    def __init__(self):
+        super().__init__({"fr", "ar"})
+        self.calls = []
+
+    def synthesize(self, text, language):
+        self.calls.append((text, language))
+        return b"\x10\x00" * 1600 * len(text.split()), 16000
+
+
+def test_tts_phrase_cache_and_audio_endpoint(tmp_path, monkeypatch):
+    import asyncio
+    from fastapi import HTTPException
+    from starlette.requests import Request
+    from app.routers import voice
+    from app.services.wav_utils import wav_to_pcm
+    from app.services.tts_service import TTSCache, TTSService
+
+    backend = FakeTTSBackend()
+    tts = TTSService(backend=backend, cache=TTSCache(path=str(tmp_path / "tts.db"), max_bytes=1_000_000))
+    help_text = "Je n'ai pas compris. Dites par exemple : appelle Ahmed"
+
+    first = tts.generate_response(help_text)
+    assert first["language"] == "fr" and first["audio_url"].startswith("/api/tts/")
+    assert tts.generate_response(help_text)["audio_url"] == first["audio_url"]
+    assert tts.generate_response("واش تحب تعمل")["language"] == "ar"
+    assert backend.calls == []  # synthèse à la demande seulement
+
+    key = first["audio_url"][len("/api/tts/"):-len(".wav")]
+    pcm, rate = wav_to_pcm(tts.audio(key))
+    assert rate == 16000 and len(pcm) == 2 * 1600 * len(help_text.split())
+    # Réponse répétée : lecture du cache, pas de nouvelle synthèse (même après redémarrage)
+    tts.audio(key)
+    restarted = TTSService(backend=backend, cache=TTSCache(path=str(tmp_path / "tts.db")))
+    assert restarted.audio(key) is not None
+    assert len(backend.calls) == 1 and tts.cache.stats()["hits"] == 1
+    assert tts.audio("0" * 64) is None
+
+    monkeypatch.setattr(voice, "tts", tts)
+
+    def get(key, etag=None):
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        request = Request({"type": "http", "method": "GET", "headers": headers})
+        return asyncio.run(voice.get_tts_audio(key, request))
+
+    response = get(key)
+    assert response.media_type == "audio/wav" and response.body[:4] == b"RIFF"
+    assert "immutable" in response.headers["cache-control"]
+    assert get(key, etag=response.headers["etag"]).status_code == 304
+    for bad in ("0" * 64, "../tts"):
+        with pytest.raises(HTTPException) as error:
+            get(bad)
+        assert error.value.status_code == 404
+    assert len(backend.calls) == 1
+
+
+def test_tts_segments_prerendered_and_concatenated(tmp_path):
+    from types import SimpleNamespace
+    from app.services.action_engine import REMINDER_CREATED_AT, TIME_NOW
+    from app.services.contact_index import ContactIndex
+    from app.services.wav_utils import wav_to_pcm
+    from app.services.tts_service import TTSCache, TTSService
+
+    contacts = ContactIndex()
+    contacts.load([SimpleNamespace(id=1, name="Ahmed", phone="+216 1", relation="", is_emergency=False)])
+    backend = FakeTTSBackend()
+    tts = TTSService(
+        backend=backend, cache=TTSCache(path=str(tmp_path / "tts.db")), mode="segments", contact_index=contacts,
+    )
+    rendered = tts.prerender()
+    assert rendered == len(tts.vocabulary()) and ("contact", "Ahmed") in tts.vocabulary()
+    assert ("hour", "23") in tts.vocabulary() and ("text", "Il est actuellement ") in tts.vocabulary()
+    warm = len(backend.calls)
+
+    # Heure : uniquement des clips pré-rendus, aucun appel au moteur
+    now = TIME_NOW.render(hour="08", minute="47", period="Bon matin !")
+    response = tts.generate_response(now.text, now.segments)
+    assert response["segmented"] and response["text"] == "Il est actuellement 08 heures et 47 minutes. Bon matin !"
+    key = response["audio_url"][len("/api/tts/"):-len(".wav")]
+    pcm, rate = wav_to_pcm(tts.audio(key))
+    assert len(backend.calls) == warm and rate == 16000
+    assert pcm == b"".join(tts._clips[segment] for segment in now.segments)
+
+    # Rappel : seul le titre (texte libre) est synthétisé
+    reminder = REMINDER_CREATED_AT.render(title="arroser les plantes", time="18:30")
+    assert ("time_hour", "18") in reminder.segments and ("minute", "30") in reminder.segments
+    response = tts.generate_response(reminder.text, reminder.segments)
+    tts.audio(response["audio_url"][len("/api/tts/"):-len(".wav")])
+    assert backend.calls[warm:] == [("arroser les plantes", "fr")]
+    assert tts.stats()["live_segments"] == 1 and tts.stats()["assembled"] == 2
+
+    # Mode phrase : même texte synthétisé d'un bloc
+    phrase = TTSService(backend=backend, cache=None, mode="phrase")
+    assert not phrase.generate_response(now.text, now.segments)["segmented"]
+
+
+def test_tts_stream_sentence_by_sentence(tmp_path, monkeypatch):
+    import asyncio
+    import struct
+    from fastapi import HTTPException
+    from app.routers import voice
+    from app.services.tts_service import TTSCache, TTSService, split_sentences
+    from app.services.wav_utils import STREAM_SIZE
+
+    text = "Vous avez 2 messages. Message de Ahmed : à demain … Message envoyé à Leila : bien reçu"
+    assert split_sentences(text) == [
+        "Vous avez 2 messages.", "Message de Ahmed : à demain", "Message envoyé à Leila : bien reçu",
+    ]
+    agenda = "Voici votre programme : Rappel : marcher à 09:00. Médicament : Doliprane à 20:00."
+    assert len(split_sentences(agenda)) == 2
+
+    backend = FakeTTSBackend()
+    tts = TTSService(backend=backend, cache=TTSCache(path=str(tmp_path / "tts.db")))
+    monkeypatch.setattr(voice, "tts", tts)
+    assert tts.generate_response("Il fait beau")["stream_url"] == ""
+    response = tts.generate_response(text)
+    key = response["stream_url"][len("/api/tts/"):-len("/stream")]
+
+    async def collect(key):
+        streamed = await voice.stream_tts_audio(key)
+        return [chunk async for chunk in streamed.body_iterator]
+
+    chunks = asyncio.run(collect(key))
+    riff, riff_size, _, _, _, _, channels, rate = struct.unpack("<4sI4s4sIHHI", chunks[0][:28])
+    assert riff == b"RIFF" and riff_size == STREAM_SIZE and (channels, rate) == (1, 16000)
+    assert struct.unpack("<I", chunks[0][40:44])[0] == STREAM_SIZE
+    # Un chunk par phrase, dans l'ordre
+    assert [text for text, _ in backend.calls] == split_sentences(text)
+    assert [len(chunk) for chunk in chunks[1:]] == [2 * 1600 * len(s.split()) for s in split_sentences(text)]
+
+    # Phrases déjà synthétisées : servies par le cache de phrases
+    asyncio.run(collect(key))
+    assert len(backend.calls) == 3 and tts.stats()["streamed_sentences"] == 6
+    with pytest.raises(HTTPException):
+        asyncio.run(collect("0" * 64))
+
+
+def test_streaming_session_partials_and_endpoint():
+    import asyncio
+    import math
+    from array import array
+    from app.services.speech_stream import SAMPLE_RATE, SpeechSegmenter, StreamVAD, StreamingSession
+
+    def pcm(ms, amplitude):
+        n = SAMPLE_RATE * ms // 1000
+        return array("h", (int(amplitude * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(n))).tobytes()
+
+    # 0,5 s de bruit faible, 2 s de parole, 1 s de silence, envoyés par trames de 100 ms
+    audio = pcm(500, 50) + pcm(2000, 8000) + pcm(1000, 50)
+    chunks = [audio[i:i + 3200] for i in range(0, len(audio), 3200)]
+
+    transcribed, messages = [], []
+
+    async def transcribe(wav):
+        transcribed.append(len(wav))
+        return "au secours" if len(transcribed) == 1 else "au secours aidez-moi"
+
+    async def analyze(text):
+        return {"intent": "emergency_alert", "confidence": 0.9, "entities": {}}
+
+    async def complete(text, result):
+        return {"success": True, "transcription": text, "intent": result["intent"]}
+
+    async def emit(message):
+        messages.append(message)
+
+    async def run():
+        segmenter = SpeechSegmenter(vad=StreamVAD(min_rms=300), partial_interval_ms=800, endpoint_silence_ms=700)
+        session = StreamingSession(segmenter, transcribe, analyze, complete, emit)
+        for chunk in chunks:
+            await session.feed(chunk)
+            await asyncio.sleep(0)
+        await session.end()  # énoncé déjà clos par le silence : rien de plus
+        return session
+
+    session = asyncio.run(run())
+    types = [m["type"] for m in messages]
+    assert types[0] == "vad" and messages[0]["speech"] is True
+    assert types.count("partial") >= 2 and types.count("final") == 1
+    assert messages[types.index("partial")]["intent"] == "emergency_alert"
+    final = messages[-1]
+    assert final["type"] == "final" and final["transcription"] == "au secours aidez-moi"
+    assert 2.0 <= final["audio_seconds"] <= 2.5
+    # La partielle lancée à la pause couvrait toute la parole : pas de transcription finale
+    assert session.reused == 1 and len(transcribed) == session.partials
+
+
+def test_streaming_emergency_answers_on_first_partial():
+    import asyncio
+    import math
+    from array import array
+    from app.services.speech_stream import SAMPLE_RATE, SpeechSegmenter, StreamVAD, StreamingSession
+
+    n = SAMPLE_RATE * 3  # 3 s de parole continue : l'alerte doit partir avant la fin
+    speech = array("h", (int(8000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(n))).tobytes()
+    silence = bytes(SAMPLE_RATE * 2)
+    messages, completed = [], []
+
+    async def transcribe(wav):
+        return "au secours"
+
+    async def analyze(text):
+        raise AssertionError("pas de scoring NLP pour une urgence")
+
+    async def complete(text, result):
+        completed.append(text)
+        return {}
+
+    async def emergency(text):
+        return {"success": True, "intent": "emergency_alert", "transcription": text}
+
+    async def emit(message):
+        messages.append((message, speech_sent))
+
+    speech_sent = 0
+
+    async def run():
+        nonlocal speech_sent
+        segmenter = SpeechSegmenter(vad=StreamVAD(min_rms=300), partial_interval_ms=800, endpoint_silence_ms=700)
+        session = StreamingSession(segmenter, transcribe, analyze, complete, emit, emergency=emergency)
+        for i in range(0, len(speech), 3200):
+            await session.feed(speech[i:i + 3200])
+            speech_sent = i + 3200
+            await asyncio.sleep(0)
+        for i in range(0, len(silence), 3200):
+            await session.feed(silence[i:i + 3200])
+        await session.close()
+        return session
+
+    session = asyncio.run(run())
+    finals = [(m, sent) for m, sent in messages if m["type"] == "final"]
+    assert len(finals) == 1 and finals[0][0]["fast_path"] is True
+    assert finals[0][1] < len(speech)  # envoyée pendant que le senior parle encore
+    assert session.emergencies == 1 and completed == []
+
+
+def test_streaming_partials_use_a_tail_window():
+    import asyncio
+    import math
+    from array import array
+    from app.services.speech_stream import SAMPLE_RATE, SpeechSegmenter, StreamVAD, StreamingSession
+
+    n = SAMPLE_RATE * 6  # 6 s de parole continue, fenêtre des partielles de 2 s
+    speech = array("h", (int(8000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(n))).tobytes()
+    silence = bytes(SAMPLE_RATE * 2)
+    transcribed, messages = [], []
+
+    async def transcribe(wav):
+        transcribed.append(len(wav) - 44)  # PCM sans l'en-tête WAV
+        return "il fait beau"
+
+    async def analyze(text):
+        return {"intent": "get_weather", "confidence": 0.9, "entities": {}}
+
+    async def complete(text, result):
+        return {"transcription": text}
+
+    async def emit(message):
+        messages.append(message)
+
+    async def run():
+        segmenter = SpeechSegmenter(
+            vad=StreamVAD(min_rms=300), partial_interval_ms=800, partial_window_s=2, endpoint_silence_ms=700,
+        )
+        session = StreamingSession(segmenter, transcribe, analyze, complete, emit)
+        for audio in (speech, silence):
+            for i in range(0, len(audio), 3200):
+                await session.feed(audio[i:i + 3200])
+                await asyncio.sleep(0)
+        return session
+
+    session = asyncio.run(run())
+    partials, final = transcribed[:-1], transcribed[-1]
+    # Partielles bornées par la fenêtre (coût linéaire), transcription finale de tout l'énoncé
+    assert session.partials >= 3 and all(size <= SAMPLE_RATE * 2 * 2 for size in partials)
+    assert session.reused == 0 and final >= len(speech)
+    assert messages[-1]["type"] == "final" and messages[-1]["audio_seconds"] >= 6.0
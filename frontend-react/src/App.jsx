@@ -19,6 +19,7 @@ const STATUS = {
   ERROR_API:  '❌ Service non disponible — réessayez',
   ERROR_MIC:  '❌ Erreur de communication',
   EMERGENCY:  '🚨 ALERTE URGENCE EN COURS…',
+  NO_SPEECH:  '🤔 Je n\'ai rien entendu — réessayez',
 };
 
 // Map action IDs → natural French text commands for the NLP
@@ -47,7 +48,6 @@ function App() {
   const [micStatusText,  setMicStatusText]  = useState(STATUS.CHECKING);
   const [result,         setResult]         = useState(null);
   const [isProcessing,   setIsProcessing]   = useState(false);
-  const [refreshTrigger, setRefreshTrigger] = useState(0);
 
   // ── API health check on mount ────────────────────────────────────────
   useEffect(() => {
@@ -64,8 +64,6 @@ function App() {
     verify();
   }, []);
 
-  const triggerRefresh = () => setRefreshTrigger(prev => prev + 1);
-
   const resetStatus = (delay = 4000) =>
     setTimeout(() => setMicStatusText(STATUS.READY), delay);
 
@@ -78,12 +76,16 @@ function App() {
     try {
       const data = await processVoice(audioBlob);
       setResult(data);
-      triggerRefresh();
 
       const text = data.tts_text || data.action_result;
-      if (text) speakText(text);
+      if (text) speakText(text, data.tts_stream_url || data.tts_audio_url);
 
-      setMicStatusText(STATUS.READY);
+      if (data.intent === 'no_speech') {
+        setMicStatusText(STATUS.NO_SPEECH);
+        resetStatus();
+      } else {
+        setMicStatusText(STATUS.READY);
+      }
     } catch (err) {
       console.error('❌ Erreur API voix:', err);
       setResult({
@@ -100,6 +102,43 @@ function App() {
     }
   };
 
+  // ── Continuous voice stream (partial transcripts while speaking) ──────
+  const handleStreamMessage = (msg) => {
+    switch (msg.type) {
+      case 'partial':
+        setMicStatusText(`🗣️ « ${msg.text} »`);
+        break;
+      case 'vad':
+        if (!msg.speech) setMicStatusText(STATUS.PROCESSING);
+        break;
+      case 'final': {
+        setResult(msg);
+        const text = msg.tts_text || msg.action_result;
+        if (text) speakText(text, msg.tts_stream_url || msg.tts_audio_url);
+        setMicStatusText(STATUS.READY);
+        break;
+      }
+      case 'no_speech':
+        setMicStatusText(STATUS.NO_SPEECH);
+        resetStatus();
+        break;
+      case 'error':
+        console.error('❌ Erreur voice-stream:', msg.detail);
+        setResult({
+          success:      false,
+          intent:       'unknown',
+          transcription:'',
+          action_result:"Désolé, je n'ai pas pu traiter votre demande. Veuillez réessayer.",
+          confidence:   0,
+        });
+        setMicStatusText(STATUS.ERROR_MIC);
+        resetStatus(5000);
+        break;
+      default:
+        break;
+    }
+  };
+
   // ── Quick action buttons ─────────────────────────────────────────────
   const handleQuickAction = async (actionId) => {
     if (isProcessing) return;
@@ -115,12 +154,16 @@ function App() {
     try {
       const data = await submitQuickAction(commandText);
       setResult(data);
-      triggerRefresh();
 
       const text = data.tts_text || data.action_result;
-      if (text) speakText(text);
+      if (text) speakText(text, data.tts_stream_url || data.tts_audio_url);
 
-      setMicStatusText(STATUS.READY);
+      if (data.intent === 'no_speech') {
+        setMicStatusText(STATUS.NO_SPEECH);
+        resetStatus();
+      } else {
+        setMicStatusText(STATUS.READY);
+      }
     } catch (err) {
       console.error('❌ Erreur action rapide:', err);
 
@@ -181,6 +224,7 @@ function App() {
           isApiAvailable={isApiAvailable}
           isProcessing={isProcessing}
           onAudioCaptured={handleAudioCaptured}
+          onStreamMessage={handleStreamMessage}
           micStatusText={micStatusText}
         />
 
@@ -191,7 +235,7 @@ function App() {
           disabled={isProcessing}
         />
 
-        <Dashboard refreshTrigger={refreshTrigger} />
+        <Dashboard />
 
       </main>
 
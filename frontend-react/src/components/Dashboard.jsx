@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { getReminders, getMedications, getContacts, getMessages } from '../services/api';
+import { getReminders, getMedications, getContacts, getMessages, getChanges, subscribeEvents } from '../services/api';
 
 const Panel = ({ title, headerClass, children, loading }) => (
   <div className="dash-panel">
@@ -12,7 +12,21 @@ const Panel = ({ title, headerClass, children, loading }) => (
   </div>
 );
 
-const Dashboard = ({ refreshTrigger }) => {
+// Remplace / ajoute les lignes reçues (par id), retire les supprimées, puis trie
+const mergeRows = (list, rows, deletedIds = [], compare, limit) => {
+  const byId = new Map(list.map(item => [item.id, item]));
+  deletedIds.forEach(id => byId.delete(id));
+  rows.forEach(row => byId.set(row.id, row));
+  const merged = [...byId.values()].sort(compare);
+  return limit ? merged.slice(0, limit) : merged;
+};
+
+const byId           = (a, b) => a.id - b.id;
+const byReminderTime = (a, b) => (a.reminder_time || '').localeCompare(b.reminder_time || '');
+const byNewest       = (a, b) => (b.created_at || '').localeCompare(a.created_at || '') || b.id - a.id;
+const MAX_MESSAGES   = 20;
+
+const Dashboard = () => {
   const [reminders,    setReminders]    = useState([]);
   const [medications,  setMedications]  = useState([]);
   const [contacts,     setContacts]     = useState([]);
@@ -20,14 +34,44 @@ const Dashboard = ({ refreshTrigger }) => {
   const [loading,      setLoading]      = useState(true);
 
   useEffect(() => {
-    setLoading(true);
-    Promise.allSettled([
-      getReminders().then(d  => d.success  && setReminders(d.reminders)),
-      getMedications().then(d => d.success  && setMedications(d.medications)),
-      getContacts().then(d    => d.success  && setContacts(d.contacts)),
-      getMessages().then(d    => d.success  && setMessages(d.messages)),
-    ]).finally(() => setLoading(false));
-  }, [refreshTrigger]);
+    let cursor = null;
+
+    // Chargement complet : au démarrage, et si le serveur signale un curseur trop ancien
+    const loadAll = async () => {
+      setLoading(true);
+      const changes = await getChanges().catch(() => null);
+      await Promise.allSettled([
+        getReminders().then(d  => d.success  && setReminders(d.reminders)),
+        getMedications().then(d => d.success  && setMedications(d.medications)),
+        getContacts().then(d    => d.success  && setContacts(d.contacts)),
+        getMessages().then(d    => d.success  && setMessages(d.messages)),
+      ]);
+      cursor = changes && changes.success ? changes.cursor : null;
+      setLoading(false);
+    };
+
+    // Événement "change" : seulement les lignes modifiées depuis le dernier curseur
+    const applyChanges = async () => {
+      if (cursor === null) return loadAll();
+      const d = await getChanges(cursor);
+      if (!d.success) return;
+      if (d.reset) return loadAll();
+      cursor = d.cursor;
+      const deleted = d.deleted || {};
+      setReminders(list   => mergeRows(list, d.reminders,   deleted.reminders,   byReminderTime));
+      setMedications(list => mergeRows(list, d.medications, deleted.medications, byId));
+      setContacts(list    => mergeRows(list, d.contacts,    deleted.contacts,    byId));
+      setMessages(list    => mergeRows(list, d.messages,    deleted.messages,    byNewest, MAX_MESSAGES));
+    };
+
+    let syncing = loadAll();
+    const unsubscribe = subscribeEvents((type) => {
+      if (type !== 'change') return;
+      // Une seule synchronisation à la fois, dans l'ordre des événements
+      syncing = syncing.then(applyChanges).catch(err => console.error('Sync dashboard', err));
+    });
+    return unsubscribe;
+  }, []);
 
   return (
     <section className="dashboard-section" id="dashboard">
@@ -36,8 +80,8 @@ const Dashboard = ({ refreshTrigger }) => {
 
         <Panel title="⏰ Mes Rappels" headerClass="ph-amber" loading={loading}>
           {reminders.length > 0
-            ? reminders.map((r, i) => (
-                <div key={i} className="dash-item">
+            ? reminders.map(r => (
+                <div key={r.id} className="dash-item">
                   <span className="dash-item-title">{r.title}</span>
                   <span className="dash-item-detail">🕐 {r.reminder_time}</span>
                 </div>
@@ -47,8 +91,8 @@ const Dashboard = ({ refreshTrigger }) => {
 
         <Panel title="💊 Mes Médicaments" headerClass="ph-red" loading={loading}>
           {medications.length > 0
-            ? medications.map((m, i) => (
-                <div key={i} className="dash-item">
+            ? medications.map(m => (
+                <div key={m.id} className="dash-item">
                   <span className="dash-item-title">💊 {m.name}{m.dosage ? ` (${m.dosage})` : ''}</span>
                   <span className="dash-item-detail">🕐 {m.schedule_time}</span>
                 </div>
@@ -58,8 +102,8 @@ const Dashboard = ({ refreshTrigger }) => {
 
         <Panel title="👥 Mes Contacts" headerClass="ph-blue" loading={loading}>
           {contacts.length > 0
-            ? contacts.map((c, i) => (
-                <div key={i} className={`dash-item ${c.is_emergency ? 'dash-item-emergency' : ''}`}>
+            ? contacts.map(c => (
+                <div key={c.id} className={`dash-item ${c.is_emergency ? 'dash-item-emergency' : ''}`}>
                   <span className="dash-item-title">{c.is_emergency ? '🚨 ' : '👤 '}{c.name}</span>
                   <span className="dash-item-detail">{c.relation || c.phone}</span>
                 </div>
@@ -69,8 +113,8 @@ const Dashboard = ({ refreshTrigger }) => {
 
         <Panel title="💬 Messages récents" headerClass="ph-green" loading={loading}>
           {messages.length > 0
-            ? messages.map((m, i) => (
-                <div key={i} className="dash-item">
+            ? messages.map(m => (
+                <div key={m.id} className="dash-item">
                   <span className="dash-item-title">
                     {m.direction === 'received' ? '📩' : '📤'} {m.contact_name || 'Inconnu'}
                   </span>
@@ -1,15 +1,42 @@
 import React, { useState, useRef } from 'react';
+import { canStreamVoice, streamVoice } from '../services/api';
 
-const Microphone = ({ onAudioCaptured, isApiAvailable, micStatusText }) => {
+// Messages qui terminent un énoncé en continu
+const STREAM_DONE = ['final', 'no_speech', 'error'];
+
+const Microphone = ({ onAudioCaptured, onStreamMessage, isApiAvailable, micStatusText }) => {
   const [isRecording, setIsRecording] = useState(false);
   const mediaRecorderRef = useRef(null);
   const audioChunksRef  = useRef([]);
+  const voiceStreamRef  = useRef(null);
 
   const handleMicClick = async () => {
     if (!isApiAvailable) return;
-    isRecording ? stopRecording() : await startRecording();
+    if (isRecording) return stopRecording();
+    if (onStreamMessage && canStreamVoice() && await startStreaming()) return;
+    await startRecording();
+  };
+
+  // ── Continu : le serveur transcrit pendant que le senior parle ─────────
+  const startStreaming = async () => {
+    try {
+      voiceStreamRef.current = await streamVoice((msg) => {
+        onStreamMessage(msg);
+        if (STREAM_DONE.includes(msg.type)) {
+          voiceStreamRef.current?.close();
+          voiceStreamRef.current = null;
+          setIsRecording(false);
+        }
+      });
+      setIsRecording(true);
+      return true;
+    } catch (err) {
+      console.warn('⚠️ Micro en continu indisponible, enregistrement classique:', err);
+      return false;
+    }
   };
 
+  // ── Classique : enregistrement complet puis envoi ─────────────────────
   const startRecording = async () => {
     try {
       const stream = await navigator.mediaDevices.getUserMedia({
@@ -48,6 +75,12 @@ const Microphone = ({ onAudioCaptured, isApiAvailable, micStatusText }) => {
   };
 
   const stopRecording = () => {
+    if (voiceStreamRef.current) {
+      // Fin de l'énoncé côté serveur ; la réponse arrive par le flux
+      voiceStreamRef.current.stop();
+      setIsRecording(false);
+      return;
+    }
     if (mediaRecorderRef.current && mediaRecorderRef.current.state !== 'inactive') {
       mediaRecorderRef.current.stop();
       setIsRecording(false);
@@ -108,7 +108,7 @@ const ResultCard = ({ result }) => {
 
         {/* Actions */}
         <div className="result-actions">
-          <button className="btn-listen" onClick={() => speakText(responseText)}>
+          <button className="btn-listen" onClick={() => speakText(responseText, result.tts_stream_url || result.tts_audio_url)}>
             <svg viewBox="0 0 24 24" fill="none" stroke="currentColor"
               strokeWidth="2.5" strokeLinecap="round" strokeLinejoin="round"
               width="20" height="20">
@@ -62,4 +62,98 @@ export const submitQuickAction = async (commandText) => {
     }
 
     return await response.json();
-};
\ No newline at end of file
+};
+
+/**
+ * getChanges — lignes modifiées depuis le curseur `since` (sans argument : curseur courant).
+ * `reset: true` = curseur trop ancien, recharger les listes complètes.
+ */
+export const getChanges = async (since) => {
+    const query = since === undefined ? '' : `?since=${since}`;
+    const response = await fetch(`${API_URL}/changes${query}`);
+    return await response.json();
+};
+
+/**
+ * subscribeEvents — flux Server-Sent Events du serveur (modifications, rappels dus).
+ * Retourne la fonction de désabonnement.
+ */
+export const subscribeEvents = (onEvent) => {
+    const source = new EventSource(`${API_URL}/events`);
+    const handler = (e) => onEvent(e.type, JSON.parse(e.data));
+    ['change', 'reminder_due'].forEach(type => source.addEventListener(type, handler));
+    return () => source.close();
+};
+
+
+// ── Micro en continu (/api/voice-stream) ─────────────────────────────────
+const WS_URL = API_URL.replace(/^http/, 'ws');
+
+// Trames du micro → PCM 16 bits (exécuté dans le thread audio)
+const PCM_WORKLET = `
+class PcmCapture extends AudioWorkletProcessor {
+  process(inputs) {
+    const input = inputs[0][0];
+    if (input) {
+      const pcm = new Int16Array(input.length);
+      for (let i = 0; i < input.length; i++) pcm[i] = Math.max(-1, Math.min(1, input[i])) * 0x7fff;
+      this.port.postMessage(pcm.buffer, [pcm.buffer]);
+    }
+    return true;
+  }
+}
+registerProcessor('pcm-capture', PcmCapture);
+`;
+
+export const canStreamVoice = () =>
+    typeof window !== 'undefined' && 'AudioWorkletNode' in window && 'WebSocket' in window;
+
+/**
+ * streamVoice — envoie le micro au serveur pendant que le senior parle.
+ * onMessage reçoit : vad, partial (texte + intention), final (comme processVoice), no_speech, error.
+ * Retourne { stop, close } : stop = micro relâché (le serveur termine l'énoncé), close = tout fermer.
+ */
+export const streamVoice = async (onMessage) => {
+    const stream = await navigator.mediaDevices.getUserMedia({
+        audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true },
+    });
+    const context = new AudioContext({ sampleRate: 16000 });
+    const workletUrl = URL.createObjectURL(new Blob([PCM_WORKLET], { type: 'application/javascript' }));
+    await context.audioWorklet.addModule(workletUrl);
+    URL.revokeObjectURL(workletUrl);
+
+    const socket = new WebSocket(`${WS_URL}/voice-stream?sample_rate=${context.sampleRate}`);
+    socket.binaryType = 'arraybuffer';
+    socket.onmessage = (e) => onMessage(JSON.parse(e.data));
+
+    const release = () => {
+        stream.getTracks().forEach((t) => t.stop());
+        if (context.state !== 'closed') context.close();
+    };
+
+    try {
+        await new Promise((resolve, reject) => {
+            socket.onopen = resolve;
+            socket.onerror = () => reject(new Error('WebSocket voice-stream indisponible'));
+        });
+    } catch (err) {
+        release();
+        throw err;
+    }
+
+    const source = context.createMediaStreamSource(stream);
+    const capture = new AudioWorkletNode(context, 'pcm-capture');
+    capture.port.onmessage = (e) => socket.readyState === WebSocket.OPEN && socket.send(e.data);
+    source.connect(capture);
+
+    return {
+        stop: () => {
+            release();
+            if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: 'end' }));
+        },
+        close: () => {
+            release();
+            socket.close();
+        },
+    };
+};
@@ -1,5 +1,27 @@
-// TTS (Synthèse vocale navigateur)
-export const speakText = (text) => {
+// Origine du backend pour les URL relatives (/api/tts/...)
+const API_ORIGIN = 'http://localhost:8000';
+
+let currentAudio = null;
+
+// TTS : audio synthétisé par le serveur (tts_stream_url / tts_audio_url), sinon synthèse vocale navigateur
+export const speakText = (text, audioUrl) => {
+    if (currentAudio) {
+        currentAudio.pause();
+        currentAudio = null;
+    }
+    if (audioUrl) {
+        if ('speechSynthesis' in window) window.speechSynthesis.cancel();
+        const audio = new Audio(audioUrl.startsWith('/') ? API_ORIGIN + audioUrl : audioUrl);
+        currentAudio = audio;
+        audio.play().catch(() => {
+            if (currentAudio === audio) speakBrowser(text);
+        });
+        return;
+    }
+    speakBrowser(text);
+};
+
+const speakBrowser = (text) => {
     if ('speechSynthesis' in window) {
         window.speechSynthesis.cancel(); // Annuler toute lecture en cours
 